@@ -0,0 +1,89 @@
+"""
+Frame-accurate input timeline for MarioController.
+
+Instead of sending a button and blocking in a tick loop, inputs are queued as (frame, WindowEvent)
+entries - a held button is a segment, a press at its start frame and a release at its end frame.
+apply() sends whatever is due before each emulator tick, so the caller decides how many frames to
+advance before looking at the game again, and preempt() drops everything still queued and lets go of
+every held button so a new plan can start on the very next frame. drop() forgets the queue without
+sending anything, for when a loaded save state has replaced the joypad.
+"""
+
+import heapq
+from typing import Callable
+
+
+class ActionScheduler:
+    """
+    Args:
+        send_input (Callable[[int], None]): Sends one WindowEvent to the emulator.
+        releases (dict[int, int]): Release event for every press event that can be scheduled.
+    """
+
+    def __init__(self, send_input: Callable[[int], None], releases: dict[int, int]) -> None:
+        self.send_input = send_input
+        self.releases = releases
+        self.presses = {release: press for press, release in releases.items()}
+
+        self.held = set()
+        self._queue = []
+        self._sequence = 0
+        self.end_frame = 0
+
+    def schedule(self, frame: int, event: int) -> None:
+        """
+        Queues an event to be sent before the tick that starts at frame. Events due on the same frame
+        are sent in the order they were scheduled.
+        """
+        heapq.heappush(self._queue, (frame, self._sequence, event))
+        self._sequence += 1
+        self.end_frame = max(self.end_frame, frame)
+
+    def segment(self, press: int, start: int, end: int = None) -> None:
+        """
+        Holds a button from start up to end. With end None the button stays held until released.
+        """
+        self.schedule(start, press)
+        if end is not None:
+            self.schedule(end, self.releases[press])
+
+    def wait_until(self, frame: int) -> None:
+        """
+        Keeps the timeline busy, without any input, until frame.
+        """
+        self.end_frame = max(self.end_frame, frame)
+
+    def pending(self, frame: int) -> bool:
+        return frame < self.end_frame or bool(self._queue)
+
+    def apply(self, frame: int) -> None:
+        """
+        Sends every event due at or before frame.
+        """
+        queue = self._queue
+        while queue and queue[0][0] <= frame:
+            event = heapq.heappop(queue)[2]
+            if event in self.releases:
+                self.held.add(event)
+            else:
+                self.held.discard(self.presses.get(event))
+            self.send_input(event)
+
+    def preempt(self, frame: int) -> None:
+        """
+        Drops every queued event and releases every held button.
+        """
+        self._queue.clear()
+        for press in sorted(self.held):
+            self.send_input(self.releases[press])
+        self.held.clear()
+        self.end_frame = frame
+
+    def drop(self, frame: int, held=()) -> None:
+        """
+        Drops every queued event without sending any input - a save state was loaded and the joypad now
+        holds the presses in held.
+        """
+        self._queue.clear()
+        self.held = set(held)
+        self.end_frame = frame
@@ -0,0 +1,759 @@
+"""
+Micro-benchmarks for the hot paths of the Mario Expert agent.
+
+None of these need the ROM - they run over recorded observations when a corpus is supplied and over
+synthetic ones otherwise.
+
+python3 benchmark.py tile_query --corpus grids.npy
+python3 benchmark.py ram_snapshot
+python3 benchmark.py video
+python3 benchmark.py rollouts --workers 4
+python3 benchmark.py startup
+python3 benchmark.py frames
+python3 benchmark.py observation --corpus grids.npy
+python3 benchmark.py rules
+python3 benchmark.py tracker
+python3 benchmark.py dataset
+python3 benchmark.py environment --history environment.jsonl --max_slowdown 1.5
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+import enemy_tracker
+import episode_dataset
+import lazy_frame
+import lookahead
+import object_table
+import observation
+import tile_query
+import video_writer
+import warm_start
+from emulator_backend import BackendController, stub_controller
+from expert_parameters import ExpertParameters
+from mario_environment import MarioEnvironment
+from mario_expert import RULES
+from pyboy_environment import PyboyEnvironment
+from ram_snapshot import RAM_ADDRESSES, RAMSnapshot
+from rollout_pool import RolloutPool
+from rule_engine import RuleContext, RuleEngine
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(function):
+        BENCHMARKS[name] = function
+        return function
+
+    return register
+
+
+def time_per_call(function, inputs, repeat: int) -> float:
+    """
+    Returns the mean wall time in seconds of function(item) over every item in inputs.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in inputs:
+            function(item)
+    return (time.perf_counter() - start) / (repeat * len(inputs))
+
+
+def report(name: str, before: float, after: float) -> None:
+    logging.info(
+        f"{name}: before {before * 1e6:.2f} us/call after {after * 1e6:.2f} us/call "
+        f"speedup {before / after:.1f}x"
+    )
+
+
+def synthetic_grids(count: int, seed: int = 0) -> np.ndarray:
+    """
+    Returns count game_area-like grids (16 x 20) with ground, pipes, blocks, coins and Mario.
+    """
+    rng = np.random.default_rng(seed)
+    grids = np.zeros((count, 16, 20), dtype=np.uint32)
+    for grid in grids:
+        grid[14:, :] = 10
+        for column in rng.choice(20, size=rng.integers(0, 3), replace=False):
+            grid[14:, column] = 0  # holes
+        for column in rng.choice(19, size=rng.integers(0, 2), replace=False):
+            height = rng.integers(2, 5)
+            grid[14 - height : 14, column : column + 2] = 14
+        for _ in range(rng.integers(0, 4)):
+            grid[rng.integers(2, 10), rng.integers(0, 20)] = rng.choice((5, 13))
+        if rng.random() < 0.95:
+            row, column = rng.integers(2, 13), rng.integers(0, 19)
+            grid[row : row + 2, column : column + 2] = 1
+    return grids
+
+
+def load_grids(path: str, count: int) -> np.ndarray:
+    if path is None:
+        return synthetic_grids(count)
+    grids = np.load(path)
+    logging.info(f"Loaded {len(grids)} grids from {path}")
+    return grids
+
+
+def _loop_find_mario(game_area):
+    for i in range(15, -1, -1):
+        for j in range(19, -1, -1):
+            if game_area[i, j] == 1:
+                return (i, j)
+    return None
+
+
+def _loop_find_qblock(game_area):
+    qblock_x = 0
+    qblock_y = 0
+    for i in range(15, -1, -1):
+        for j in range(19, -1, -1):
+            if game_area[i, j] == 13 or game_area[i, j] == 5:
+                qblock_x = i
+                qblock_y = j
+    return (qblock_x, qblock_y)
+
+
+def _query_find_mario(game_area):
+    return tile_query.first_in_scan(game_area, 1)
+
+
+def _query_find_qblock(game_area):
+    qblock = tile_query.last_in_scan(game_area, (13, 5))
+    return qblock if qblock is not None else (0, 0)
+
+
+@benchmark("tile_query")
+def bench_tile_query(args) -> None:
+    grids = load_grids(args.corpus, args.count)
+
+    for grid in grids:
+        assert _loop_find_mario(grid) == _query_find_mario(grid)
+        assert _loop_find_qblock(grid) == _query_find_qblock(grid)
+    logging.info(f"Loop and vectorised detectors agree on {len(grids)} grids")
+
+    report(
+        "find_mario",
+        time_per_call(_loop_find_mario, grids, args.repeat),
+        time_per_call(_query_find_mario, grids, args.repeat),
+    )
+    report(
+        "find_qBlocks",
+        time_per_call(_loop_find_qblock, grids, args.repeat),
+        time_per_call(_query_find_qblock, grids, args.repeat),
+    )
+
+
+def default_rom_emulator() -> SimpleNamespace:
+    """
+    Returns a headless PyBoy running the ROM bundled with PyBoy, exposing the attributes the
+    environment reads. Memory, screen and frame counter are real - only the Mario score is faked.
+    """
+    import pyboy
+    from pyboy import PyBoy
+
+    emulator = PyBoy(os.path.join(os.path.dirname(pyboy.__file__), "default_rom.gb"), window="null")
+    emulator.set_emulation_speed(0)
+    emulator.tick(60)
+    return SimpleNamespace(
+        memory=emulator.memory,
+        screen=emulator.screen,
+        game_wrapper=SimpleNamespace(score=0),
+    )
+
+
+class _ScorelessPyBoy:
+    """
+    A PyBoy running the bundled ROM, with a stand-in for the Mario game wrapper's score.
+    """
+
+    def __init__(self) -> None:
+        import pyboy
+        from pyboy import PyBoy
+
+        self._pyboy = PyBoy(
+            os.path.join(os.path.dirname(pyboy.__file__), "default_rom.gb"), window="null"
+        )
+        self.game_wrapper = SimpleNamespace(score=0)
+
+    def __getattr__(self, name):
+        return getattr(self._pyboy, name)
+
+
+class DefaultRomController(BackendController):
+    """
+    A MarioController whose emulation paths - inputs, ticks, save states, RAM reads - run on the bundled ROM.
+    """
+
+    backend = _ScorelessPyBoy
+
+
+def default_rom_controller() -> DefaultRomController:
+    return DefaultRomController(emulation_speed=0, headless=True)
+
+
+def _getter_state_step(environment):
+    environment.game_state()
+    environment.get_x_position()
+    environment._read_m(0xC202)
+    environment._read_m(0xC201)
+    environment._read_m(0xC20A)
+
+
+def _snapshot_state_step(emulator):
+    ram = RAMSnapshot.capture(emulator)
+    ram.game_state()
+    ram.x_position
+    ram.mario_x
+    ram.mario_y
+    ram.on_ground
+
+
+@benchmark("ram_snapshot")
+def bench_ram_snapshot(args) -> None:
+    emulator = default_rom_emulator()
+
+    environment = MarioEnvironment.__new__(MarioEnvironment)
+    environment.pyboy = emulator
+
+    assert environment.game_state() == RAMSnapshot.capture(emulator).game_state()
+
+    steps = args.count * args.repeat
+    report(
+        "state extraction per step",
+        time_per_call(_getter_state_step, [environment] * steps, 1),
+        time_per_call(_snapshot_state_step, [emulator] * steps, 1),
+    )
+
+
+@benchmark("video")
+def bench_video(args) -> None:
+    """
+    Emulation-thread cost per recorded frame: grab_frame + cv2 encode versus queueing the raw screen.
+    """
+    emulator = default_rom_emulator()
+    frames = args.count * args.repeat
+
+    with tempfile.TemporaryDirectory() as directory:
+        video = cv2.VideoWriter(
+            f"{directory}/sync.mp4", cv2.VideoWriter_fourcc(*"mp4v"), 30, (300, 240)
+        )
+
+        def sync_frame(screen):
+            frame = cv2.resize(np.array(screen.ndarray), (300, 240))
+            video.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+
+        before = time_per_call(sync_frame, [emulator.screen] * frames, 1)
+        video.release()
+
+        writer = video_writer.AsyncVideoWriter(f"{directory}/async.mp4", 300, 240)
+        after = time_per_call(lambda screen: writer.submit(screen.ndarray), [emulator.screen] * frames, 1)
+        start = time.perf_counter()
+        writer.release()
+        flush = time.perf_counter() - start
+
+    report("recording per frame (emulation thread)", before, after)
+    logging.info(f"async flush at end of run: {flush * 1e3:.1f} ms")
+
+
+def _raw_class_tests(game_area):
+    # The per-decision tile tests of choose_action and its detectors on raw codes
+    mario = tile_query.first_in_scan(game_area, tile_query.MARIO)
+    tile_query.last_in_scan(game_area, tile_query.PRIZE)
+    row, col = mario if mario is not None else (8, 8)
+    tile_query.region_all(game_area, slice(row + 1, row + 5), slice(col + 1, col + 3), tile_query.EMPTY)
+    game_area[min(row + 1, 15)][col] == tile_query.PIPE or game_area[min(row + 1, 15)][col - 1] == tile_query.PIPE
+    np.all(game_area[:, 0] == tile_query.BLOCK)
+    np.all(game_area[15, col : col + 2] == tile_query.BLOCK)
+
+
+def _plane_class_tests(game_area):
+    obs = observation.Observation(game_area)
+    mario = tile_query.first_in_mask(obs.mario)
+    tile_query.last_in_mask(obs.prize)
+    row, col = mario if mario is not None else (8, 8)
+    obs.empty[row + 1 : row + 5, col + 1 : col + 3].all()
+    obs.pipe[min(row + 1, 15)][col] or obs.pipe[min(row + 1, 15)][col - 1]
+    np.all(obs.block[:, 0])
+    np.all(obs.block[15, col : col + 2])
+
+
+@benchmark("observation")
+def bench_observation(args) -> None:
+    """
+    One decision's tile tests on raw codes versus building the packed observation and using its planes.
+    """
+    grids = load_grids(args.corpus, args.count) if args.corpus else synthetic_grids(args.count)
+    report(
+        "class tests per decision",
+        time_per_call(_raw_class_tests, grids, args.repeat),
+        time_per_call(_plane_class_tests, grids, args.repeat),
+    )
+    logging.info(f"serialised observation: {len(observation.Observation(grids[0]).to_bytes())} bytes")
+
+
+def synthetic_scenes(count: int, seed: int = 0) -> list[SimpleNamespace]:
+    """
+    Stand-in environments holding a random object table around Mario, as RuleContext reads them.
+    """
+    generator = np.random.default_rng(seed)
+    scenes = []
+    for _ in range(count):
+        raw = np.full(object_table.OBJECT_TABLE_END - object_table.OBJECT_TABLE_START, 0xFF, dtype=np.uint8)
+        for slot in range(object_table.OBJECT_SLOTS):
+            if generator.random() < 0.3:
+                base = slot * object_table.OBJECT_SLOT_SIZE
+                raw[base] = generator.choice(object_table.TRACKED_TYPES)
+                raw[base + 2] = generator.integers(60, 120)
+                raw[base + 3] = generator.integers(40, 100)
+        objects = object_table.ObjectTable(raw)
+        ram = SimpleNamespace(mario_x=int(generator.integers(50, 90)), mario_y=90, on_ground=1)
+        scenes.append(
+            SimpleNamespace(objects=lambda objects=objects: objects, snapshot=lambda ram=ram: ram, stuck=0)
+        )
+    return scenes
+
+
+def _cascade_object_rules(environment, p=ExpertParameters()):
+    # The per-slot if/elif cascade object_rules was before the rule table (macros only)
+    ram = environment.snapshot()
+    objects = environment.objects()
+    obj_dx, obj_dy = objects.offsets(ram.mario_x, ram.mario_y)
+    for i in objects.of_type(object_table.TRACKED_TYPES):
+        obj_type = int(objects.types[i])
+        dx = int(obj_dx[i])
+        dy = int(obj_dy[i])
+        if obj_type == object_table.GOOMBA:
+            if dx < p.goomba_dx and dx > 0 and 0 < dy < p.contact_dy:
+                return (4, 1, None, None, False)
+            elif dx < p.goomba_dx and dx > 0 and -p.goomba_below_dy <= dy < 0:
+                return (4, 1, None, None, False)
+            elif -p.goomba_behind_dx < dx < 0 and 0 < dy < p.contact_dy:
+                return (2, 2, 4, 4, False)
+            elif -dy > p.above_dy and p.goomba_above_min_dx < dx < p.above_dx:
+                return (1, 5, None, None, True)
+            elif 3 <= -dy <= 8 and 1 < dx < 5 and ram.on_ground == 0x01:
+                return (4, 5, None, None, False)
+        elif obj_type == object_table.TURTLE:
+            if dx < p.turtle_dx and dx > 0 and dy < p.contact_dy:
+                return (4, 1, None, None, False)
+            elif -dy > p.above_dy and dx < p.above_dx:
+                return (1, 5, None, None, True)
+        elif obj_type == object_table.BAT:
+            if dx < p.bat_dx and dx > 0 and dy < p.contact_dy:
+                return (4, p.high_jump_frames, 2, 1, True)
+            elif -dy > p.above_dy and dx < p.above_dx:
+                return (1, 8, None, None, True)
+        elif obj_type in object_table.POWERUPS:
+            if dx < p.powerup_dx and dx > 0 and dy < p.contact_dy:
+                return (2, 5, None, None, True)
+            elif -dx < p.powerup_dx and -dx > 0 and dy < p.contact_dy:
+                return (1, 5, 4, 1, True)
+            elif -dy > p.above_dy and dx < p.above_dx:
+                return (4, p.jump_frames, 2, 1, False)
+        elif obj_type == object_table.BEE:
+            if dx < p.bee_dx and dx > 0 and dy < p.contact_dy:
+                return (4, 9, None, None, True)
+            elif -dy > p.above_dy and dx < p.above_dx:
+                return (4, 15, None, None, True)
+    return None
+
+
+def _engine_object_rules(engine, environment, p=ExpertParameters()):
+    context = RuleContext(environment, p)
+    rule = engine.match_objects(context)
+    if rule is None:
+        return None
+    return rule.macro(context) if callable(rule.macro) else rule.macro
+
+
+@benchmark("rules")
+def bench_rules(args) -> None:
+    """
+    The object rules as an if/elif cascade versus the compiled rule table, untimed and timed.
+    """
+    scenes = synthetic_scenes(args.count)
+    untimed = RuleEngine(RULES)
+    timed = RuleEngine(RULES, timed=True)
+    for scene in scenes:
+        if _cascade_object_rules(scene) != _engine_object_rules(untimed, scene):
+            raise AssertionError("The rule table and the cascade disagree")
+
+    cascade = time_per_call(_cascade_object_rules, scenes, args.repeat)
+    for label, engine in (("object rules per decision", untimed), ("object rules per decision, timed", timed)):
+        report(label, cascade, time_per_call(lambda scene: _engine_object_rules(engine, scene), scenes, args.repeat))
+    for name, entry in sorted(timed.stats().items(), key=lambda item: -item[1]["total_us"])[:5]:
+        logging.info(f"rule {name}: {entry}")
+
+
+@benchmark("tracker")
+def bench_tracker(args) -> None:
+    """
+    Per-step cost of updating the enemy tracker and predicting contacts, by history length and by how
+    many slots are occupied - both should leave it flat.
+    """
+    p = ExpertParameters()
+    for occupied in (1, 10):
+        generator = np.random.default_rng(0)
+        tables = []
+        for _ in range(args.count):
+            raw = np.full(object_table.OBJECT_TABLE_END - object_table.OBJECT_TABLE_START, 0xFF, dtype=np.uint8)
+            for slot in range(occupied):
+                base = slot * object_table.OBJECT_SLOT_SIZE
+                raw[base] = object_table.GOOMBA
+                raw[base + 2 : base + 4] = generator.integers(40, 120, 2)
+            tables.append(object_table.ObjectTable(raw))
+
+        for history in (4, 8, 64):
+            tracker = enemy_tracker.EnemyTracker(history)
+            frames = iter(range(args.count * args.repeat + 1))
+
+            def track(objects):
+                tracker.update(objects, next(frames), 60, 90)
+                tracker.time_to_contact(p.collision_dx, p.collision_dy, p.collision_frames)
+
+            elapsed = time_per_call(track, tables, args.repeat)
+            logging.info(f"tracker with {occupied} slots, history {history}: {elapsed * 1e6:.2f} us/step")
+
+
+@benchmark("dataset")
+def bench_dataset(args) -> None:
+    """
+    Per-decision cost of appending to an episode dataset, and scan throughput of reading one back.
+    """
+    grids = load_grids(args.corpus, args.count) if args.corpus else synthetic_grids(args.count)
+    ram = RAMSnapshot({addr: 0 for addr in RAM_ADDRESSES}, 0, 0)
+    objects = object_table.ObjectTable.decoded(
+        np.zeros(object_table.OBJECT_SLOTS, dtype=object_table.OBJECT_DTYPE)
+    )
+    controller = {name: 0 for name in lookahead.CONTROLLER_STATE}
+    steps = [
+        SimpleNamespace(
+            snapshot=lambda: ram,
+            game_area=lambda grid=grid: grid,
+            objects=lambda: objects,
+            game_frame=i,
+            **controller,
+        )
+        for i, grid in enumerate(grids)
+    ]
+
+    def record(step):
+        writer.observe(step)
+        writer.append((4, 8, 2, 1, True))
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Small shards, so appends also pay for rolling over to new shards
+        writer = episode_dataset.EpisodeWriter(directory, shard_steps=4096)
+        episodes = 20
+        elapsed = 0.0
+        for _ in range(episodes):
+            writer.begin_episode()
+            elapsed += time_per_call(record, steps, args.repeat)
+            writer.end_episode({"world": 1})
+        writer.close()
+        logging.info(
+            f"append per decision: {elapsed / episodes * 1e6:.2f} us, "
+            f"{episode_dataset.STEP_DTYPE.itemsize} bytes"
+        )
+
+        dataset = episode_dataset.EpisodeDataset(directory)
+        start = time.perf_counter()
+        # Two typical queries - the furthest x reached and how often Mario is on screen
+        max(int(column.max()) for column in dataset.column("x_position"))
+        sum(int(np.count_nonzero(column == tile_query.MARIO)) for column in dataset.column("game_area"))
+        elapsed = time.perf_counter() - start
+        logging.info(
+            f"scanned {dataset.steps} steps in {len(dataset.shards)} shards and {len(dataset)} episodes: "
+            f"{dataset.steps / elapsed / 1e6:.1f} M steps/s"
+        )
+
+
+@benchmark("rollouts")
+def bench_rollouts(args) -> None:
+    """
+    Rollout throughput of one in-process controller versus a pool of worker processes.
+    """
+    environment = default_rom_controller()
+    state = io.BytesIO()
+    environment.pyboy.save_state(state)
+    attributes = lookahead.controller_state(environment)
+    macros = lookahead.CANDIDATES
+    rollouts = args.count // 10
+
+    def serial(macro):
+        lookahead.restore(environment, state.getvalue(), attributes)
+        lookahead.rollout(environment, (macro,), 60)
+
+    jobs = [(state.getvalue(), (macros[i % len(macros)],), 60, attributes, ()) for i in range(rollouts)]
+    before = time_per_call(serial, [job[1][0] for job in jobs], 1)
+
+    with RolloutPool(args.workers, factory=default_rom_controller) as pool:
+        # first map absorbs worker start-up
+        pool.map(jobs[: len(pool.processes)])
+        start = time.perf_counter()
+        pool.map(jobs)
+        after = (time.perf_counter() - start) / rollouts
+        stats = pool.stats()
+
+    report(f"60 frame rollout ({stats['workers']} workers)", before, after)
+    logging.info(f"{1 / after:.1f} rollouts/s, worker utilisation {stats['worker_utilisation']}")
+
+
+@benchmark("startup")
+def bench_startup(args) -> None:
+    """
+    Time to the first emulated frame of a new evaluation: a fresh interpreter building its controller
+    versus a child forked from a warm prototype.
+    """
+    import subprocess
+    import sys
+
+    code = (
+        "import time; start = time.perf_counter(); import benchmark; "
+        "c = benchmark.default_rom_controller(); c.pyboy.tick(); print(time.perf_counter() - start)"
+    )
+    runs = max(1, args.repeat)
+    cold = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=True,
+            capture_output=True,
+        )
+        cold.append(time.perf_counter() - start)
+
+    warm_start.prepare(default_rom_controller)
+
+    def first_frame():
+        environment = DefaultRomController.create(headless=True)
+        environment.pyboy.tick()
+        return time.perf_counter()
+
+    warm = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        for _, first in warm_start.fork_map(first_frame, [()], 1):
+            warm.append(first - start)
+
+    report("time to first frame", float(np.median(cold)), float(np.median(warm)))
+
+
+@benchmark("frames")
+def bench_frames(args) -> None:
+    """
+    Per-step screen handling: choose_action's discarded grab_frame plus a synchronous video frame, versus a
+    lazy frame plus a screen hash that skips unchanged screens.
+    """
+    environment = default_rom_controller()
+    steps = args.count
+    # Ticks per step cycle through short macro lengths so some steps land on unchanged screens
+    ticks = [1 + i % 4 for i in range(steps)]
+    eager_bytes = lazy_frame.SCREEN_BYTES + 2 * 300 * 240 * 3
+
+    def eager_step():
+        PyboyEnvironment.grab_frame(environment)
+        PyboyEnvironment.grab_frame(environment)
+
+    recorded = {"hash": None}
+
+    def lazy_step():
+        environment.frame()
+        screen_hash = environment.screen_hash()
+        if screen_hash != recorded["hash"]:
+            recorded["hash"] = screen_hash
+            environment.grab_frame()
+
+    def handling_time(step) -> float:
+        # Only the screen handling is timed - the emulation between steps is the same for both
+        environment.reset()
+        elapsed = 0.0
+        for tick in ticks:
+            environment.pyboy.tick(tick)
+            start = time.perf_counter()
+            step()
+            elapsed += time.perf_counter() - start
+        return elapsed / steps
+
+    before = handling_time(eager_step)
+    lazy_frame.LazyFrame.bytes_materialised = 0
+    after = handling_time(lazy_step)
+
+    report("screen handling per step", before, after)
+    logging.info(
+        f"bytes copied per step: before {2 * eager_bytes} "
+        f"after {lazy_frame.LazyFrame.bytes_materialised / steps:.0f}"
+    )
+
+
+# Environment calls timed by the environment benchmark, each on a frame nothing has read yet
+ENVIRONMENT_CALLS = {
+    "game_state": lambda environment: environment.game_state(),
+    "game_area": lambda environment: environment.game_area(),
+    "grab_frame": lambda environment: environment.grab_frame(),
+    "get_x_position": lambda environment: environment.get_x_position(),
+    "run_action": lambda environment: environment.run_action(2, 1),
+}
+# Median ceilings per call in microseconds, about ten times the stub's cost on a laptop - they only trip
+# on a gross regression such as a lost per-tick cache
+ENVIRONMENT_BUDGETS_US = {
+    "game_state": 150,
+    "game_area": 250,
+    "grab_frame": 2500,
+    "get_x_position": 150,
+    "run_action": 800,
+}
+# Earlier runs a new run is compared against
+HISTORY_WINDOW = 10
+
+
+def round_stats(times: list[float]) -> dict[str, float]:
+    """
+    Returns min, max, mean, stddev and median in microseconds over the timed rounds.
+    """
+    microseconds = np.array(times) * 1e6
+    return {
+        "min_us": round(float(microseconds.min()), 3),
+        "max_us": round(float(microseconds.max()), 3),
+        "mean_us": round(float(microseconds.mean()), 3),
+        "stddev_us": round(float(microseconds.std()), 3),
+        "median_us": round(float(np.median(microseconds)), 3),
+        "rounds": len(times),
+    }
+
+
+def time_environment_call(environment, call, rounds: int) -> dict[str, float]:
+    """
+    Times call(environment) over rounds rounds, after a tenth as many untimed ones, and returns round_stats.
+    """
+    environment.reset()
+    warmup = max(1, rounds // 10)
+    times = []
+    for i in range(warmup + rounds):
+        # A new frame every round, so per-tick caches start cold like they do in play
+        environment.pyboy.tick(1, True)
+        start = time.perf_counter()
+        call(environment)
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            times.append(elapsed)
+    return round_stats(times)
+
+
+def load_history(path: str) -> list[dict]:
+    if path is None or not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def append_history(path: str, results: dict[str, dict]) -> None:
+    with open(path, "a", encoding="utf-8") as file:
+        file.write(json.dumps({"time": time.time(), "backend": "stub", "results": results}) + "\n")
+
+
+def over_budget(results: dict[str, dict]) -> list[str]:
+    """
+    Returns the calls whose median exceeds their ENVIRONMENT_BUDGETS_US ceiling.
+    """
+    slower = []
+    for name, stats in results.items():
+        budget = ENVIRONMENT_BUDGETS_US.get(name)
+        if budget is not None and stats["median_us"] > budget:
+            logging.warning(f"{name} over budget: median {stats['median_us']:.2f} us, budget {budget} us")
+            slower.append(name)
+    return slower
+
+
+def regressions(results: dict[str, dict], history: list[dict], max_slowdown: float) -> list[str]:
+    """
+    Returns the calls whose median is more than max_slowdown times the median of their last
+    HISTORY_WINDOW recorded medians.
+    """
+    slower = []
+    for name, stats in results.items():
+        medians = [
+            entry["results"][name]["median_us"] for entry in history[-HISTORY_WINDOW:] if name in entry["results"]
+        ]
+        if not medians:
+            continue
+        baseline = float(np.median(medians))
+        if stats["median_us"] > baseline * max_slowdown:
+            logging.warning(
+                f"{name} regressed: median {stats['median_us']:.2f} us against {baseline:.2f} us over the last "
+                f"{len(medians)} runs (threshold {max_slowdown}x)"
+            )
+            slower.append(name)
+    return slower
+
+
+@benchmark("environment")
+def bench_environment(args) -> list[str]:
+    """
+    Per-call cost of the environment layer on the ROM-free stub backend, checked against
+    ENVIRONMENT_BUDGETS_US and, with --history, against the runs recorded there before being appended.
+    Returns the calls that failed a check. tests/test_environment_benchmarks.py runs the same checks
+    under pytest.
+    """
+    environment = stub_controller()
+
+    results = {}
+    for name, call in ENVIRONMENT_CALLS.items():
+        stats = results[name] = time_environment_call(environment, call, args.count)
+        logging.info(
+            f"{name}: min {stats['min_us']:.2f} mean {stats['mean_us']:.2f} +- {stats['stddev_us']:.2f} "
+            f"median {stats['median_us']:.2f} us over {stats['rounds']} rounds"
+        )
+
+    slower = over_budget(results)
+    if args.history is not None:
+        slower += regressions(results, load_history(args.history), args.max_slowdown)
+        append_history(args.history, results)
+    return slower
+
+
+def get_args():
+    parse_args = argparse.ArgumentParser()
+
+    parse_args.add_argument("benchmarks", nargs="*", default=list(BENCHMARKS))
+    parse_args.add_argument("--corpus", type=str, default=None)
+    parse_args.add_argument("--count", type=int, default=500)
+    parse_args.add_argument("--repeat", type=int, default=5)
+    parse_args.add_argument("--workers", type=int, default=os.cpu_count())
+
+    # JSON lines of earlier environment runs - results are appended and compared against them
+    parse_args.add_argument("--history", type=str, default=None)
+    parse_args.add_argument("--max_slowdown", type=float, default=1.5)
+
+    return parse_args.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = get_args()
+
+    regressed = []
+    for name in args.benchmarks:
+        logging.info(f"Running benchmark: {name}")
+        regressed += BENCHMARKS[name](args) or []
+
+    if regressed:
+        logging.error(f"Regressions: {regressed}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
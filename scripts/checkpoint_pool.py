@@ -0,0 +1,126 @@
+"""
+In-memory emulator save states captured during a run.
+
+A CheckpointPool watches a MarioController every step and captures pyboy.save_state into memory when
+a trigger fires - a new (world, stage), an x_position milestone within a stage or every N frames.
+The pool is LRU bounded by total bytes and can be saved to and loaded from a directory, so a later
+run can reset straight to, say, world 1-2 instead of playing through 1-1 first.
+
+Checkpoint names:
+    w1-s2           first frame seen in world 1 stage 2
+    w1-s2-x1500     first frame past x_position 1500 in world 1 stage 2
+    frame3600       3600 frames into the run
+"""
+
+import io
+import logging
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+STATE_SUFFIX = ".state"
+
+
+class CheckpointPool:
+    """
+    Args:
+        max_bytes (int): Total size of the kept save states before the least recently used are
+            evicted. Defaults to 64 MB.
+        on_stage_change (bool): Capture when the (world, stage) changes. Defaults to True.
+        x_interval (int): Capture every x_interval of x_position within a stage, 0 to disable.
+        frame_interval (int): Capture every frame_interval frames, 0 to disable.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        on_stage_change: bool = True,
+        x_interval: int = 0,
+        frame_interval: int = 0,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.on_stage_change = on_stage_change
+        self.x_interval = x_interval
+        self.frame_interval = frame_interval
+
+        self.states = OrderedDict()
+        self.size = 0
+
+        self._stage = None
+        self._next_x = 0
+        self._next_frame = frame_interval
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.states
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def names(self) -> list[str]:
+        return list(self.states)
+
+    def add(self, name: str, state: bytes) -> None:
+        if name in self.states:
+            self.size -= len(self.states.pop(name))
+        self.states[name] = state
+        self.size += len(state)
+
+        while self.size > self.max_bytes and len(self.states) > 1:
+            evicted, old_state = self.states.popitem(last=False)
+            self.size -= len(old_state)
+            logging.debug(f"Evicted checkpoint {evicted}")
+
+    def capture(self, name: str, pyboy) -> None:
+        with io.BytesIO() as buffer:
+            pyboy.save_state(buffer)
+            self.add(name, buffer.getvalue())
+        logging.debug(f"Captured checkpoint {name}")
+
+    def get(self, name: str) -> bytes:
+        """
+        Returns the save state of a checkpoint, marking it as recently used.
+        """
+        if name not in self.states:
+            raise KeyError(f"Unknown checkpoint {name} - available: {self.names()}")
+        self.states.move_to_end(name)
+        return self.states[name]
+
+    def restore(self, name: str, pyboy) -> None:
+        with io.BytesIO(self.get(name)) as buffer:
+            pyboy.load_state(buffer)
+
+    def observe(self, environment) -> None:
+        """
+        Checks the triggers against the controller's current frame and captures what fires.
+        """
+        ram = environment.snapshot()
+        pyboy = environment.pyboy
+        stage = (ram.world, ram.stage)
+
+        if stage != self._stage:
+            self._stage = stage
+            self._next_x = self.x_interval
+            if self.on_stage_change:
+                self.capture(f"w{stage[0]}-s{stage[1]}", pyboy)
+
+        if self.x_interval > 0 and ram.x_position >= self._next_x:
+            milestone = ram.x_position - ram.x_position % self.x_interval
+            self.capture(f"w{stage[0]}-s{stage[1]}-x{milestone}", pyboy)
+            self._next_x = milestone + self.x_interval
+
+        frame = environment.game_frame
+        if self.frame_interval > 0 and frame >= self._next_frame:
+            self.capture(f"frame{frame}", pyboy)
+            self._next_frame = frame + self.frame_interval
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        for name, state in self.states.items():
+            with open(Path(directory) / f"{name}{STATE_SUFFIX}", "wb") as file:
+                file.write(state)
+        logging.info(f"Saved {len(self.states)} checkpoints ({self.size} bytes) to {directory}")
+
+    def load(self, directory: str) -> None:
+        for path in sorted(Path(directory).glob(f"*{STATE_SUFFIX}")):
+            self.add(path.name[: -len(STATE_SUFFIX)], path.read_bytes())
+        logging.info(f"Loaded {len(self.states)} checkpoints from {directory}")
@@ -31,6 +31,10 @@ def get_args():
 
     parse_args.add_argument("-r", "--results_path", type=str, required=True)
 
+    # Ingest new runs into a results store (see results_store.py) and rank from its index instead
+    parse_args.add_argument("--db", type=str, default=None)
+    parse_args.add_argument("-k", "--top", type=int, default=None)
+
     return parse_args.parse_args()
 
 
@@ -39,6 +43,15 @@ def main():
 
     results_path = args.results_path
 
+    if args.db is not None:
+        from results_store import ResultsStore
+
+        with ResultsStore(args.db) as store:
+            store.ingest(results_path)
+            results = store.top(args.top)
+        log_ranking(results)
+        return
+
     result_directories = glob.glob(f"{results_path}/*")
     logging.info(f"Found {len(result_directories)} results directories")
     logging.info(f"Results directories: {result_directories}")
@@ -57,7 +70,10 @@ def main():
             results.append(result)
 
     results = sorted(results, key=cmp_to_key(compare_performance))
+    log_ranking(results[: args.top])
+
 
+def log_ranking(results):
     for i, result in enumerate(results):
         logging.info(
             f"Rank {i + 1}: {result['upi']} - World: {result['world']} Stage: {result['stage']} Score: {result['score']}"
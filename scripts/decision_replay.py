@@ -0,0 +1,221 @@
+"""
+Offline re-runs of MarioExpert.choose_action over recorded episodes (see episode_dataset.py) - no ROM
+and no emulator.
+
+ReplayEnvironment stands in for MarioController. It serves one recorded step at a time through the
+interface the expert and its detectors read (_read_m, game_area, get_x_position, snapshot, objects,
+observation, game_state) and loads the controller state the recorded decision was made from, so every
+record is decided independently of how the decisions before it went.
+
+Decisions are timed one by one and compared with a baseline - the recorded actions, or the decisions
+of an earlier replay saved with --save - so a logic change can be checked against every recorded state
+in seconds.
+
+python3 decision_replay.py ../datasets/1-1 --save before.npy
+python3 decision_replay.py ../datasets/1-1 --baseline before.npy --parameters best.json
+"""
+
+import argparse
+import json
+import logging
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+import episode_dataset
+import hazard_table
+import observation
+from expert_parameters import ExpertParameters
+from lookahead import CONTROLLER_STATE
+from mario_expert import MarioController, MarioExpert
+from object_table import ObjectTable
+from ram_snapshot import ADDR_LEVEL_BLOCK, ADDR_MARIO_X, RAM_ADDRESSES, RAMSnapshot
+
+
+class ReplayEnvironment:
+    """
+    A MarioController stand-in that plays back the records of an episode dataset.
+    """
+
+    def __init__(self) -> None:
+        self.pyboy = SimpleNamespace(frame_count=0)
+        self.game_frame = 0
+        self.hazards = hazard_table.HazardIndex()
+        self.parameters = ExpertParameters()
+        self.tracker = None
+        self.checkpoints = None
+        self.level_maps = None
+        for name in CONTROLLER_STATE:
+            setattr(self, name, 0)
+
+        self.record = None
+        self._snapshot = None
+        self._objects = None
+        self._observation = None
+
+    def reset(self) -> None:
+        pass
+
+    def load(self, record) -> None:
+        """
+        Makes one record of STEP_DTYPE the current tick.
+        """
+        self.record = record
+        self.pyboy.frame_count = self.game_frame = int(record["frame"])
+        for name, value in zip(CONTROLLER_STATE, record["controller"].tolist()):
+            setattr(self, name, value)
+
+        values = dict(zip(RAM_ADDRESSES, record["ram"].tolist()))
+        # The scroll x that reproduces the recorded x_position (see RAMSnapshot.x_position)
+        real = int(record["x_position"]) - values[ADDR_LEVEL_BLOCK] * 16 - values[ADDR_MARIO_X]
+        self._snapshot = RAMSnapshot(values, (real + 7) % 16, 0)
+        self._objects = ObjectTable.decoded(record["objects"])
+        self._observation = observation.Observation(record["game_area"])
+
+    def _read_m(self, addr: int) -> int:
+        if addr not in self._snapshot:
+            raise KeyError(f"Address {addr:#06x} is not recorded in episode datasets")
+        return self._snapshot[addr]
+
+    def snapshot(self) -> RAMSnapshot:
+        return self._snapshot
+
+    def game_state(self) -> dict[str, any]:
+        return self._snapshot.game_state()
+
+    def game_area(self) -> np.ndarray:
+        return self.record["game_area"]
+
+    def objects(self) -> ObjectTable:
+        return self._objects
+
+    def observation(self) -> observation.Observation:
+        return self._observation
+
+    def frame(self, height: int = 240, width: int = 300) -> None:
+        # No screen is recorded - choose_action does not look at the frame
+        return None
+
+    def get_x_position(self) -> int:
+        return int(self.record["x_position"])
+
+    def get_game_over(self) -> bool:
+        return self._snapshot.game_over
+
+
+def replay_expert(parameters: ExpertParameters = None) -> MarioExpert:
+    """
+    Builds a MarioExpert on a ReplayEnvironment, through the same prototype hook warm_start.py uses.
+    """
+    MarioController.prototype = ReplayEnvironment()
+    expert = MarioExpert(results_path=".", headless=True)
+    if parameters is not None:
+        expert.configure(parameters)
+    return expert
+
+
+def replay(expert: MarioExpert, records: list[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Re-decides every record and returns the encoded actions and the seconds each decision took.
+    """
+    environment = expert.environment
+    count = sum(len(steps) for steps in records)
+    actions = np.empty((count, episode_dataset.ACTION_FIELDS), dtype=np.int16)
+    latencies = np.empty(count)
+
+    i = 0
+    for steps in records:
+        for record in steps:
+            environment.load(record)
+            start = time.perf_counter()
+            macro = expert.choose_action()
+            latencies[i] = time.perf_counter() - start
+            actions[i] = episode_dataset.encode_action(macro)
+            i += 1
+    return actions, latencies
+
+
+def latency_summary(latencies: np.ndarray) -> dict[str, float]:
+    total = float(latencies.sum())
+    microseconds = latencies * 1e6
+    return {
+        "decisions": len(latencies),
+        "decisions_per_second": round(len(latencies) / total, 1) if total > 0 else 0.0,
+        "p50_us": round(float(np.percentile(microseconds, 50)), 2),
+        "p95_us": round(float(np.percentile(microseconds, 95)), 2),
+        "p99_us": round(float(np.percentile(microseconds, 99)), 2),
+        "max_us": round(float(microseconds.max()), 2),
+    }
+
+
+def diff(actions: np.ndarray, baseline: np.ndarray) -> np.ndarray:
+    """
+    Returns the indices of the decisions that differ from the baseline.
+    """
+    if actions.shape != baseline.shape:
+        raise ValueError(f"Baseline holds {len(baseline)} decisions, the replay {len(actions)}")
+    return np.flatnonzero((actions != baseline).any(axis=1))
+
+
+def get_args():
+    parse_args = argparse.ArgumentParser()
+
+    parse_args.add_argument("dataset", type=str)
+    # Replay only these episodes (all by default)
+    parse_args.add_argument("--episodes", type=int, nargs="*", default=None)
+    parse_args.add_argument("--parameters", type=str, default=None)
+
+    # .npy of decisions from an earlier replay to compare against instead of the recorded actions
+    parse_args.add_argument("--baseline", type=str, default=None)
+    parse_args.add_argument("--save", type=str, default=None)
+    parse_args.add_argument("--show", type=int, default=10)
+
+    return parse_args.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = get_args()
+
+    dataset = episode_dataset.EpisodeDataset(args.dataset)
+    if dataset.version < episode_dataset.DATASET_VERSION:
+        raise ValueError(
+            f"{args.dataset} is a version {dataset.version} dataset, recorded without the object table and "
+            f"controller state decisions are made from - re-record it with run.py --dataset to replay it"
+        )
+    if args.episodes is None:
+        records = dataset.shards
+    else:
+        records = [dataset.episode(episode) for episode in args.episodes]
+
+    parameters = None
+    if args.parameters is not None:
+        with open(args.parameters, "r", encoding="utf-8") as file:
+            parameters = ExpertParameters.from_dict(json.load(file))
+
+    expert = replay_expert(parameters)
+    actions, latencies = replay(expert, records)
+    logging.info(f"Replay: {latency_summary(latencies)}")
+
+    if args.save is not None:
+        np.save(args.save, actions)
+
+    if args.baseline is not None:
+        baseline = np.load(args.baseline)
+    else:
+        baseline = np.concatenate([steps["action"] for steps in records])
+    changed = diff(actions, baseline)
+    logging.info(f"{len(changed)} of {len(actions)} decisions differ from the baseline")
+
+    recorded = np.concatenate([steps[["episode", "step", "x_position"]] for steps in records])
+    for i in changed[: args.show]:
+        episode, step, x_position = recorded[i].tolist()
+        logging.info(
+            f"Episode {episode} step {step} x {x_position}: "
+            f"{episode_dataset.decode_action(baseline[i])} -> {episode_dataset.decode_action(actions[i])}"
+        )
+
+
+if __name__ == "__main__":
+    main()
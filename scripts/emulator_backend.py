@@ -0,0 +1,78 @@
+"""
+Pluggable emulator backends under the environment layer.
+
+PyboyEnvironment builds a PyBoy for the Mario ROM in its constructor and must not be edited, so a
+backend is chosen through the MRO instead: BackendEnvironment slots in under MarioEnvironment and builds
+self.pyboy by calling its `backend` class attribute. A backend is anything offering the part of PyBoy
+the environment layer uses:
+
+    memory[addr], memory[start:end]
+    screen.ndarray, screen.tilemap_position_list
+    game_wrapper.game_area_mapping(), game_wrapper.mapping_compressed, game_wrapper.game_area(),
+    game_wrapper.score
+    tick(count, render), send_input(event), set_emulation_speed(speed)
+    save_state(file), load_state(file), frame_count
+
+The state boot_frames frames after the backend is built stands in for init.state, so a BackendController
+plays, resets and saves states without anything under roms/. rom_path and init_path name the backend
+instead of files, for the code that reports them (see replay_log.py).
+
+StubController is a MarioController on StubPyBoy (see stub_pyboy.py) - deterministic and ROM-free. Any
+other MarioEnvironment subclass, e.g. the baseline template's MarioController, goes on a backend the same way:
+
+class StubBaselineController(BaselineController, BackendEnvironment):
+    backend = StubPyBoy
+
+environment = stub_controller()
+environment.run_action(2, 8)
+"""
+
+import io
+
+from mario_expert import MarioController
+from pyboy_environment import PyboyEnvironment
+from stub_pyboy import StubPyBoy
+
+
+class BackendEnvironment(PyboyEnvironment):
+    """
+    A PyboyEnvironment on self.backend() instead of a PyBoy for the ROM under roms/.
+    """
+
+    backend = None
+    boot_frames = 60
+
+    def __init__(self, task, rom_name, init_name, emulation_speed=0, headless=False) -> None:
+        self.task = task
+        self.rom_path = self.init_path = f"<{self.backend.__name__} after {self.boot_frames} frames>"
+        self.pyboy = self.backend()
+        self.screen = self.pyboy.screen
+        self.pyboy.set_emulation_speed(emulation_speed)
+
+        self.pyboy.tick(self.boot_frames, False)
+        boot_state = io.BytesIO()
+        self.pyboy.save_state(boot_state)
+        self.boot_state = boot_state.getvalue()
+
+        self.reset()
+
+    def reset(self) -> None:
+        # PyboyEnvironment.reset opens init_path - controllers without their own reset start from boot_state
+        self.pyboy.load_state(io.BytesIO(self.boot_state))
+
+
+class BackendController(MarioController, BackendEnvironment):
+    """
+    A MarioController on a pluggable backend - subclasses set backend.
+    """
+
+    def init_state(self) -> bytes:
+        return self.boot_state
+
+
+class StubController(BackendController):
+    backend = StubPyBoy
+
+
+def stub_controller() -> StubController:
+    return StubController(emulation_speed=0, headless=True)
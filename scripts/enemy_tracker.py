@@ -0,0 +1,148 @@
+"""
+Per-slot motion history of the object table, for acting on where enemies are going rather than where
+they are.
+
+EnemyTracker keeps the last `history` offsets (object - mario, as ObjectTable.offsets returns them) of
+all 10 object slots in one ring buffer, stamped with the frame they were seen on. Offsets are relative
+to Mario, so screen scrolling cancels out and velocities are relative to him too.
+
+A slot's history restarts when its type byte changes or its object jumps further than max_jump pixels
+between two samples - the game reused the slot for a new object. Samples may be taken at any interval and
+velocities are per frame, with frames counted in MarioController.game_frame.
+
+PyBoy's load_state never rewinds frame_count, so a loaded state cannot be told from the frames alone.
+MarioController.reset clears the tracker, and load_state - e.g. lookahead's restore(), which takes the
+rolled out frames off game_frame first - rewinds it to the frame the emulator went back to.
+
+Every update and estimate is a handful of numpy operations over the 10 slots, so the per-step cost does
+not depend on how many objects are on screen or how long the history is.
+
+tracker.update(environment.objects(), frame, ram.mario_x, ram.mario_y)
+frames = tracker.time_to_contact(reach_x=10, reach_y=12, horizon=30) # per slot, inf if no contact
+"""
+
+import numpy as np
+
+from object_table import OBJECT_SLOTS, ObjectTable
+
+NO_TYPE = 0xFF
+# Pixels per frame standing in for zero velocity when solving for contact
+STILL = 1e-9
+
+
+class EnemyTracker:
+    """
+    Args:
+        history (int, optional): Samples kept per slot. Defaults to 8.
+        max_jump (int, optional): Pixels an object may move between two samples before it is taken for a
+            new object in the same slot. Defaults to 24.
+    """
+
+    def __init__(self, history: int = 8, max_jump: int = 24) -> None:
+        if history < 2:
+            raise ValueError("A velocity needs a history of at least 2 samples")
+        self.history = history
+        self.max_jump = max_jump
+
+        self.offsets = np.zeros((history, OBJECT_SLOTS, 2), dtype=np.int16)
+        self.frames = np.zeros(history, dtype=np.int64)
+        self.types = np.full(OBJECT_SLOTS, NO_TYPE, dtype=np.uint8)
+        # Consecutive samples of the current object per slot, capped at history
+        self.samples = np.zeros(OBJECT_SLOTS, dtype=np.int64)
+        self.head = -1
+        self.updates = 0
+        self.slot_restarts = 0
+
+        self._slots = np.arange(OBJECT_SLOTS)
+
+    def clear(self) -> None:
+        self.types[:] = NO_TYPE
+        self.samples[:] = 0
+        self.head = -1
+
+    def rewind(self, frame: int) -> None:
+        """
+        Forgets the history if any of it was seen after frame - the slots' samples interleave in one ring
+        buffer, so it is all or nothing.
+        """
+        if self.head >= 0 and self.frames[self.head] > frame:
+            self.clear()
+
+    def update(self, objects: ObjectTable, frame: int, mario_x: int, mario_y: int) -> None:
+        """
+        Records the object table seen on frame. A second update on the same frame is ignored, and a frame
+        before the last one starts the history over.
+        """
+        if self.head >= 0:
+            last = self.frames[self.head]
+            if frame == last:
+                return
+            if frame < last:
+                self.clear()
+
+        head = (self.head + 1) % self.history
+        offsets = self.offsets[head]
+        offsets[:, 0] = objects.objects["x"]
+        offsets[:, 1] = objects.objects["y"]
+        offsets -= (mario_x, mario_y)
+        self.frames[head] = frame
+
+        types = objects.types
+        restarted = types != self.types
+        if self.head >= 0:
+            moved = np.abs(offsets - self.offsets[self.head]) > self.max_jump
+            restarted |= moved[:, 0] | moved[:, 1]
+        self.samples += 1
+        np.minimum(self.samples, self.history, out=self.samples)
+        self.samples[restarted] = 1
+        self.types[:] = types
+        self.head = head
+        self.updates += 1
+        self.slot_restarts += int(np.count_nonzero(restarted & (types != NO_TYPE)))
+
+    def velocity(self) -> np.ndarray:
+        """
+        Returns the (vx, vy) of every slot in pixels per frame relative to Mario, over the slot's whole
+        history. Slots with a single sample have zero velocity.
+        """
+        if self.head < 0:
+            return np.zeros((OBJECT_SLOTS, 2))
+        oldest = (self.head - (self.samples - 1)) % self.history
+        span = self.frames[self.head] - self.frames[oldest]
+        displacement = self.offsets[self.head] - self.offsets[oldest, self._slots]
+        return displacement / np.maximum(span, 1)[:, None]
+
+    def time_to_contact(self, reach_x: int, reach_y: int, horizon: int) -> np.ndarray:
+        """
+        Returns, per slot, the frames until the object comes within reach_x and reach_y pixels of Mario if
+        both keep their current relative velocity - 0 if it already is, inf if it does not happen within
+        horizon frames or the slot has fewer than 2 samples.
+        """
+        contact = np.full(OBJECT_SLOTS, np.inf)
+        if self.head < 0:
+            return contact
+
+        position = self.offsets[self.head]
+        velocity = self.velocity()
+        reach = np.array([reach_x, reach_y], dtype=np.float64)
+
+        # Per axis, the interval of t where |position + velocity * t| <= reach. A still axis moves at
+        # STILL instead, so its interval is practically (-inf, inf) when within reach and never otherwise -
+        # offsets are whole pixels, so half a pixel more reach keeps one exactly at the edge within it.
+        still = velocity == 0
+        velocity[still] = STILL
+        reach = reach + 0.5 * still
+        inverse = 1.0 / velocity
+        first = (-reach - position) * inverse
+        second = (reach - position) * inverse
+        low = np.minimum(first, second)
+        high = np.maximum(first, second)
+
+        enter = np.maximum(np.maximum(low[:, 0], low[:, 1]), 0.0)
+        leave = np.minimum(high[:, 0], high[:, 1])
+        hit = (enter <= leave) & (enter <= horizon) & (self.samples >= 2)
+        contact[hit] = enter[hit]
+        return contact
+
+    def stats(self) -> dict[str, int]:
+        return {"updates": self.updates, "slot_restarts": self.slot_restarts}
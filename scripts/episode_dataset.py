@@ -0,0 +1,281 @@
+"""
+Per-step datasets of MarioExpert runs for offline analysis.
+
+Every decision is appended as one fixed-width record - the 16 x 20 game_area, the RAMSnapshot bytes,
+the decoded object table, Mario's x position, the controller state the expert decided from and the
+chosen macro-action - to .npy shards of shard_steps records each, written through np.memmap. That is
+everything choose_action reads, so decision_replay.py can re-run the expert on the records offline.
+index.json lists the shards with how many records each holds and every episode as the (shard, start,
+stop) segments it occupies, with its final game_state.
+
+Shards are plain .npy files, so a reader maps them with np.load(mmap_mode="r") and every field of
+every step is a zero-copy slice - scanning thousands of episodes only touches the pages it reads.
+
+dataset = EpisodeDataset("../datasets/1-1")
+for steps in dataset.shards:
+    ground = steps["ram"][:, RAM_COLUMNS[ADDR_ON_GROUND]]
+areas = dataset.episode(3)["game_area"]
+
+python3 episode_dataset.py ../datasets/1-1
+"""
+
+import argparse
+import json
+import logging
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from lookahead import CONTROLLER_STATE
+from object_table import OBJECT_DTYPE, OBJECT_SLOTS
+from ram_snapshot import RAM_ADDRESSES
+
+DATASET_VERSION = 2
+# Versions EpisodeDataset reads. Version 1 records lack the objects and controller fields, so they can be
+# analysed but not replayed (see decision_replay.py) or appended to.
+READABLE_VERSIONS = (1, 2)
+
+# Macro-actions are stored as (action, duration, action2, duration2, sprint), NONE for a missing value
+NONE = -1
+ACTION_FIELDS = 5
+
+STEP_DTYPE = np.dtype(
+    [
+        ("episode", np.uint32),
+        ("step", np.uint32),
+        ("frame", np.uint32),
+        ("x_position", np.uint32),
+        ("game_area", np.uint8, (16, 20)),
+        ("ram", np.uint8, (len(RAM_ADDRESSES),)),
+        ("objects", OBJECT_DTYPE, (OBJECT_SLOTS,)),
+        ("controller", np.int32, (len(CONTROLLER_STATE),)),
+        ("action", np.int16, (ACTION_FIELDS,)),
+    ]
+)
+
+# Column of each captured address in the ram field
+RAM_COLUMNS = {addr: column for column, addr in enumerate(RAM_ADDRESSES)}
+
+
+def encode_action(macro) -> tuple:
+    """
+    Fixed-width form of a macro-action tuple or a bare action index.
+    """
+    if not isinstance(macro, tuple):
+        macro = (macro,)
+    values = [NONE if value is None else int(value) for value in macro]
+    return tuple(values + [NONE] * (ACTION_FIELDS - len(values)))
+
+
+def decode_action(row) -> tuple:
+    action, duration, action2, duration2, sprint = (int(value) for value in row)
+    return (
+        action,
+        None if duration == NONE else duration,
+        None if action2 == NONE else action2,
+        None if duration2 == NONE else duration2,
+        None if sprint == NONE else bool(sprint),
+    )
+
+
+def shard_name(index: int) -> str:
+    return f"shard-{index:05d}.npy"
+
+
+class EpisodeWriter:
+    """
+    Appends steps to a dataset directory, continuing an existing dataset there.
+
+    Args:
+        directory (str): The dataset directory, created if needed.
+        shard_steps (int, optional): Records per shard. Defaults to 65536 (about 27 MB).
+    """
+
+    def __init__(self, directory: str, shard_steps: int = 65536) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self.index_path = self.directory / "index.json"
+        if self.index_path.exists():
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                self.index = json.load(file)
+            if self.index["version"] != DATASET_VERSION:
+                raise ValueError(
+                    f"{directory} holds a version {self.index['version']} dataset and this writer records "
+                    f"version {DATASET_VERSION} - record into a new directory"
+                )
+        else:
+            self.index = {"version": DATASET_VERSION, "shard_steps": shard_steps, "shards": [], "episodes": []}
+        self.shard_steps = self.index["shard_steps"]
+
+        self.shard = None
+        self.position = 0
+        self.episode = None
+        self.segment_start = 0
+        self.steps = 0
+
+    def _open_shard(self) -> None:
+        shards = self.index["shards"]
+        if shards and shards[-1]["steps"] < self.shard_steps:
+            # Carry on filling the last shard of an earlier session
+            self.shard = np.load(self.directory / shards[-1]["file"], mmap_mode="r+")
+            self.position = shards[-1]["steps"]
+        else:
+            name = shard_name(len(shards))
+            self.shard = np.lib.format.open_memmap(
+                self.directory / name, mode="w+", dtype=STEP_DTYPE, shape=(self.shard_steps,)
+            )
+            shards.append({"file": name, "steps": 0})
+            self.position = 0
+        self.segment_start = self.position
+
+    def _close_segment(self) -> None:
+        if self.position > self.segment_start:
+            shard = len(self.index["shards"]) - 1
+            self.episode["segments"].append([shard, self.segment_start, self.position])
+            self.index["shards"][shard]["steps"] = self.position
+
+    def begin_episode(self, **metadata) -> int:
+        """
+        Starts a new episode, ending any open one, and returns its id.
+        """
+        if self.episode is not None:
+            self.end_episode()
+        self.episode = {"episode": len(self.index["episodes"]), "steps": 0, "segments": [], **metadata}
+        self.steps = 0
+        if self.shard is None:
+            self._open_shard()
+        self.segment_start = self.position
+        return self.episode["episode"]
+
+    def observe(self, environment) -> None:
+        """
+        Records the controller's current tick and state, before the expert decides on it. Observing again
+        without an append() in between overwrites the observation.
+        """
+        if self.position == self.shard_steps:
+            self._close_segment()
+            self.shard.flush()
+            self._open_shard()
+
+        ram = environment.snapshot()
+        row = self.shard[self.position]
+        row["episode"] = self.episode["episode"]
+        row["step"] = self.steps
+        row["frame"] = environment.game_frame
+        row["x_position"] = ram.x_position
+        row["game_area"] = environment.game_area()
+        row["ram"] = ram.as_array()
+        row["objects"] = environment.objects().objects
+        row["controller"] = [getattr(environment, name) for name in CONTROLLER_STATE]
+
+    def append(self, macro) -> None:
+        """
+        Completes the observed record with the macro-action the expert chose.
+        """
+        self.shard[self.position]["action"] = encode_action(macro)
+        self.position += 1
+        self.steps += 1
+
+    def end_episode(self, final_state: dict = None) -> None:
+        if self.episode is None:
+            return
+        self._close_segment()
+        self.episode["steps"] = self.steps
+        if final_state is not None:
+            self.episode["final_state"] = final_state
+        self.index["episodes"].append(self.episode)
+        self.episode = None
+        self.shard.flush()
+        self._save_index()
+
+    def _save_index(self) -> None:
+        # Write then rename, so a reader never sees a half-written index
+        temporary = self.index_path.with_suffix(".tmp")
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(self.index, file)
+        temporary.replace(self.index_path)
+
+    def close(self) -> None:
+        self.end_episode()
+        if self.shard is not None:
+            self.shard.flush()
+            self.shard = None
+
+
+class EpisodeDataset:
+    """
+    Read-only, memory-mapped view of a dataset directory. Shards keep the dtype they were recorded with,
+    so a version 1 dataset reads without the objects and controller fields.
+
+    Args:
+        directory (str): The dataset directory.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = Path(directory)
+        with open(self.directory / "index.json", "r", encoding="utf-8") as file:
+            self.index = json.load(file)
+        self.version = self.index["version"]
+        if self.version not in READABLE_VERSIONS:
+            raise ValueError(f"Unsupported dataset version {self.version} in {directory}")
+
+        # Only the records the index accounts for - anything after them is an unfinished episode
+        self.shards = [
+            np.load(self.directory / shard["file"], mmap_mode="r")[: shard["steps"]]
+            for shard in self.index["shards"]
+        ]
+        self.episodes = self.index["episodes"]
+
+    def __len__(self) -> int:
+        return len(self.episodes)
+
+    @property
+    def steps(self) -> int:
+        return sum(len(shard) for shard in self.shards)
+
+    def episode(self, episode: int) -> np.ndarray:
+        """
+        Returns the steps of one episode - a view of its shard unless it spans several.
+        """
+        segments = self.episodes[episode]["segments"]
+        views = [self.shards[shard][start:stop] for shard, start, stop in segments]
+        if len(views) == 1:
+            return views[0]
+        return np.concatenate(views) if views else np.empty(0, dtype=STEP_DTYPE)
+
+    def column(self, field: str) -> list[np.ndarray]:
+        """
+        Returns one field of every step as per-shard views.
+        """
+        return [shard[field] for shard in self.shards]
+
+
+def get_args():
+    parse_args = argparse.ArgumentParser()
+
+    parse_args.add_argument("dataset", type=str)
+
+    return parse_args.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = get_args()
+
+    dataset = EpisodeDataset(args.dataset)
+    logging.info(f"{len(dataset)} episodes, {dataset.steps} steps in {len(dataset.shards)} shards")
+
+    actions = Counter()
+    for shard in dataset.column("action"):
+        values, counts = np.unique(shard[:, 0], return_counts=True)
+        actions.update(dict(zip(values.tolist(), counts.tolist())))
+    logging.info(f"Steps per action: {dict(sorted(actions.items()))}")
+
+    for episode in dataset.episodes[-10:]:
+        logging.info(f"Episode {episode['episode']}: {episode['steps']} steps, {episode.get('final_state')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+The tunable thresholds and macro durations of MarioExpert as one typed, immutable parameter set.
+
+Defaults are the values the expert was hand-tuned with, so ExpertParameters() plays exactly as before.
+Distances are in pixels between an object and Mario (object - mario, as ObjectTable.offsets returns
+them) and durations in frames.
+"""
+
+from dataclasses import asdict, dataclass, fields
+
+
+@dataclass(frozen=True)
+class ExpertParameters:
+    # Enemy reactions - an enemy ahead within *_dx pixels and contact_dy pixels vertically is jumped
+    goomba_dx: int = 15
+    goomba_below_dy: int = 5
+    goomba_behind_dx: int = 5
+    turtle_dx: int = 12
+    bat_dx: int = 12
+    bee_dx: int = 12
+    powerup_dx: int = 10
+    contact_dy: int = 3
+
+    # Something more than above_dy pixels overhead and less than above_dx pixels ahead
+    above_dy: int = 5
+    above_dx: int = 20
+    goomba_above_min_dx: int = 13
+
+    # Jump durations
+    jump_frames: int = 8
+    high_jump_frames: int = 14
+    gap_jump_frames: int = 19
+
+    # Predicted collisions, when an EnemyTracker is attached - an enemy whose current velocity brings it
+    # within collision_dx and collision_dy pixels of Mario in at most collision_frames frames is jumped
+    collision_frames: int = 12
+    collision_dx: int = 10
+    collision_dy: int = 12
+
+    # Consecutive stuck decisions before a wall jump, and before backing off left
+    wall_jump_stuck: int = 3
+    stuck_escape: int = 4
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, values: dict) -> "ExpertParameters":
+        """
+        Builds a parameter set from a (partial) dict, casting values to the declared types.
+        """
+        types = {field.name: field.type for field in fields(cls)}
+        unknown = set(values) - set(types)
+        if unknown:
+            raise ValueError(f"Unknown expert parameters: {sorted(unknown)}")
+        return cls(**{name: _cast(types[name], value) for name, value in values.items()})
+
+
+def _cast(kind, value):
+    kind = {"int": int, "float": float, "bool": bool}.get(kind, kind)
+    if kind is int and isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"Expected an integer, got {value}")
+    return kind(value)
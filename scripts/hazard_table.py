@@ -0,0 +1,187 @@
+"""
+Per-stage hazard and macro-action lookup tables indexed by x_position.
+
+Tables are precomputed offline from the stitched level maps (see level_map.py): every x_position of
+a stage gets a set of hazard flags and optionally the macro-action the expert should take there. At
+runtime MarioController.hazards.lookup(world, stage, x_position) is two array reads, and the
+expert's screen heuristics stay in charge wherever a table has no entry.
+
+Rules that used to be hard-coded x_position ranges in the expert live in ANY_STAGE, which applies
+to every stage exactly as the inline checks did.
+
+python3 hazard_table.py --level_maps ../level_maps --output ../hazard_tables
+"""
+
+import argparse
+import logging
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+
+import level_map
+import tile_query
+
+# Hazard flags
+GAP = 0x01
+PIPE = 0x02
+DOWN_PIPE = 0x04
+
+# Macro-actions a table can recommend, in MarioExpert.step's tuple vocabulary. Index 0 is no action.
+MACROS = (
+    None,
+    (2, 2, 4, 19, False),  # run and long jump - clears a gap
+    (4, 8, 2, 1, True),  # jump right - hops onto or over a pipe
+)
+GAP_JUMP = 1
+PIPE_JUMP = 2
+
+ANY_STAGE = (0, 0)
+
+Hazard = namedtuple("Hazard", ["flags", "macro"])
+
+NO_HAZARD = Hazard(0, None)
+
+
+class HazardTable:
+    """
+    Args:
+        world (int): World number, 0 for the table applying to every stage.
+        stage (int): Stage number, 0 for the table applying to every stage.
+        flags (np.ndarray): Hazard flags per x_position (uint8).
+        actions (np.ndarray): Index into MACROS per x_position (uint8).
+    """
+
+    def __init__(self, world: int, stage: int, flags: np.ndarray, actions: np.ndarray) -> None:
+        self.world = world
+        self.stage = stage
+        self.flags = flags
+        self.actions = actions
+
+    @classmethod
+    def empty(cls, world: int, stage: int, length: int) -> "HazardTable":
+        return cls(world, stage, np.zeros(length, dtype=np.uint8), np.zeros(length, dtype=np.uint8))
+
+    def mark(self, start: int, stop: int, flags: int, action: int = 0) -> None:
+        """
+        Flags x_positions start..stop inclusive, recommending MACROS[action] there if non-zero.
+        """
+        start = max(start, 0)
+        stop = min(stop, len(self.flags) - 1)
+        self.flags[start : stop + 1] |= flags
+        if action:
+            self.actions[start : stop + 1] = action
+
+    def lookup(self, x_position: int) -> Hazard:
+        if 0 <= x_position < len(self.flags):
+            return Hazard(int(self.flags[x_position]), MACROS[self.actions[x_position]])
+        return NO_HAZARD
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(
+            path, world=self.world, stage=self.stage, flags=self.flags, actions=self.actions
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "HazardTable":
+        with np.load(path) as data:
+            return cls(
+                int(data["world"]),
+                int(data["stage"]),
+                np.array(data["flags"]),
+                np.array(data["actions"]),
+            )
+
+
+def any_stage_table() -> HazardTable:
+    table = HazardTable.empty(*ANY_STAGE, 1401)
+    # 2nd unique pipe - go down instead of jumping when a two button macro runs here
+    table.mark(1305, 1400, DOWN_PIPE)
+    return table
+
+
+def run_starts(columns: np.ndarray) -> np.ndarray:
+    """
+    Leading column of every run of True columns.
+    """
+    return np.flatnonzero(columns & ~np.concatenate(([False], columns[:-1])))
+
+
+def build(level: level_map.LevelMap) -> HazardTable:
+    """
+    Scans a stitched level map once and flags the x_positions where Mario stands 1-2 columns in front
+    of a gap or a pipe, recommending the jump that clears it.
+    """
+    grid = level.grid
+    table = HazardTable.empty(level.world, level.stage, level.width * level_map.TILE_SIZE + 1)
+
+    gaps = run_starts(grid[level_map.ROWS - 1] == tile_query.EMPTY)
+    pipes = run_starts((grid == tile_query.PIPE).any(axis=0))
+
+    for columns, flags, action in ((gaps, GAP, GAP_JUMP), (pipes, PIPE, PIPE_JUMP)):
+        for column in columns:
+            # Mario's column is 1-2 tiles left of the hazard
+            start = level_map.column_x_position(column - 2)
+            stop = level_map.column_x_position(column) - 1
+            table.mark(start, stop, flags, action)
+
+    return table
+
+
+class HazardIndex:
+    """
+    The hazard tables of every stage plus the ANY_STAGE rules.
+    """
+
+    def __init__(self) -> None:
+        self.tables = {ANY_STAGE: any_stage_table()}
+
+    def add(self, table: HazardTable) -> None:
+        self.tables[(table.world, table.stage)] = table
+
+    def load(self, directory: str) -> None:
+        for path in sorted(Path(directory).glob("w*-s*.npz")):
+            self.add(HazardTable.load(str(path)))
+        logging.info(f"Loaded {len(self.tables) - 1} hazard tables from {directory}")
+
+    def lookup(self, world: int, stage: int, x_position: int) -> Hazard:
+        """
+        Stage flags combined with the ANY_STAGE flags - the stage table's macro wins.
+        """
+        common = self.tables[ANY_STAGE].lookup(x_position)
+        table = self.tables.get((world, stage))
+        if table is None:
+            return common
+        specific = table.lookup(x_position)
+        macro = specific.macro if specific.macro is not None else common.macro
+        return Hazard(specific.flags | common.flags, macro)
+
+
+def get_args():
+    parse_args = argparse.ArgumentParser()
+
+    parse_args.add_argument("--level_maps", type=str, required=True)
+    parse_args.add_argument("--output", type=str, required=True)
+
+    return parse_args.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = get_args()
+
+    output = Path(args.output)
+    output.mkdir(parents=True, exist_ok=True)
+
+    for path in sorted(Path(args.level_maps).glob("w*-s*.npz")):
+        level = level_map.LevelMap.load(str(path))
+        table = build(level)
+        table.save(str(output / path.name))
+        logging.info(
+            f"w{level.world}-s{level.stage}: {np.count_nonzero(table.flags)} of "
+            f"{len(table.flags)} x positions flagged"
+        )
+
+
+if __name__ == "__main__":
+    main()
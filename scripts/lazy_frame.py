@@ -0,0 +1,72 @@
+"""
+Deferred screen captures for MarioController.grab_frame.
+
+A LazyFrame stands for the 300 x 240 BGR frame grab_frame would return for the current tick, but
+only copies, resizes and converts the screen the first time its pixels are asked for - a frame that
+is never looked at costs nothing. Pixels are served from the emulator's live screen buffer, so a
+LazyFrame can only be materialised during the tick it was taken on.
+"""
+
+import zlib
+
+import cv2
+import numpy as np
+
+SCREEN_BYTES = 144 * 160 * 4
+
+
+def screen_hash(screen) -> int:
+    """
+    CRC32 of the raw RGBA screen buffer - equal for pixel-identical frames.
+    """
+    return zlib.crc32(screen.ndarray)
+
+
+class LazyFrame:
+    """
+    Args:
+        screen (pyboy.api.screen.Screen): The emulator's screen.
+        frame_count (int): The tick the frame belongs to.
+        current_frame (Callable[[], int]): Returns the emulator's current tick.
+        height (int, optional): Height of the materialised frame. Defaults to 240.
+        width (int, optional): Width of the materialised frame. Defaults to 300.
+    """
+
+    __slots__ = ("_screen", "_frame_count", "_current_frame", "height", "width", "_array")
+
+    # Bytes copied or written by every materialisation in this process
+    bytes_materialised = 0
+
+    def __init__(self, screen, frame_count: int, current_frame, height: int = 240, width: int = 300) -> None:
+        self._screen = screen
+        self._frame_count = frame_count
+        self._current_frame = current_frame
+        self.height = height
+        self.width = width
+        self._array = None
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        return (self.height, self.width, 3)
+
+    @property
+    def materialised(self) -> bool:
+        return self._array is not None
+
+    @property
+    def array(self) -> np.ndarray:
+        if self._array is None:
+            if self._current_frame() != self._frame_count:
+                raise RuntimeError(
+                    f"Frame {self._frame_count} was never materialised and the screen has moved on"
+                )
+            frame = np.array(self._screen.ndarray)
+            frame = cv2.resize(frame, (self.width, self.height))
+            # Convert to BGR for use with OpenCV
+            self._array = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+            LazyFrame.bytes_materialised += SCREEN_BYTES + 2 * self._array.nbytes
+        return self._array
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        array = self.array
+        return array if dtype is None else array.astype(dtype)
@@ -0,0 +1,172 @@
+"""
+Persistent per-stage tile maps stitched from the 20 column game_area window.
+
+Every observed game_area is written into a world-coordinate grid at the column the screen's left
+edge is scrolled to, so the map grows as the camera moves right. Only terrain tiles are stored -
+cells covered by Mario, enemies or items keep whatever terrain was seen there before. Maps are
+cached to disk per (world, stage) and reloaded on later runs, so planning can query terrain far
+beyond the visible screen.
+
+Columns are 8 pixel tiles. The screen's left column is derived from the same RAM values as
+MarioEnvironment.get_x_position: x_position - mario_x is the camera position in pixels.
+"""
+
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+import tile_query
+
+UNSEEN = 255
+TILE_SIZE = 8
+ROWS = 16
+COLUMNS = 20
+
+
+def screen_left_column(ram) -> int:
+    """
+    World column of game_area column 0 for a RAMSnapshot.
+    """
+    camera = ram.x_position - ram.mario_x
+    # camera + 7 moves in step with SCX, so the column changes on the same frame the grid shifts
+    return (camera + 7) // TILE_SIZE
+
+
+def mario_column(x_position: int) -> int:
+    """
+    World column Mario stands in at an x_position - sprite x is offset by one tile.
+    """
+    return x_position // TILE_SIZE - 1
+
+
+def column_x_position(column: int) -> int:
+    """
+    First x_position at which mario_column returns column.
+    """
+    return (column + 1) * TILE_SIZE
+
+
+class LevelMap:
+    """
+    The stitched terrain of one stage.
+
+    Args:
+        world (int): World number.
+        stage (int): Stage number.
+        grid (np.ndarray, optional): A previously saved (16, width) grid. UNSEEN marks unobserved cells.
+    """
+
+    def __init__(self, world: int, stage: int, grid: np.ndarray = None) -> None:
+        self.world = world
+        self.stage = stage
+
+        if grid is None:
+            grid = np.full((ROWS, 256), UNSEEN, dtype=np.uint8)
+        self._grid = grid
+        self.width = int(np.flatnonzero((grid != UNSEEN).any(axis=0)).max(initial=-1)) + 1
+        self.dirty = False
+
+    @property
+    def grid(self) -> np.ndarray:
+        return self._grid[:, : self.width]
+
+    def observe(self, game_area: np.ndarray, left_column: int) -> None:
+        """
+        Stitches one game_area into the map with its column 0 at left_column.
+        """
+        if left_column < 0:
+            game_area = game_area[:, -left_column:]
+            left_column = 0
+        right = left_column + game_area.shape[1]
+        if right > self._grid.shape[1]:
+            capacity = max(right, 2 * self._grid.shape[1])
+            grown = np.full((ROWS, capacity), UNSEEN, dtype=np.uint8)
+            grown[:, : self._grid.shape[1]] = self._grid
+            self._grid = grown
+
+        window = self._grid[:, left_column:right]
+        terrain = tile_query.match(game_area, tile_query.TERRAIN)
+        # Covered cells fall back to what was seen before, or empty if never seen
+        covered = np.where(window == UNSEEN, tile_query.EMPTY, window)
+        updated = np.where(terrain, game_area, covered).astype(np.uint8)
+
+        if not np.array_equal(updated, window):
+            window[:] = updated
+            self.dirty = True
+        self.width = max(self.width, right)
+
+    def next_gap(self, column: int, distance: int = None) -> Optional[int]:
+        """
+        First seen column at or after column whose bottom row has no ground, or None.
+        """
+        bottom = self.grid[ROWS - 1, column : self._end(column, distance)]
+        gaps = np.flatnonzero(bottom == tile_query.EMPTY)
+        return column + int(gaps[0]) if gaps.size else None
+
+    def next_pipe(self, column: int, distance: int = None) -> Optional[int]:
+        """
+        First column at or after column holding a pipe tile, or None.
+        """
+        window = self.grid[:, column : self._end(column, distance)]
+        pipes = np.flatnonzero((window == tile_query.PIPE).any(axis=0))
+        return column + int(pipes[0]) if pipes.size else None
+
+    def ground_height(self, column: int) -> int:
+        """
+        Row of the highest solid tile in a column, ROWS if there is none or it is unseen.
+        """
+        solid = np.flatnonzero(
+            tile_query.match(self.grid[:, column], (tile_query.BLOCK, tile_query.PIPE))
+        )
+        return int(solid[0]) if solid.size else ROWS
+
+    def _end(self, column: int, distance: Optional[int]) -> int:
+        return self.width if distance is None else min(self.width, column + distance)
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(path, world=self.world, stage=self.stage, grid=self.grid)
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path: str) -> "LevelMap":
+        with np.load(path) as data:
+            return cls(int(data["world"]), int(data["stage"]), np.array(data["grid"]))
+
+
+class LevelMapIndex:
+    """
+    The maps of every stage seen, loaded from and saved to a directory as w<world>-s<stage>.npz.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = Path(directory)
+        self.maps = {}
+
+    def path(self, world: int, stage: int) -> Path:
+        return self.directory / f"w{world}-s{stage}.npz"
+
+    def get(self, world: int, stage: int) -> LevelMap:
+        key = (world, stage)
+        if key not in self.maps:
+            path = self.path(world, stage)
+            self.maps[key] = LevelMap.load(path) if path.exists() else LevelMap(world, stage)
+        return self.maps[key]
+
+    def update(self, environment) -> LevelMap:
+        """
+        Stitches the controller's current game_area into the map of its current stage.
+        """
+        ram = environment.snapshot()
+        level = self.get(ram.world, ram.stage)
+        level.observe(environment.game_area(), screen_left_column(ram))
+        return level
+
+    def save(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        for level in self.maps.values():
+            if level.dirty:
+                level.save(self.path(level.world, level.stage))
+                logging.info(f"Saved level map w{level.world}-s{level.stage} ({level.width} columns)")
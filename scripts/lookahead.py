@@ -0,0 +1,232 @@
+"""
+Bounded lookahead search over macro-actions using in-memory save states.
+
+At a decision point the emulator is snapshotted, each candidate macro-action is rolled out without
+rendering for `horizon` frames, the outcome is scored on x_position progress, lives and the death
+timers, and the emulator is restored before the next candidate. The rule-based choice is always
+rolled out first and wins ties, so the search only overrides it when another macro does strictly
+better. A per-decision frame budget bounds how many candidates fit, and outcomes are cached by the
+RAM checksum of the decision point so repeated situations cost nothing.
+
+Rollouts advance pyboy.frame_count and load_state never rewinds it, so restore() adds the frames it
+rewinds to MarioController.rollout_frames. Everything that counts frames of the run - frame budgets and
+fps in run.evaluate, CheckpointPool's frame triggers, EnemyTracker's velocities, replay log frame
+indices and the dataset's frame column - reads MarioController.game_frame, which leaves them out.
+
+lookahead = Lookahead(expert.environment, horizon=60, frame_budget=600)
+macro = lookahead.choose(expert.choose_action())
+"""
+
+import io
+import time
+from collections import OrderedDict
+
+from replay_log import ram_checksum
+
+# Macro-actions from MarioExpert.choose_action, in its (action, duration, action2, duration2, sprint) form
+CANDIDATES = (
+    (2, 1, None, None, True),  # walk right
+    (2, 2, 4, 19, False),  # run and long jump
+    (4, 8, 2, 1, True),  # jump right
+    (4, 14, 2, 1, True),  # high jump right
+    (4, 8, None, None, False),  # jump in place
+    (2, 5, None, None, True),  # run right
+    (1, 5, None, None, True),  # back off left
+    (1, 5, 4, 1, True),  # jump back left
+    (0, 5, None, None, False),  # duck
+)
+
+# Controller attributes schedule_action and the expert's heuristics read or write
+CONTROLLER_STATE = (
+    "prev_mario_x",
+    "curr_mario_x",
+    "stuck",
+    "stuck_on_pipe",
+    "hole_count",
+    "prev_x",
+    "prev_y",
+)
+
+DEATH_PENALTY = 10_000
+
+
+def score(before, after) -> int:
+    """
+    Scores a rollout from the RAMSnapshots at its start and end - pixels gained, minus a large penalty
+    for a lost life or a death timer that started during the rollout.
+    """
+    progress = after.x_position - before.x_position
+    return progress - DEATH_PENALTY if died(before, after) else progress
+
+
+def died(before, after) -> bool:
+    return bool(
+        after.lives < before.lives
+        or after.game_over
+        or (after.dead_timer and not before.dead_timer)
+        or (after.dead_jump_timer and not before.dead_jump_timer)
+    )
+
+
+def controller_state(environment) -> dict:
+    return {name: getattr(environment, name) for name in CONTROLLER_STATE}
+
+
+def restore(environment, state: bytes, attributes: dict, frame: int = None, held=()) -> None:
+    """
+    Loads a save state into a MarioController with its attributes and held buttons (see
+    MarioController.load_state). frame is pyboy.frame_count when the emulator was last in this state -
+    the frames played since are counted as rollout_frames.
+    """
+    if frame is not None:
+        environment.rollout_frames += environment.pyboy.frame_count - frame
+    environment.load_state(state, held)
+    for name, value in attributes.items():
+        setattr(environment, name, value)
+
+
+def rollout(environment, macros: tuple, frames: int) -> tuple:
+    """
+    Plays macro-actions back to back from the current frame for exactly `frames` frames without rendering,
+    cutting the last one short if needed. Returns the RAMSnapshots before and after.
+    """
+    before = environment.snapshot()
+    end = environment.pyboy.frame_count + frames
+
+    # Rollout inputs are not part of the run
+    input_log, environment.input_log = environment.input_log, None
+    try:
+        for macro in macros:
+            remaining = end - environment.pyboy.frame_count
+            if remaining <= 0:
+                break
+            macro_end = environment.schedule_action(*macro)
+            environment.advance(min(macro_end, end) - environment.pyboy.frame_count, render=False)
+        environment.advance(end - environment.pyboy.frame_count, render=False)
+        environment.scheduler.preempt(environment.pyboy.frame_count)
+    finally:
+        environment.input_log = input_log
+
+    return before, environment.snapshot()
+
+
+class Lookahead:
+    """
+    Args:
+        environment (MarioController): The controller to search from - restored after every rollout.
+        horizon (int, optional): Frames each candidate is rolled out for. Defaults to 60.
+        frame_budget (int, optional): Frames of rollout allowed per decision. Defaults to 600.
+        candidates (tuple, optional): Macro-actions tried after the rule-based choice. Defaults to CANDIDATES.
+        cache_size (int, optional): Decision points whose outcomes are kept. Defaults to 4096.
+        pool (RolloutPool, optional): Worker processes to roll candidates out in parallel. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        environment,
+        horizon: int = 60,
+        frame_budget: int = 600,
+        candidates: tuple = CANDIDATES,
+        cache_size: int = 4096,
+        pool=None,
+    ) -> None:
+        self.environment = environment
+        self.horizon = horizon
+        self.frame_budget = frame_budget
+        self.candidates = candidates
+        self.cache_size = cache_size
+        self.pool = pool
+
+        self._cache = OrderedDict()
+        self._state = io.BytesIO()
+        self._state_frame = 0
+        self._held = frozenset()
+
+        self.decisions = 0
+        self.overrides = 0
+        self.rollouts = 0
+        self.rollout_frames = 0
+        self.cache_hits = 0
+        self.seconds = 0.0
+
+    def choose(self, macro) -> tuple:
+        """
+        Returns the best scoring macro-action, starting from the rule-based choice.
+        """
+        if not isinstance(macro, tuple):
+            macro = (macro,)
+
+        start = time.perf_counter()
+        key = ram_checksum(self.environment)
+        outcomes = self._cache.get(key)
+        if outcomes is None:
+            outcomes = self._cache[key] = {}
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+
+        ordered = (macro,) + tuple(c for c in self.candidates if c != macro)
+        missing = [c for c in ordered if c not in outcomes]
+        self.cache_hits += len(ordered) - len(missing)
+        pending = missing[: self.frame_budget // self.horizon]
+        if pending:
+            outcomes.update(self._evaluate(pending))
+
+        best = macro
+        best_score = None
+        for candidate in ordered:
+            if candidate in outcomes and (best_score is None or outcomes[candidate] > best_score):
+                best, best_score = candidate, outcomes[candidate]
+
+        self.decisions += 1
+        self.overrides += best != macro
+        self.seconds += time.perf_counter() - start
+        return best
+
+    def _evaluate(self, candidates: list) -> dict:
+        """
+        Rolls out every candidate from the current frame and leaves the emulator where it started.
+        """
+        attributes = self._save()
+        if self.pool is not None:
+            state = self._state.getvalue()
+            jobs = [(state, (c,), self.horizon, attributes, self._held) for c in candidates]
+            results = self.pool.map(jobs)
+            self.rollouts += len(results)
+            self.rollout_frames += self.horizon * len(results)
+            return {c: result["score"] for c, result in zip(candidates, results)}
+
+        outcomes = {c: self._rollout(c, attributes) for c in candidates}
+        self._restore(attributes)
+        return outcomes
+
+    def _save(self) -> dict:
+        self._state.seek(0)
+        self._state.truncate()
+        self.environment.pyboy.save_state(self._state)
+        self._state_frame = self.environment.pyboy.frame_count
+        self._held = frozenset(self.environment.scheduler.held)
+        return controller_state(self.environment)
+
+    def _restore(self, attributes: dict) -> None:
+        restore(self.environment, self._state.getvalue(), attributes, self._state_frame, self._held)
+        self._state_frame = self.environment.pyboy.frame_count
+
+    def _rollout(self, candidate: tuple, attributes: dict) -> int:
+        self._restore(attributes)
+        before, after = rollout(self.environment, (candidate,), self.horizon)
+        self.rollouts += 1
+        self.rollout_frames += self.horizon
+        return score(before, after)
+
+    def stats(self) -> dict:
+        return {
+            "decisions": self.decisions,
+            "overrides": self.overrides,
+            "rollouts": self.rollouts,
+            "rollout_frames": self.rollout_frames,
+            "cache_hits": self.cache_hits,
+            "seconds": round(self.seconds, 3),
+            "rollouts_per_second": round(self.rollouts / self.seconds, 1) if self.seconds else 0.0,
+        }
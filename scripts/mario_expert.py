@@ -6,14 +6,155 @@ Your goal is to implement the functions and methods required to enable choose_ac
 Original Mario Manual: https://www.thegameisafootarcade.com/wp-content/uploads/2017/04/Super-Mario-Land-Game-Manual.pdf
 """
 
+import io
 import json
 import logging
-import random
+import os
+import time
 import numpy as np
 
 import cv2
+import hazard_table
+import lazy_frame
+import object_table
+import observation
+import replay_log
+import tile_query
+import video_writer
+from action_scheduler import ActionScheduler
+from expert_parameters import ExpertParameters
 from mario_environment import MarioEnvironment
+from profiling import Profiler
 from pyboy.utils import WindowEvent
+from ram_snapshot import RAMSnapshot
+from rule_engine import INCREMENT, RESET, Rule, RuleContext, RuleEngine
+
+logger = logging.getLogger(__name__)
+
+# The expert's decision rules, highest priority first. Object rules react to one tracked slot (c.dx and
+# c.dy are object - mario), scene rules to Mario's surroundings. See rule_engine.py.
+RULES = (
+    #goomba detection
+    Rule(
+        "goomba jump", 100,
+        lambda c: 0 < c.dx < c.parameters.goomba_dx and 0 < c.dy < c.parameters.contact_dy,
+        (4, 1, None, None, False), (object_table.GOOMBA,),
+    ),
+    #for the nasty goombas who are underneath mario
+    Rule(
+        "goomba below", 90,
+        lambda c: 0 < c.dx < c.parameters.goomba_dx and -c.parameters.goomba_below_dy <= c.dy < 0,
+        (4, 1, None, None, False), (object_table.GOOMBA,),
+    ),
+    #for gooombas that are located to left of mario
+    Rule(
+        "goomba behind", 80,
+        lambda c: -c.parameters.goomba_behind_dx < c.dx < 0 and 0 < c.dy < c.parameters.contact_dy,
+        (2, 2, 4, 4, False), (object_table.GOOMBA,),
+    ),
+    #original: 13 < goomba_x - mario_x < 20
+    Rule(
+        "goomba above", 70,
+        lambda c: -c.dy > c.parameters.above_dy and c.parameters.goomba_above_min_dx < c.dx < c.parameters.above_dx,
+        (1, 5, None, None, True), (object_table.GOOMBA,),
+    ),
+    Rule(
+        "goomba unique for 1-2", 60,
+        lambda c: 3 <= -c.dy <= 8 and 1 < c.dx < 5 and c.ram.on_ground == 0x01,
+        (4, 5, None, None, False), (object_table.GOOMBA,),
+    ),
+    #Turtle detection
+    Rule(
+        "turtle jump", 100,
+        lambda c: 0 < c.dx < c.parameters.turtle_dx and c.dy < c.parameters.contact_dy,
+        (4, 1, None, None, False), (object_table.TURTLE,),
+    ),
+    Rule(
+        "turtle above", 90,
+        lambda c: -c.dy > c.parameters.above_dy and c.dx < c.parameters.above_dx,
+        (1, 5, None, None, True), (object_table.TURTLE,),
+    ),
+    #Bat detection
+    Rule(
+        "bat jump", 100,
+        lambda c: 0 < c.dx < c.parameters.bat_dx and c.dy < c.parameters.contact_dy,
+        lambda c: (4, c.parameters.high_jump_frames, 2, 1, True), (object_table.BAT,),
+    ),
+    Rule(
+        "bat above", 90,
+        lambda c: -c.dy > c.parameters.above_dy and c.dx < c.parameters.above_dx,
+        (1, 8, None, None, True), (object_table.BAT,),
+    ),
+    #picks powerups. Currently mushrooms
+    Rule(
+        "powerup right", 100,
+        lambda c: 0 < c.dx < c.parameters.powerup_dx and c.dy < c.parameters.contact_dy,
+        (2, 5, None, None, True), object_table.POWERUPS,
+    ),
+    Rule(
+        "move left powerup", 90,
+        lambda c: 0 < -c.dx < c.parameters.powerup_dx and c.dy < c.parameters.contact_dy,
+        (1, 5, 4, 1, True), object_table.POWERUPS,
+    ),
+    Rule(
+        "powerup above", 80,
+        lambda c: -c.dy > c.parameters.above_dy and c.dx < c.parameters.above_dx,
+        lambda c: (4, c.parameters.jump_frames, 2, 1, False), object_table.POWERUPS, commit=False,
+    ),
+    #Bee detection
+    Rule(
+        "bee jump", 100,
+        lambda c: 0 < c.dx < c.parameters.bee_dx and c.dy < c.parameters.contact_dy,
+        (4, 9, None, None, True), (object_table.BEE,),
+    ),
+    Rule(
+        "bee above", 90,
+        lambda c: -c.dy > c.parameters.above_dy and c.dx < c.parameters.above_dx,
+        (4, 15, None, None, True), (object_table.BEE,),
+    ),
+    #an enemy on course to hit mario soon, going by its tracked velocity - only with an EnemyTracker attached
+    Rule(
+        "predicted collision", 0,
+        lambda c: c.contact is not None and c.contact[c.slot] <= c.parameters.collision_frames and c.ram.on_ground,
+        lambda c: (4, c.parameters.jump_frames, None, None, False),
+        (object_table.GOOMBA, object_table.TURTLE, object_table.BAT, object_table.BEE),
+    ),
+    #gaps and pipes known ahead of time from the level's hazard table, only taken from the ground
+    Rule("hazard table", 100, lambda c: c.planned.macro is not None and c.ram.on_ground, lambda c: c.planned.macro),
+    #19 had best result rather than 20?
+    Rule("hole", 90, lambda c: c.hole, lambda c: (2, 2, 4, c.parameters.gap_jump_frames, False)),
+    Rule("qblock", 80, lambda c: c.qblock, lambda c: (4, c.parameters.jump_frames, None, None, False)),
+    Rule("on pipe", 70, lambda c: c.on_pipe, (0, 8, 2, 2, False), stuck=INCREMENT),
+    Rule("get off pipe", 60, lambda c: c.on_pipe == False, lambda c: (4, c.parameters.jump_frames, 2, 1, True)),
+    #used to do the left jump 1st and 2nd time in special room #2 in 1-1
+    Rule(
+        "unique left jump", 50,
+        lambda c: c.stalled
+        and ((c.obs.block[c.x][19] and c.x == 13) or c.obs.block[9][c.y - 2])
+        and np.all(c.obs.block[:, 0]),
+        (1, 8, 4, 15, True),
+    ),
+    #original 4, 12, 2, 1, True
+    Rule(
+        "wall jump", 40,
+        lambda c: c.environment.stuck == c.parameters.wall_jump_stuck,
+        (4, 12, 2, 2, False), stuck=INCREMENT,
+    ),
+    #For a very specific scenario in special room #2 on level 1-1
+    Rule(
+        "unique right jump", 30,
+        lambda c: c.stalled and np.all(c.obs.empty[c.x - 2, 5:7]) and np.all(c.obs.block[:, 0]),
+        lambda c: (4, c.parameters.high_jump_frames, 2, 2, False), stuck=RESET,
+    ),
+    Rule("stuck", 20, lambda c: c.stalled, (2, 2, None, None, False), stuck=INCREMENT),
+    #when the bottom of mario and right next to bottom of mario has ground while in air, hold down button
+    Rule(
+        "stay down", 10,
+        lambda c: np.all(c.obs.block[15, c.y:c.y + 2]) and c.ram.on_ground == 0x00,
+        (0, 5, None, None, False), commit=False,
+    ),
+    Rule("just sprinting", 0, lambda c: True, (2, 1, None, None, True), stuck=RESET),
+)
 
 
 class MarioController(MarioEnvironment):
@@ -35,6 +176,27 @@ class MarioController(MarioEnvironment):
         headless: bool = False,
         
     ) -> None:
+        # Per-tick observation cache: name -> (frame_count, value).
+        # Must exist before super().__init__() as that calls reset().
+        self._frame_cache = {}
+        self.game_area_builds = 0
+        self.game_area_hits = 0
+        self.input_log = None
+        # Emulated frames lookahead rolled out and rewound - pyboy.frame_count keeps counting them
+        self.rollout_frames = 0
+        # Optional CheckpointPool - reset() starts from start_checkpoint instead of init.state when set
+        self.checkpoints = None
+        self.start_checkpoint = None
+        self.scheduler = None
+        # Optional LevelMapIndex - stitched per-stage terrain for look-ahead beyond the screen
+        self.level_maps = None
+        # Optional EnemyTracker - object velocities and predicted collisions for the object rules
+        self.tracker = None
+        # Precomputed per-stage hazards and macro-actions by x_position - see hazard_table.py
+        self.hazards = hazard_table.HazardIndex()
+        # Thresholds shared with MarioExpert - see MarioExpert.configure
+        self.parameters = ExpertParameters()
+
         super().__init__(
             act_freq=act_freq,
             emulation_speed=emulation_speed,
@@ -64,6 +226,7 @@ class MarioController(MarioEnvironment):
 
         self.valid_actions = valid_actions
         self.release_button = release_button
+        self.scheduler = ActionScheduler(self.send_input, dict(zip(valid_actions, release_button)))
         self.prev_mario_x = 0
         self.curr_mario_x = 0
         self.stuck = 0 #general stuck
@@ -71,7 +234,152 @@ class MarioController(MarioEnvironment):
         self.hole_count = 0
         self.prev_x = 0
         self.prev_y = 0
-    
+
+    # init.state contents per path, read from disk once per process and shared by every controller
+    _init_states = {}
+
+    # A headless controller built before forking evaluation workers - see warm_start.py
+    prototype = None
+
+    @classmethod
+    def create(cls, headless: bool = False) -> "MarioController":
+        """
+        Returns the prototype when one is waiting and headless play is asked for, so a forked worker starts
+        from an emulator that already has the ROM loaded. Builds a new controller otherwise.
+        """
+        if headless and cls.prototype is not None:
+            environment, cls.prototype = cls.prototype, None
+            environment.reset()
+            return environment
+        return cls(headless=headless)
+
+    def init_state(self) -> bytes:
+        state = self._init_states.get(self.init_path)
+        if state is None:
+            with open(self.init_path, "rb") as file:
+                state = self._init_states[self.init_path] = file.read()
+        return state
+
+    def reset(self, checkpoint: str = None) -> None:
+        checkpoint = checkpoint or self.start_checkpoint
+        if checkpoint is None:
+            self.load_state(self.init_state())
+        else:
+            self.load_state(self.checkpoints.get(checkpoint))
+        if self.tracker is not None:
+            self.tracker.clear()
+
+    @property
+    def game_frame(self) -> int:
+        """
+        Frames of the game actually played - pyboy.frame_count without the frames lookahead rolled out and
+        rewound. Frame budgets, checkpoint triggers, the enemy tracker and replay logs count in game frames.
+        """
+        return self.pyboy.frame_count - self.rollout_frames
+
+    def load_state(self, state: bytes, held=()) -> None:
+        """
+        Loads a save state and drops everything derived from the frame it replaces. held are the buttons
+        the state was saved with, as scheduler.held was then - queued inputs are dropped without sending any.
+        """
+        self.pyboy.load_state(io.BytesIO(state))
+        # load_state rewinds memory without touching frame_count
+        self._frame_cache.clear()
+        if self.tracker is not None:
+            self.tracker.rewind(self.game_frame)
+        if self.scheduler is not None:
+            self.scheduler.drop(self.pyboy.frame_count, held)
+
+    def _cached(self, name: str, build) -> tuple[any, bool]:
+        """
+        Returns (value, hit) for the named per-frame observation, calling build() on a new frame.
+        """
+        frame = self.pyboy.frame_count
+        cached = self._frame_cache.get(name)
+        if cached is not None and cached[0] == frame:
+            return cached[1], True
+        value = build()
+        self._frame_cache[name] = (frame, value)
+        return value, False
+
+    def game_area(self) -> np.ndarray:
+        """
+        Returns the tile grid for the current frame.
+
+        The grid is rebuilt at most once per emulator frame - every detector that asks for it
+        between two pyboy.tick() calls shares the same snapshot. Callers must not modify it.
+        """
+        game_area, hit = self._cached("game_area", super().game_area)
+        if hit:
+            self.game_area_hits += 1
+        else:
+            self.game_area_builds += 1
+        return game_area
+
+    def objects(self) -> object_table.ObjectTable:
+        """
+        Returns the decoded object table for the current frame, read from memory in one slice.
+        """
+        return self._cached("objects", lambda: object_table.ObjectTable.read(self.pyboy.memory))[0]
+
+    def observation(self) -> observation.Observation:
+        """
+        Returns the game_area of the current tick with its class planes and column heights, built once per tick.
+        """
+        return self._cached("observation", lambda: observation.Observation(self.game_area()))[0]
+
+    def frame(self, height: int = 240, width: int = 300) -> lazy_frame.LazyFrame:
+        """
+        Returns the current tick's frame as a LazyFrame - resized and converted only if its pixels are used.
+        """
+        return self._cached(
+            f"frame_{height}x{width}",
+            lambda: lazy_frame.LazyFrame(
+                self.screen, self.pyboy.frame_count, lambda: self.pyboy.frame_count, height, width
+            ),
+        )[0]
+
+    def grab_frame(self, height: int = 240, width: int = 300) -> np.ndarray:
+        """
+        Same frame as PyboyEnvironment.grab_frame, built at most once per tick. Callers must not modify it.
+        """
+        return self.frame(height, width).array
+
+    def screen_hash(self) -> int:
+        return self._cached("screen_hash", lambda: lazy_frame.screen_hash(self.screen))[0]
+
+    def snapshot(self) -> RAMSnapshot:
+        """
+        Returns every RAM value the environment and expert use for the current frame, read in one pass.
+        """
+        return self._cached("snapshot", lambda: RAMSnapshot.capture(self.pyboy))[0]
+
+    def game_state(self) -> dict[str, any]:
+        return self.snapshot().game_state()
+
+    def get_x_position(self):
+        return self.snapshot().x_position
+
+    def get_game_over(self):
+        return self.snapshot().game_over
+
+    def send_input(self, event: int) -> None:
+        """
+        Sends a button event to PyBoy, recording it with its frame when a replay is being recorded.
+        """
+        if self.input_log is not None:
+            self.input_log.record_input(self.game_frame, event)
+        self.pyboy.send_input(event)
+
+    def observation_cache_stats(self) -> dict[str, int]:
+        """
+        Returns how many tile grids were built and how many rebuilds the cache avoided.
+        """
+        return {
+            "game_area_builds": self.game_area_builds,
+            "game_area_rebuilds_avoided": self.game_area_hits,
+        }
+
 
     def run_action(self, action: int, duration: int = None, action2: int = None, duration2: int = None, sprint: bool = True) -> None:
         """
@@ -80,58 +388,72 @@ class MarioController(MarioEnvironment):
         As part of this assignment your job is to modify this function to better suit your needs
 
         You can change the action type to whatever you want or need just remember the base control of the game is pushing buttons
+
+        Blocks until the whole macro-action, including its trailing idle frames, has played out.
         """
+        end_frame = self.schedule_action(action, duration, action2, duration2, sprint)
+        self.advance(end_frame - self.pyboy.frame_count)
 
-        #print(self.game_area()) 
+    def schedule_action(self, action: int, duration: int = None, action2: int = None, duration2: int = None, sprint: bool = True, settle: bool = True) -> int:
+        """
+        Queues the button timeline of a macro-action from the current frame and returns the frame it ends on.
 
+        The timeline is the one run_action always played: action is held for `duration` frames while action2 is
+        pulsed for `duration2` frames at a time, then both are released. With settle the macro also waits
+        `duration` idle frames after the release, as run_action does.
+        """
         # Simply toggles the buttons being on or off for a duration of act_freq
         if duration == None:
             duration = self.act_freq
 
-        if self.stuck == 4:
-            print("Print reached here")
-            self.pyboy.send_input(self.valid_actions[1])
-            for _ in range(5):
-                self.pyboy.tick()
-            self.pyboy.send_input(self.release_button[1])
-            #self.pyboy.tick()
+        scheduler = self.scheduler
+        frame = self.pyboy.frame_count
+
+        if self.stuck == self.parameters.stuck_escape:
+            logger.debug("Print reached here")
+            scheduler.segment(self.valid_actions[1], frame, frame + 5)
+            frame += 5
             self.stuck = 0
 
         if sprint == True:
-            self.pyboy.send_input(self.valid_actions[5])
-            #self.pyboy.tick()
+            scheduler.schedule(frame, self.valid_actions[5])
         else: 
-            self.pyboy.send_input(self.release_button[5])
-            #self.pyboy.tick()
+            scheduler.schedule(frame, self.release_button[5])
             
-        self.pyboy.send_input(self.valid_actions[action])
-        #self.pyboy.send_input(self.valid_actions[2])
+        ram = self.snapshot()
+        down_pipe = self.hazards.lookup(ram.world, ram.stage, self.curr_mario_x).flags & hazard_table.DOWN_PIPE
+
+        scheduler.schedule(frame, self.valid_actions[action])
         for _ in range(duration):
             if action2 != None or duration2 != None:
-                self.pyboy.send_input(self.valid_actions[action2])
-                if 1305 <= self.curr_mario_x <= 1400:
-                    print("go down 2nd uniquue pipe")
-                    self.pyboy.send_input(self.valid_actions[0])
-                    for _ in range(8):
-                        self.pyboy.tick()
+                scheduler.schedule(frame, self.valid_actions[action2])
+                if down_pipe:
+                    logger.debug("go down 2nd uniquue pipe")
+                    scheduler.schedule(frame, self.valid_actions[0])
+                    frame += 8
                     break
-                for _ in range(duration2):
-                    self.pyboy.tick()
-                self.pyboy.send_input(self.release_button[action2])   
-            self.pyboy.tick()
+                frame += duration2
+                scheduler.schedule(frame, self.release_button[action2])   
+            frame += 1
         #used mainly for consecutive 
             
-        self.pyboy.send_input(self.release_button[action])
+        scheduler.schedule(frame, self.release_button[action])
         
         if action2 != None:
-            self.pyboy.send_input(self.release_button[action2])   
-        for _ in range(duration): 
-            self.pyboy.tick()
-
-
-        
-
+            scheduler.schedule(frame, self.release_button[action2])   
+        if settle:
+            frame += duration
+        scheduler.wait_until(frame)
+        return frame
 
+    def advance(self, frames: int = 1, render: bool = True) -> None:
+        """
+        Ticks the emulator frame by frame, sending the scheduled inputs due before each tick.
+        """
+        for _ in range(frames):
+            self.scheduler.apply(self.pyboy.frame_count)
+            self.pyboy.tick(1, render)
+        self.scheduler.apply(self.pyboy.frame_count)
 
 
 class MarioExpert:
@@ -147,24 +469,90 @@ class MarioExpert:
         headless (bool, optional): Whether to run the game in headless mode. Defaults to False.
     """
 
+    # Tunable thresholds and macro durations - see expert_parameters.py and sweep.py
+    parameters = ExpertParameters()
+
+    # How step() drives the emulator: "blocking" plays each macro-action out in run_action, "timeline"
+    # advances reaction_interval frames per step and lets the object rules preempt a macro mid-flight
+    scheduling = "blocking"
+    reaction_interval = 1
+
+    # How play() records the run: "async" encodes video on a background thread, "sync" on the emulation
+    # thread, "replay" writes a compact input log (see replay_log.py) instead of a video
+    recording = "async"
+    # Backpressure for async recording: "block" keeps every frame, "drop" never stalls emulation
+    video_policy = video_writer.BLOCK
+    # Video records every Nth step; unchanged screens are repeated without being resized or converted again
+    record_every = 1
+
     def __init__(self, results_path: str, headless=False):
         self.results_path = results_path
 
-        self.environment = MarioController(headless=headless)
+        self.environment = MarioController.create(headless=headless)
+        self.environment.parameters = self.parameters
 
         self.video = None
+        self.recorded_steps = 0
+        self.recorded_hash = None
+        self.recorded_frame = None
+        self.profiler = Profiler(enabled=False)
+        # Decision rules compiled once - conditions are only timed when profiling
+        self.rules = RuleEngine(RULES)
+        self.current_macro = None
+        # Optional Lookahead - rolls out candidate macro-actions from save states before committing to one
+        self.lookahead = None
+        # Optional EpisodeWriter - appends every decision to a per-step dataset (see episode_dataset.py)
+        self.dataset = None
+        # Optional list - the wall time in seconds of every choose_action call is appended to it
+        self.decision_times = None
+        # Optional stop_check(expert) called after every step - a reason string ends play() as game over does
+        self.stop_check = None
+        self.stopped_by = None
+
+    @property
+    def profiling(self) -> bool:
+        """
+        Per-phase timings and counters, dumped to profile.json next to results.json - run.py --profile
+        """
+        return self.profiler.enabled
+
+    @profiling.setter
+    def profiling(self, enabled: bool) -> None:
+        self.profiler.enabled = enabled
+        self.rules.timed = enabled
+
+    def configure(self, parameters: ExpertParameters) -> None:
+        """
+        Plays with a different parameter set from the next decision on.
+        """
+        self.parameters = parameters
+        self.environment.parameters = parameters
+
+    def decide(self):
+        """
+        choose_action, timed into decision_times when a list is attached.
+        """
+        if self.decision_times is None:
+            return self.choose_action()
+        start = time.perf_counter()
+        macro = self.choose_action()
+        self.decision_times.append(time.perf_counter() - start)
+        return macro
 
     def choose_action(self):
 
-        state = self.environment.game_state()
-        frame = self.environment.grab_frame()
-        game_area = self.environment.game_area()
-        #print(game_area.shape)
+        with self.profiler.phase("observe"):
+            state = self.environment.game_state()
+            frame = self.environment.frame()
+            obs = self.environment.observation()
+            game_area = obs.grid
 
-        hole_found = self.find_holes()
-        found_qBlocks = self.find_qBlocks()
-        on_pipe = self.on_pipe()
-        find_mario = self.find_mario()
+        with self.profiler.phase("detectors"):
+            find_mario = self.find_mario(obs)
+            found_qBlocks = self.find_qBlocks(obs, find_mario)
+            hole_found = self.find_holes(obs, find_mario, found_qBlocks)
+            on_pipe = self.on_pipe(obs, find_mario)
+        self.profiler.count("detector_calls", 4)
 
         #Maybe add a condition where if it detects the star music playing, curr_mario_x be set to prev_mario_x instead?
         self.environment.curr_mario_x = self.environment.get_x_position() #true position 
@@ -178,185 +566,44 @@ class MarioExpert:
             x = self.environment.prev_x
             y = self.environment.prev_y
 
-        #stuck = self.environment.stuck
-        # Implement your code here to choose the best action
-        #time.sleep(0.1)
-        #return random.randint(0, len(self.environment.valid_actions) - 1)
-
-        mario_x = self.environment._read_m(0xC202) #relative
-        mario_y = self.environment._read_m(0xC201)
- 
-        for i in range(10): # loops through 9 indexes of the object table 
-            address = int(f"0xD1{i}0", 16) #convert the string to hex
-
-            #goomba detection
-            if self.environment._read_m(address) == 00: #goomba
-
-                goomba_addr = int(f"0xD1{i}3", 16)  #x position  
-                goomba_x = self.environment._read_m(goomba_addr)
-                goomba_addr = int(f"0xD1{i}2", 16) #y position
-                goomba_y = self.environment._read_m(goomba_addr)
-
-                #print("mario", mario_y)
-                #print("goomba", goomba_y)
-
-                if (goomba_x-mario_x) < 15 and (goomba_x - mario_x) > 0 and  0 < (goomba_y-mario_y) < 3 :
-                    print('goomba jump')
-                    self.environment.prev_mario_x = self.environment.curr_mario_x
-                    return (4, 1, None, None, False)
-                #for the nasty goombas who are underneath mario
-                elif (goomba_x - mario_x) < 15 and (goomba_x - mario_x) > 0 and -5 <= (goomba_y - mario_y) < 0:
-                    self.environment.prev_mario_x = self.environment.curr_mario_x
-                    return (4, 1, None, None, False)
-                #for gooombas that are located to left of mario
-                elif -5 < (goomba_x - mario_x) < 0 and 0 < (goomba_y - mario_y) < 3:
-                    print('goomba jump when located left')
-                    self.environment.prev_mario_x = self.environment.curr_mario_x
-                    return (2, 2, 4, 4, False)
-                elif mario_y - goomba_y > 5 and  13 < goomba_x - mario_x < 20: #original: 13 < goomba_x - mario_x < 20
-                    print("goomba above")
-                    self.environment.prev_mario_x = self.environment.curr_mario_x
-                    return (1, 5, None, None, True) 
-                elif  3 <= mario_y - goomba_y <= 8 and 1 < goomba_x - mario_x < 5 and self.environment._read_m(0xC20A) == 0x01: 
-                    print("Goomba unique for 1-2")
-                    self.environment.prev_mario_x = self.environment.curr_mario_x
-                    return (4, 5, None, None, False)
-            #Turtle detection
-            elif self.environment._read_m(address) == 0x04: 
-                turtle_addr = int(f"0xD1{i}3", 16) #x position
-                turtle_x = self.environment._read_m(turtle_addr)
-                turtle_addr = int(f"0xD1{i}2", 16)
-                turtle_y = self.environment._read_m(turtle_addr)
-
-                if (turtle_x-mario_x) < 12 and (turtle_x - mario_x) > 0 and (turtle_y-mario_y) < 3:
-                    self.environment.prev_mario_x = self.environment.curr_mario_x
-                    return (4, 1, None, None, False)
-                elif mario_y - turtle_y > 5 and turtle_x - mario_x < 20:
-                    self.environment.prev_mario_x = self.environment.curr_mario_x
-                    return (1, 5, None, None, True) 
-            #Bat detection
-            elif self.environment._read_m(address) == 0x0E:
-                bat_addr = int(f"0xD1{i}3", 16)
-                bat_x = self.environment._read_m(bat_addr)
-                bat_addr = int(f"0xD1{i}2", 16)
-                bat_y = self.environment._read_m(bat_addr)
-                if (bat_x-mario_x) < 12 and (bat_x - mario_x) > 0 and (bat_y-mario_y) < 3:
-                    self.environment.prev_mario_x = self.environment.curr_mario_x
-                    return (4, 14, 2, 1, True)
-                # elif 0<= (bat_x) <= 2 and (bat_y - mario_y) < 3:
-                #     self.environment.prev_mario_x = self.environment.curr_mario_x
-                #     return (1, 5, None, None, True)
-                elif mario_y - bat_y > 5 and bat_x - mario_x < 20:
-                    self.environment.prev_mario_x = self.environment.curr_mario_x
-                    return (1, 8, None, None, True)
-            #picks powerups. Currently mushrooms
-            elif self.environment._read_m(address) == 0x28 or self.environment._read_m(address) == 0x29 or self.environment._read_m(address) == 0x2C or self.environment._read_m(address) == 0x34:#
-                powerup_addr = int(f"0xD1{i}3", 16)
-                powerup_x = self.environment._read_m(powerup_addr)
-                powerup_addr = int(f"0xD1{i}2", 16)
-                powerup_y = self.environment._read_m(powerup_addr)
-                if (powerup_x-mario_x) < 10 and (powerup_x - mario_x) > 0 and (powerup_y-mario_y) < 3:
-                    self.environment.prev_mario_x = self.environment.curr_mario_x
-                    return (2, 5, None, None, True)
-                elif (mario_x - powerup_x) < 10 and mario_x - powerup_x > 0 and (powerup_y - mario_y) < 3:
-                    self.environment.prev_mario_x = self.environment.curr_mario_x
-                    print("Move left powerup")
-                    return (1, 5, 4, 1, True)
-                elif mario_y - powerup_y > 5 and powerup_x - mario_x < 20:
-                    return (4, 8, 2, 1, False) 
-
-            #Bee detection
-            elif self.environment._read_m(address) == 0x42:
-                bee_addr = int(f"0xD1{i}3", 16)
-                bee_x = self.environment._read_m(bee_addr)
-                bee_addr = int(f"0xD1{i}2", 16)
-                bee_y = self.environment._read_m(bee_addr)
-                if (bee_x-mario_x) < 12 and (bee_x - mario_x) > 0 and (bee_y-mario_y) < 3:
-                    self.environment.prev_mario_x = self.environment.curr_mario_x
-                    return (4, 9, None, None, True)
-                elif mario_y - bee_y > 5 and bee_x - mario_x < 20:
-                    self.environment.prev_mario_x = self.environment.curr_mario_x
-                    return (4, 15, None, None, True)
-
-        # found_qBlocks = self.find_qBlocks()
-        # on_pipe = self.on_pipe()
-        # print("stuck val", self.environment.stuck)
-        print(game_area)
-        
-        
-        if hole_found:
-            print("Here 1")
-            self.environment.prev_mario_x = self.environment.curr_mario_x
-            #add a condition where it returns (4, 14, 2, 1, False or True) for a certain x coordinate (for the 2nd pipe)
-            return (2, 2, 4, 19, False) #19 had best result rather than 20? 
-        
-        elif found_qBlocks:
-            print("here 2")
-            self.environment.prev_mario_x = self.environment.curr_mario_x
-            return (4, 8, None, None, False)
-        
-        elif on_pipe:
-            print("on pipe")
-            print("stuck val", self.environment.stuck)
-            self.environment.stuck += 1
-            self.environment.prev_mario_x = self.environment.curr_mario_x
-            return (0, 8, 2, 2, False)
-        
-        elif on_pipe == False:
-            print("GET OFF PIPE")
-            self.environment.prev_mario_x = self.environment.curr_mario_x
-            return (4, 8, 2, 1, True)
-        # elif self.environment._read_m(0xC207) == 0x02 and np.all(game_area[:,0] == 10):
-        #     return (2)
-        
-        #used to do the left jump 1st and 2nd time in special room #2 in 1-1
-        elif (self.environment.curr_mario_x == prev_mario_x) and ((game_area[x][19] == 10 and x == 13)   or game_area[9][y - 2] == 10) and np.all(game_area[:, 0] == 10):
-            print("unique left jump")
-            #self.environment.stuck += 1
-            self.environment.prev_mario_x = self.environment.curr_mario_x
-            return (1, 8, 4, 15, True)
-        
-        elif self.environment.stuck == 3:
-            self.environment.stuck +=1
-            print('wall jump') 
-            self.environment.prev_mario_x = self.environment.curr_mario_x
-            return (4, 12, 2, 2, False)  #original 4, 12, 2, 1, True
-        
-        elif (self.environment.curr_mario_x == prev_mario_x):
-            print("stuck")
-            # print("prev: ", self.environment.prev_mario_x)
-            # print("Curr: ", self.environment.curr_mario_x)
-            self.environment.stuck += 1
-            self.environment.prev_mario_x = self.environment.curr_mario_x
-            
-            #For a very specific scenario in special room #2 on level 1-1
-            if np.all(game_area[x-2, 5:7] == 0) and np.all(game_area[:, 0] == 10):
-                print("Unique right jump")
-                self.environment.stuck = 0
-                return (4, 14, 2, 2, False) 
-            else:
-                return (2, 2, None, None, False)
-        # elif found_qBlocks:
-        #     print("here 2")
-        #     self.environment.stuck += 1
-        #     self.environment.prev_mario_x = self.environment.curr_mario_x
-        #     return (4, 8, None, None, False)
-        else: 
-            print("just sprinting")
-            #when the bottom of mario and right next to bottom of mario has ground while in air, hold down button
-            if np.all(game_area[15, y:y+2]==10) and self.environment._read_m(0xC20A) == 0x00:
-                print("Stay down")
-                return (0, 5, None, None, False)
-            self.environment.prev_mario_x = self.environment.curr_mario_x
-            self.environment.stuck = 0
-            return (2, 1, None, None, True)
-            
-
-        # if self.environment._read_m(0xC20A): #Mario on ground flag. 
-        #     return 4 #constant jumping
-        # else:
-        #     return 0
-        
+        context = self.rule_context()
+        context.obs = obs
+        context.x, context.y = x, y
+        context.hole = hole_found
+        context.qblock = found_qBlocks
+        context.on_pipe = on_pipe
+        context.stalled = self.environment.curr_mario_x == prev_mario_x
+
+        with self.profiler.phase("object_rules"):
+            rule = self.rules.match_objects(context)
+        if rule is None:
+            context.planned = self.environment.hazards.lookup(context.ram.world, context.ram.stage, self.environment.curr_mario_x)
+            logger.debug("game area:\n%s", game_area)
+            with self.profiler.phase("scene_rules"):
+                rule = self.rules.match_scene(context)
+        return self.rules.fire(rule, context)
+
+    def rule_context(self) -> RuleContext:
+        """
+        Builds this decision's RuleContext, feeding the object table to the enemy tracker if one is attached.
+        """
+        context = RuleContext(self.environment, self.parameters)
+        tracker = self.environment.tracker
+        if tracker is not None:
+            with self.profiler.phase("tracker"):
+                ram = context.ram
+                tracker.update(context.objects, self.environment.game_frame, ram.mario_x, ram.mario_y)
+                p = self.parameters
+                context.contact = tracker.time_to_contact(p.collision_dx, p.collision_dy, p.collision_frames)
+        return context
+
+    def object_rules(self) -> tuple:
+        """
+        Reacts to enemies and powerups in the object table. Returns None if no rule fires.
+        """
+        context = self.rule_context()
+        rule = self.rules.match_objects(context)
+        return None if rule is None else self.rules.fire(rule, context)
 
     def step(self):
         """
@@ -364,52 +611,185 @@ class MarioExpert:
 
         This is just a very basic example
         """
+        if self.scheduling == "timeline":
+            self.step_timeline()
+            return
+
+        if self.dataset is not None:
+            with self.profiler.phase("dataset"):
+                self.dataset.observe(self.environment)
         # Choose an action - button press or other...
-        action_duration = self.choose_action()
-
-        if isinstance(action_duration, tuple):
-            action = action_duration[0]
-            duration = action_duration[1]
-            action2 = action_duration[2]
-            duration2 = action_duration[3]
-            sprint = action_duration[4]
-            # Run the action on the environment
-            self.environment.run_action(action, duration, action2, duration2, sprint)
+        with self.profiler.phase("choose_action"):
+            action_duration = self.decide()
+        if self.lookahead is not None:
+            with self.profiler.phase("lookahead"):
+                action_duration = self.lookahead.choose(action_duration)
+        if self.dataset is not None:
+            with self.profiler.phase("dataset"):
+                self.dataset.append(action_duration)
+
+        start_frame = self.environment.pyboy.frame_count
+        with self.profiler.phase("run_action"):
+            if isinstance(action_duration, tuple):
+                action = action_duration[0]
+                duration = action_duration[1]
+                action2 = action_duration[2]
+                duration2 = action_duration[3]
+                sprint = action_duration[4]
+                # Run the action on the environment
+                self.environment.run_action(action, duration, action2, duration2, sprint)
+            else:
+                self.environment.run_action(action_duration)
+        self.profiler.count("steps")
+        self.profiler.count("ticks", self.environment.pyboy.frame_count - start_frame)
+
+    def step_timeline(self):
+        """
+        Non-blocking step: advances reaction_interval frames along the input timeline.
+
+        A new macro-action is chosen once the previous one has played out. In between, the object rules are
+        re-checked on every step and a rule asking for a different macro preempts whatever is still queued.
+        """
+        environment = self.environment
+        frame = environment.pyboy.frame_count
+        game_frame = environment.game_frame
+        if self.dataset is not None:
+            with self.profiler.phase("dataset"):
+                self.dataset.observe(environment)
+
+        if not environment.scheduler.pending(frame):
+            with self.profiler.phase("choose_action"):
+                macro = self.decide()
+            if self.lookahead is not None:
+                with self.profiler.phase("lookahead"):
+                    macro = self.lookahead.choose(macro)
+            if not isinstance(macro, tuple):
+                macro = (macro,)
+            self.current_macro = macro
+            if self.dataset is not None:
+                with self.profiler.phase("dataset"):
+                    self.dataset.append(macro)
+            environment.schedule_action(*macro, settle=False)
         else:
-            self.environment.run_action(action_duration)
+            with self.profiler.phase("object_rules"):
+                threat = self.object_rules()
+            if threat is not None and threat != self.current_macro:
+                logger.debug("preempting %s with %s", self.current_macro, threat)
+                environment.scheduler.preempt(frame)
+                self.current_macro = threat
+                if self.dataset is not None:
+                    with self.profiler.phase("dataset"):
+                        self.dataset.append(threat)
+                environment.schedule_action(*threat, settle=False)
+                self.profiler.count("preemptions")
+
+        with self.profiler.phase("run_action"):
+            environment.advance(self.reaction_interval)
+        self.profiler.count("steps")
+        self.profiler.count("ticks", environment.game_frame - game_frame)
 
     def play(self):
         """
         Do NOT edit this method.
+
+        Plays until game over or until stop_check gives a reason to stop, recorded in stopped_by. Either way
+        results.json is only written once the video has been fully encoded and closed.
         """
         self.environment.reset()
+        self.stopped_by = None
 
         frame = self.environment.grab_frame()
         height, width, _ = frame.shape
 
         self.start_video(f"{self.results_path}/mario_expert.mp4", width, height)
+        if self.dataset is not None:
+            self.dataset.begin_episode(parameters=self.parameters.as_dict())
 
         while not self.environment.get_game_over():
-            frame = self.environment.grab_frame()
-            self.video.write(frame)
+            with self.profiler.phase("record"):
+                self.record_frame()
+            if self.environment.checkpoints is not None:
+                with self.profiler.phase("checkpoints"):
+                    self.environment.checkpoints.observe(self.environment)
+            if self.environment.level_maps is not None:
+                with self.profiler.phase("level_map"):
+                    self.environment.level_maps.update(self.environment)
 
             self.step()
+            if self.stop_check is not None:
+                self.stopped_by = self.stop_check(self)
+                if self.stopped_by:
+                    break
+
+        self.stopped_by = self.stopped_by or "game_over"
+        self.stop_video()
+        if self.environment.level_maps is not None:
+            self.environment.level_maps.save()
 
         final_stats = self.environment.game_state()
         logging.info(f"Final Stats: {final_stats}")
+        if self.dataset is not None:
+            self.dataset.end_episode(final_stats)
+        logging.info(f"Observation cache: {self.environment.observation_cache_stats()}")
+        if self.lookahead is not None:
+            logging.info(f"Lookahead: {self.lookahead.stats()}")
+        if self.environment.tracker is not None:
+            logging.info(f"Enemy tracker: {self.environment.tracker.stats()}")
+        fired = {name: entry["hits"] for name, entry in self.rules.stats().items() if entry["hits"]}
+        logging.info(f"Rules fired: {fired}")
 
         with open(f"{self.results_path}/results.json", "w", encoding="utf-8") as file:
             json.dump(final_stats, file)
 
-        self.stop_video()
+        if self.profiler.enabled:
+            self.profiler.count("game_area_builds", self.environment.game_area_builds)
+            self.profiler.count("game_area_rebuilds_avoided", self.environment.game_area_hits)
+            if self.lookahead is not None:
+                for name, value in self.lookahead.stats().items():
+                    self.profiler.counters[f"lookahead_{name}"] = value
+            self.profiler.sections["rules"] = self.rules.stats()
+            self.profiler.dump(f"{self.results_path}/profile.json")
+
+    def record_frame(self) -> None:
+        if isinstance(self.video, replay_log.ReplayRecorder):
+            self.video.record_step()
+            return
+
+        self.recorded_steps += 1
+        if (self.recorded_steps - 1) % self.record_every:
+            return
+
+        screen_hash = self.environment.screen_hash()
+        duplicate = screen_hash == self.recorded_hash
+        self.recorded_hash = screen_hash
+        self.profiler.count("duplicate_frames", duplicate)
+
+        if isinstance(self.video, video_writer.AsyncVideoWriter):
+            if duplicate:
+                self.video.repeat()
+            else:
+                # raw 160x144 screen - resize, colour conversion and encoding happen on the writer thread
+                self.video.submit(self.environment.screen.ndarray)
+        else:
+            if not duplicate:
+                self.recorded_frame = self.environment.grab_frame()
+            self.video.write(self.recorded_frame)
 
     def start_video(self, video_name, width, height, fps=30):
         """
         Do NOT edit this method.
         """
-        self.video = cv2.VideoWriter(
-            video_name, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height)
-        )
+        if self.recording == "replay":
+            replay_path = f"{os.path.splitext(video_name)[0]}.replay.json.gz"
+            self.video = replay_log.ReplayRecorder(replay_path, self.environment)
+        elif self.recording == "async":
+            self.video = video_writer.AsyncVideoWriter(
+                video_name, width, height, fps, policy=self.video_policy
+            )
+        else:
+            self.video = cv2.VideoWriter(
+                video_name, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height)
+            )
 
     def stop_video(self) -> None:
         """
@@ -419,50 +799,44 @@ class MarioExpert:
 
 
     #finding coins or qblocks
-    def find_qBlocks(self) -> bool:
-        game_area = self.environment.game_area()
-        find_mario = self.find_mario()
+    def find_qBlocks(self, obs: observation.Observation = None, find_mario: tuple = None) -> bool:
+        if obs is None:
+            obs = self.environment.observation()
+            find_mario = self.find_mario(obs)
         qblock_x = 0
         qblock_y = 0
-           # print(mario_x)
-            #print("hello", mario_y)
-        #print(game_area)
-        for i in range(15, -1, -1):
-            for j in range(19, -1, -1):
-                #detects both coins (5) or mystery blocks (5)
-                if game_area[i,j] == 13 or game_area[i,j] == 5:
-                    qblock_x = i
-                    qblock_y = j
-                    #print(f"block_x {i} and block_y {j}")
-        #print(f"Qblock_x {qblock_x}, qblock_y {qblock_y}")     
+        #detects both coins (5) or mystery blocks (13) - the top-left most one, as the old bottom-up scan kept the last hit
+        qblock = tile_query.last_in_mask(obs.prize)
+        if qblock is not None:
+            qblock_x, qblock_y = qblock
         if find_mario is not None:
             mario_x, mario_y = find_mario
-            #print(f"mario_x {mario_x}, mario_y {mario_y}") 
             if  0<=(mario_y - qblock_y) < 2  and  0 <= (mario_x-qblock_x) < 5: #y is vertical. x is horizontal. ORIGINAL: (qblock_y==mario_y). 
-                print("found block")
+                logger.debug("found block")
                 return True
             else:
                 return False 
         
 
-    def on_pipe(self) -> bool:
-        game_area = self.environment.game_area()
-        find_mario = self.find_mario()
+    def on_pipe(self, obs: observation.Observation = None, find_mario: tuple = None) -> bool:
+        if obs is None:
+            obs = self.environment.observation()
+            find_mario = self.find_mario(obs)
         if isinstance(find_mario, tuple):
             mario_x = find_mario[0]
             mario_y = find_mario[1]
             if mario_x > 14:
                 return False
             if self.environment.stuck_on_pipe == 2:
-                print("Here 5")
+                logger.debug("Here 5")
                 self.environment.stuck_on_pipe = 0
                 return False
-            if self.environment.stuck_on_pipe == 1 and (game_area[mario_x+1][mario_y] == 14 or game_area[mario_x+1][mario_y - 1] == 14):
-                print("here 6")
+            if self.environment.stuck_on_pipe == 1 and (obs.pipe[mario_x+1][mario_y] or obs.pipe[mario_x+1][mario_y - 1]):
+                logger.debug("here 6")
                 self.environment.stuck_on_pipe += 1
                 #self.environment.stuck_on_pipe = 0
                 return True
-            if game_area[mario_x+1][mario_y] == 14 or game_area[mario_x+1][mario_y - 1] == 14:
+            if obs.pipe[mario_x+1][mario_y] or obs.pipe[mario_x+1][mario_y - 1]:
                 self.environment.stuck_on_pipe += 1
                 return True
         else:
@@ -470,37 +844,31 @@ class MarioExpert:
         
     #returns the location of where mario is in real time 
     #in the form of a tuple where the entire 
-    def find_mario(self) -> int:
-        game_area = self.environment.game_area() #a numpy array of size 16 x 20
-        for i in range(15, -1, -1):
-            for j in range(19, -1, -1):
-                if game_area[i,j] == 1:
-                   # print("mario found")
-                    return (i, j) #returns the bottom 2 values of mario's position
-        
-        return None
+    def find_mario(self, obs: observation.Observation = None) -> int:
+        if obs is None:
+            obs = self.environment.observation() #game_area of 16 x 20 plus class planes
+        return tile_query.first_in_mask(obs.mario) #returns the bottom 2 values of mario's position, None if not found
 
     
     #may need to change from bool to integer where each represent a different style of holes. 
-    def find_holes(self) -> bool:
-        game_area = self.environment.game_area()
-        
-        find_mario = self.find_mario()
+    def find_holes(self, obs: observation.Observation = None, find_mario: tuple = None, found_qBlocks: bool = None) -> bool:
+        if obs is None:
+            obs = self.environment.observation()
+            find_mario = self.find_mario(obs)
         
         if find_mario is not None:
             mario_x, mario_y = find_mario
         else:
             return False
         
-        #print(game_area)
         #may need to make this hole detection better. Just detecting whether a few indices away from mario on the last row, it contains 0 
         if mario_y >= 18 and mario_x > 11:
             return False
-        elif self.find_qBlocks():
+        elif found_qBlocks if found_qBlocks is not None else self.find_qBlocks(obs, find_mario):
              return False
         
-        elif np.all(game_area[mario_x+1: mario_x + 5, mario_y+1:mario_y+3] == 0) and self.environment._read_m(0xC20A):
-            print("block jumping")
+        elif obs.empty[mario_x+1:mario_x + 5, mario_y+1:mario_y+3].all() and self.environment.snapshot().on_ground:
+            logger.debug("block jumping")
             return True
         
         else:
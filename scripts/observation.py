@@ -0,0 +1,88 @@
+"""
+The game_area grid with per-class boolean planes, computed on demand, and column heights.
+
+MarioController.observation() builds one Observation per tick. Each class plane is computed the first
+time a detector asks for it, with a single lookup of the whole grid into a code -> membership table,
+and then shared by every later test that tick, so detectors test observation.pipe[row, col] or
+observation.empty[rows, cols].all() instead of comparing raw mapping_compressed codes themselves.
+
+The grid and the column heights are all that is serialised - to_bytes() is 340 bytes and the planes
+are rebuilt by from_bytes().
+"""
+
+import numpy as np
+
+import tile_query
+
+ROWS = 16
+COLUMNS = 20
+
+# A tile can be in several classes (a pipe is solid and a pipe)
+PLANES = {
+    "empty": (tile_query.EMPTY,),
+    "mario": (tile_query.MARIO,),
+    "solid": tile_query.SOLID,
+    "block": (tile_query.BLOCK,),
+    "pipe": (tile_query.PIPE,),
+    "prize": tile_query.PRIZE,
+    "collectible": tile_query.COLLECTIBLE,
+    "enemy": tile_query.ENEMY,
+    "hazard": tile_query.HAZARD,
+}
+
+# code -> membership lookup table per plane
+PLANE_TABLES = {}
+for _name, _codes in PLANES.items():
+    PLANE_TABLES[_name] = np.zeros(256, dtype=bool)
+    PLANE_TABLES[_name][list(_codes)] = True
+
+
+def _plane(name: str) -> property:
+    table = PLANE_TABLES[name]
+
+    def get(self) -> np.ndarray:
+        plane = self._planes.get(name)
+        if plane is None:
+            plane = self._planes[name] = table[self.grid]
+        return plane
+
+    get.__doc__ = f"Boolean plane of the {name} tiles, computed on first use and kept for the tick."
+    return property(get)
+
+
+class Observation:
+    """
+    Args:
+        grid (np.ndarray): A 16 x 20 game_area under mapping_compressed.
+        heights (np.ndarray, optional): Column heights if already known, e.g. when deserialising.
+    """
+
+    __slots__ = ("grid", "_planes", "_heights")
+
+    def __init__(self, grid: np.ndarray, heights: np.ndarray = None) -> None:
+        self.grid = grid
+        self._planes = {}
+        self._heights = heights
+
+    @property
+    def heights(self) -> np.ndarray:
+        """
+        Row of the highest solid tile per column, ROWS when the column has none.
+        """
+        if self._heights is None:
+            solid = self.solid
+            self._heights = np.where(solid.any(axis=0), solid.argmax(axis=0), ROWS).astype(np.uint8)
+        return self._heights
+
+    def to_bytes(self) -> bytes:
+        return self.grid.astype(np.uint8).tobytes() + self.heights.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Observation":
+        grid = np.frombuffer(data, dtype=np.uint8, count=ROWS * COLUMNS).reshape(ROWS, COLUMNS)
+        heights = np.frombuffer(data, dtype=np.uint8, offset=ROWS * COLUMNS)
+        return cls(grid, heights)
+
+
+for _name in PLANES:
+    setattr(Observation, _name, _plane(_name))
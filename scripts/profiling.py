@@ -0,0 +1,105 @@
+"""
+Low overhead per-phase timers and counters for the MarioExpert decision loop.
+
+with profiler.phase("detectors"):
+    ...
+profiler.count("ticks", 12)
+
+A disabled Profiler hands out one shared no-op phase and ignores counts, so instrumentation can stay
+in the hot path permanently. Summaries are dumped as JSON next to results.json.
+"""
+
+import json
+import time
+from collections import defaultdict
+
+
+class _Phase:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler: "Profiler", name: str) -> None:
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    def __enter__(self) -> "_Phase":
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self.profiler.add(self.name, time.perf_counter_ns() - self.start)
+        return False
+
+
+class _NoPhase:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoPhase":
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+
+_NO_PHASE = _NoPhase()
+
+
+class Profiler:
+    """
+    Args:
+        enabled (bool): Whether to record anything. Defaults to True.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.calls = defaultdict(int)
+        self.total_ns = defaultdict(int)
+        self.max_ns = defaultdict(int)
+        self.counters = defaultdict(int)
+        # Named summaries kept elsewhere (e.g. per-rule statistics), dumped alongside the phases
+        self.sections = {}
+        self._phases = {}
+
+    def phase(self, name: str):
+        """
+        Returns a context manager timing one occurrence of the named phase. Not re-entrant per name.
+        """
+        if not self.enabled:
+            return _NO_PHASE
+        phase = self._phases.get(name)
+        if phase is None:
+            phase = self._phases[name] = _Phase(self, name)
+        return phase
+
+    def add(self, name: str, elapsed_ns: int) -> None:
+        self.calls[name] += 1
+        self.total_ns[name] += elapsed_ns
+        if elapsed_ns > self.max_ns[name]:
+            self.max_ns[name] = elapsed_ns
+
+    def count(self, name: str, amount: int = 1) -> None:
+        if self.enabled:
+            self.counters[name] += amount
+
+    def reset(self) -> None:
+        self.calls.clear()
+        self.total_ns.clear()
+        self.max_ns.clear()
+        self.counters.clear()
+        self.sections.clear()
+
+    def summary(self) -> dict:
+        phases = {}
+        for name, calls in self.calls.items():
+            total = self.total_ns[name]
+            phases[name] = {
+                "calls": calls,
+                "total_ms": round(total / 1e6, 3),
+                "mean_us": round(total / calls / 1e3, 3),
+                "max_us": round(self.max_ns[name] / 1e3, 3),
+            }
+        return {"phases": phases, "counters": dict(self.counters), **self.sections}
+
+    def dump(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.summary(), file, indent=2)
@@ -1,11 +1,11 @@
 import os
-import subprocess
 from pathlib import Path
 
-import virtualenv
 from pydrive2.auth import GoogleAuth
 from pydrive2.drive import GoogleDrive
 
+import tournament
+
 
 def read_folder(drive, title, file_id):
     folder = {}
@@ -44,20 +44,9 @@ def print_folders(directory, tab=0):
         print_folders(folder, tab=tab + 5)
 
 
-def run_venv(upi, requirement_path):
-    path = f"{os.path.expanduser('~')}/venv"
-    venv_dir = os.path.join(path, f"{upi}")
-    virtualenv.cli_run([venv_dir])
-
-    python_bin = f"{path}/{upi}/bin/python3"
-
-    command = f". {venv_dir}/bin/activate && pip install -r {requirement_path}/requirements.txt"
-    os.system(command)
-
-    return subprocess.Popen([python_bin, "run.py", "--upi", upi, "--headless"])
-
-
 def main():
+    args = tournament.get_args()
+
     gauth = GoogleAuth()
     gauth.LocalWebserverAuth()
 
@@ -70,7 +59,7 @@ def main():
 
     print_folders(directory)
 
-    sub_processes = {}
+    submissions_path = Path(args.submissions_path)
     for folders in directory["folders"]:
         upi = folders["title"]
         print(f"Title: {upi}")
@@ -79,20 +68,17 @@ def main():
         requirements_id = files["requirements.txt"]["id"]
         mario_expert_id = files["mario_expert.py"]["id"]
 
-        requirement_path = f"{Path(__file__).parent.parent}"
+        submission_path = submissions_path / upi
+        os.makedirs(submission_path, exist_ok=True)
 
         file = drive.CreateFile({"id": requirements_id})
-        file.GetContentFile(f"{requirement_path}/requirements.txt")
+        file.GetContentFile(f"{submission_path}/requirements.txt")
 
         file = drive.CreateFile({"id": mario_expert_id})
-        file.GetContentFile("mario_expert.py")
-
-        p = run_venv(upi, requirement_path)
-        sub_processes[upi] = p
+        file.GetContentFile(f"{submission_path}/mario_expert.py")
 
-    for upi, p in sub_processes.items():
-        exit_code = p.wait()
-        print(f"Exit code: {exit_code} {upi}")
+    args.venv_root = Path(args.venv_root)
+    tournament.run_tournament(submissions_path, Path(args.results_path), args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,162 @@
+"""
+A single-pass capture of every RAM address the environment and the expert read during a step.
+
+MarioEnvironment exposes one getter per value, each going through PyboyEnvironment._read_m. A
+RAMSnapshot reads the same addresses once per frame in a single pass and decodes them with integer
+arithmetic, returning exactly what the MarioEnvironment getters return.
+
+Addresses are read one by one rather than sliced: pyboy.memory builds a Python list for a slice, which
+costs more than the handful of scattered single-byte reads needed here.
+
+https://datacrystal.tcrf.net/wiki/Super_Mario_Land/RAM_map
+"""
+
+import numpy as np
+
+ADDR_WORLD = 0x982C
+ADDR_STAGE = 0x982E
+ADDR_TIME = 0x9831
+ADDR_GAME_OVER = 0xC0A4
+ADDR_LEVEL_BLOCK = 0xC0AB
+ADDR_DEAD_JUMP_TIMER = 0xC0AC
+ADDR_MARIO_Y = 0xC201
+ADDR_MARIO_X = 0xC202
+ADDR_MARIO_POSE = 0xC203
+ADDR_ON_GROUND = 0xC20A
+ADDR_LIVES = 0xDA15
+ADDR_DEAD_TIMER = 0xFFA6
+ADDR_COINS = 0xFFFA
+
+GAME_OVER = 0x39
+
+# Every address captured per frame
+RAM_ADDRESSES = (
+    ADDR_WORLD,
+    ADDR_STAGE,
+    ADDR_TIME,
+    ADDR_TIME + 1,
+    ADDR_TIME + 2,
+    ADDR_GAME_OVER,
+    ADDR_LEVEL_BLOCK,
+    ADDR_DEAD_JUMP_TIMER,
+    ADDR_MARIO_Y,
+    ADDR_MARIO_X,
+    ADDR_MARIO_POSE,
+    0xC207,  # mario jump state
+    ADDR_ON_GROUND,
+    ADDR_LIVES,
+    ADDR_DEAD_TIMER,
+    ADDR_COINS,
+)
+
+
+class RAMSnapshot:
+    """
+    The captured RAM values for one frame.
+
+    Args:
+        values (dict[int, int]): Byte value per captured address.
+        scx (int): Background scroll x of the playfield (scanline 16) for the x position.
+        score (int): The score as tracked by the PyBoy game wrapper.
+    """
+
+    def __init__(self, values: dict[int, int], scx: int, score: int) -> None:
+        self.values = values
+        self.scx = scx
+        self.score = score
+
+    @classmethod
+    def capture(cls, pyboy) -> "RAMSnapshot":
+        memory = pyboy.memory
+        values = {addr: memory[addr] for addr in RAM_ADDRESSES}
+
+        scx = pyboy.screen.tilemap_position_list[16][0]
+        return cls(values, scx, pyboy.game_wrapper.score)
+
+    def __getitem__(self, addr: int) -> int:
+        return self.values[addr]
+
+    def __contains__(self, addr: int) -> bool:
+        return addr in self.values
+
+    def bit(self, addr: int, bit: int) -> bool:
+        return (self.values[addr] >> bit) & 1 == 1
+
+    def as_array(self) -> np.ndarray:
+        """
+        Returns the captured bytes in RAM_ADDRESSES order as a flat uint8 array.
+        """
+        return np.fromiter(self.values.values(), dtype=np.uint8, count=len(self.values))
+
+    @property
+    def lives(self) -> int:
+        return self.values[ADDR_LIVES]
+
+    @property
+    def coins(self) -> int:
+        return self.values[ADDR_COINS]
+
+    @property
+    def world(self) -> int:
+        return self.values[ADDR_WORLD]
+
+    @property
+    def stage(self) -> int:
+        return self.values[ADDR_STAGE]
+
+    @property
+    def time(self) -> int:
+        hundreds = self.values[ADDR_TIME]
+        tens = self.values[ADDR_TIME + 1]
+        ones = self.values[ADDR_TIME + 2]
+        if hundreds < 10 and tens < 10 and ones < 10:
+            return 100 * hundreds + 10 * tens + ones
+        # Non-digit tiles (e.g. blanks) - keep MarioEnvironment.get_time's decimal concatenation
+        return int(str(hundreds) + str(tens) + str(ones))
+
+    @property
+    def game_over(self) -> bool:
+        return self.values[ADDR_GAME_OVER] == GAME_OVER
+
+    @property
+    def mario_pose(self) -> int:
+        return self.values[ADDR_MARIO_POSE]
+
+    @property
+    def dead_timer(self) -> int:
+        return self.values[ADDR_DEAD_TIMER]
+
+    @property
+    def dead_jump_timer(self) -> int:
+        return self.values[ADDR_DEAD_JUMP_TIMER]
+
+    @property
+    def mario_x(self) -> int:
+        return self.values[ADDR_MARIO_X]
+
+    @property
+    def mario_y(self) -> int:
+        return self.values[ADDR_MARIO_Y]
+
+    @property
+    def on_ground(self) -> int:
+        return self.values[ADDR_ON_GROUND]
+
+    @property
+    def x_position(self) -> int:
+        real = (self.scx - 7) % 16 or 16
+        return self.values[ADDR_LEVEL_BLOCK] * 16 + real + self.values[ADDR_MARIO_X]
+
+    def game_state(self) -> dict[str, any]:
+        return {
+            "lives": self.lives,
+            "score": self.score,
+            "coins": self.coins,
+            "stage": self.stage,
+            "world": self.world,
+            "x_position": self.x_position,
+            "time": self.time,
+            "dead_timer": self.dead_timer,
+            "dead_jump_timer": self.dead_jump_timer,
+            "game_over": self.game_over,
+        }
@@ -0,0 +1,297 @@
+"""
+Compact, exact replays of a MarioExpert run.
+
+A replay log stores the state the run started from - which init.state, or for a run reset to a
+checkpoint the save state itself - every input MarioController sent as (frame, WindowEvent) relative to
+that state, the frames at which play() recorded a video frame and a
+CRC32 of the expert's RAM snapshot every checksum_interval frames. The emulator is deterministic, so
+re-driving PyBoy headless with the same inputs reproduces every frame - the checksums prove it.
+
+python3 replay_log.py ../results/your_upi/mario_expert.replay.json.gz --render replay.mp4
+python3 replay_log.py ../results/your_upi/mario_expert.replay.json.gz --frame 1200 --screenshot f.png
+"""
+
+import argparse
+import base64
+import bisect
+import gzip
+import hashlib
+import json
+import logging
+import zlib
+
+import cv2
+import numpy as np
+
+REPLAY_VERSION = 2
+# Versions load() reads - version 1 logs always start from init.state
+READABLE_VERSIONS = (1, 2)
+
+
+class ReplayMismatch(Exception):
+    """
+    Raised when a replayed run diverges from its recorded RAM checksums.
+    """
+
+
+def state_sha256(state: bytes) -> str:
+    return hashlib.sha256(state).hexdigest()
+
+
+def ram_checksum(environment) -> int:
+    """
+    CRC32 over the per-frame RAM snapshot and the object table of a MarioController.
+    """
+    checksum = zlib.crc32(environment.snapshot().as_array().tobytes())
+    return zlib.crc32(environment.objects().objects.tobytes(), checksum)
+
+
+class ReplayLog:
+    """
+    The contents of a replay file. Frame indices are relative to the frame the run was reset at.
+
+    init_state names the start state and init_sha256 hashes its bytes. A run started from a checkpoint
+    carries the checkpoint's name and save state, so it replays without the pool it came from.
+    """
+
+    def __init__(
+        self,
+        init_state: str,
+        init_sha256: str,
+        checksum_interval: int,
+        events: list = None,
+        steps: list = None,
+        checksums: list = None,
+        frames: int = 0,
+        start_checkpoint: str = None,
+        start_state: bytes = None,
+    ) -> None:
+        self.init_state = init_state
+        self.init_sha256 = init_sha256
+        self.checksum_interval = checksum_interval
+        self.events = events if events is not None else []
+        self.steps = steps if steps is not None else []
+        self.checksums = checksums if checksums is not None else []
+        self.frames = frames
+        self.start_checkpoint = start_checkpoint
+        self.start_state = start_state
+
+    def save(self, path: str) -> None:
+        start_state = None if self.start_state is None else base64.b64encode(self.start_state).decode("ascii")
+        log = {
+            "version": REPLAY_VERSION,
+            "init_state": self.init_state,
+            "init_sha256": self.init_sha256,
+            "checksum_interval": self.checksum_interval,
+            "frames": self.frames,
+            "events": self.events,
+            "steps": self.steps,
+            "checksums": self.checksums,
+            "start_checkpoint": self.start_checkpoint,
+            "start_state": start_state,
+        }
+        with gzip.open(path, "wt", encoding="utf-8") as file:
+            json.dump(log, file, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> "ReplayLog":
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            log = json.load(file)
+
+        if log["version"] not in READABLE_VERSIONS:
+            raise ValueError(f"Unsupported replay version {log['version']} in {path}")
+
+        return cls(
+            log["init_state"],
+            log["init_sha256"],
+            log["checksum_interval"],
+            [tuple(event) for event in log["events"]],
+            log["steps"],
+            [tuple(checksum) for checksum in log["checksums"]],
+            log["frames"],
+            log.get("start_checkpoint"),
+            None if log.get("start_state") is None else base64.b64decode(log["start_state"]),
+        )
+
+
+class ReplayRecorder:
+    """
+    Records a live run into a ReplayLog. Exposes release() so MarioExpert can treat it like a video.
+
+    Args:
+        path (str): Where the log is written on release.
+        environment (MarioController): The controller whose inputs are recorded.
+        checksum_interval (int): Frames between RAM checksums. Defaults to 300.
+    """
+
+    def __init__(self, path: str, environment, checksum_interval: int = 300) -> None:
+        self.path = path
+        self.environment = environment
+        self.start_frame = environment.game_frame
+        self.next_checksum = 0
+
+        checkpoint = environment.start_checkpoint
+        if checkpoint is None:
+            self.log = ReplayLog(
+                environment.init_path, state_sha256(environment.init_state()), checksum_interval
+            )
+        else:
+            # reset() has just loaded this checkpoint - keep its bytes, the pool may not be around to replay
+            state = environment.checkpoints.get(checkpoint)
+            self.log = ReplayLog(
+                f"checkpoint {checkpoint}",
+                state_sha256(state),
+                checksum_interval,
+                start_checkpoint=checkpoint,
+                start_state=state,
+            )
+        environment.input_log = self
+
+    def record_input(self, frame: int, event: int) -> None:
+        self.log.events.append((frame - self.start_frame, int(event)))
+
+    def record_step(self) -> None:
+        frame = self.environment.game_frame - self.start_frame
+        self.log.steps.append(frame)
+        if frame >= self.next_checksum:
+            self.log.checksums.append((frame, ram_checksum(self.environment)))
+            self.next_checksum = frame + self.log.checksum_interval
+
+    def release(self) -> None:
+        if self.environment.input_log is self:
+            self.environment.input_log = None
+        self.log.frames = self.environment.game_frame - self.start_frame
+        self.log.save(self.path)
+        logging.info(
+            f"Replay {self.path}: {len(self.log.events)} inputs, {len(self.log.checksums)} checksums, "
+            f"{self.log.frames} frames"
+        )
+
+
+class Replayer:
+    """
+    Re-drives a headless MarioController from a ReplayLog.
+
+    Args:
+        log (ReplayLog): The recorded run.
+        environment (MarioController): A controller for the same ROM - ideally headless with
+            emulation_speed=0. It is reset to the log's start state.
+    """
+
+    def __init__(self, log: ReplayLog, environment) -> None:
+        self.log = log
+        self.environment = environment
+
+        if log.start_state is None and state_sha256(environment.init_state()) != log.init_sha256:
+            logging.warning(f"{environment.init_path} differs from the recorded {log.init_state}")
+
+        self._checksums = dict(log.checksums)
+        self._checksum_frames = sorted(self._checksums)
+        self.rewind()
+
+    @property
+    def frame(self) -> int:
+        return self.environment.pyboy.frame_count - self.start_frame
+
+    def rewind(self) -> None:
+        if self.log.start_state is None:
+            self.environment.reset()
+        else:
+            self.environment.load_state(self.log.start_state)
+        self.start_frame = self.environment.pyboy.frame_count
+        self._next_event = 0
+
+    def seek(self, frame: int) -> None:
+        """
+        Advances the emulator to the given frame, rewinding first if it lies in the past.
+        """
+        if frame > self.log.frames:
+            raise ValueError(f"Frame {frame} is beyond the end of the replay ({self.log.frames})")
+        if frame < self.frame:
+            self.rewind()
+
+        pyboy = self.environment.pyboy
+        events = self.log.events
+        while True:
+            current = self.frame
+            self._verify(current)
+            if current == frame:
+                return
+
+            while self._next_event < len(events) and events[self._next_event][0] == current:
+                pyboy.send_input(events[self._next_event][1])
+                self._next_event += 1
+
+            # Run to the next point of interest without rendering the frames in between
+            target = frame
+            if self._next_event < len(events):
+                target = min(target, events[self._next_event][0])
+            upcoming = bisect.bisect_right(self._checksum_frames, current)
+            if upcoming < len(self._checksum_frames):
+                target = min(target, self._checksum_frames[upcoming])
+
+            count = max(target - current, 1)
+            pyboy.tick(count, target == frame)
+
+    def screen(self, frame: int) -> np.ndarray:
+        """
+        Returns a copy of the raw screen at the given frame.
+        """
+        self.seek(frame)
+        return np.array(self.environment.screen.ndarray)
+
+    def render(self, video_name: str, width: int = 300, height: int = 240, fps: int = 30) -> None:
+        """
+        Renders the same video play() would have recorded - one frame per expert step.
+        """
+        video = cv2.VideoWriter(video_name, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+        for frame in self.log.steps:
+            self.seek(frame)
+            video.write(self.environment.grab_frame(height, width))
+        video.release()
+
+    def _verify(self, frame: int) -> None:
+        expected = self._checksums.get(frame)
+        if expected is None:
+            return
+        actual = ram_checksum(self.environment)
+        if actual != expected:
+            raise ReplayMismatch(f"RAM checksum mismatch at frame {frame}: {actual} != {expected}")
+
+
+def get_args():
+    parse_args = argparse.ArgumentParser()
+
+    parse_args.add_argument("replay_path", type=str)
+    parse_args.add_argument("--render", type=str, default=None)
+    parse_args.add_argument("--frame", type=int, default=None)
+    parse_args.add_argument("--screenshot", type=str, default="frame.png")
+
+    return parse_args.parse_args()
+
+
+def main():
+    from mario_expert import MarioController
+
+    logging.basicConfig(level=logging.INFO)
+    args = get_args()
+
+    log = ReplayLog.load(args.replay_path)
+    replayer = Replayer(log, MarioController(headless=True, emulation_speed=0))
+
+    if args.frame is not None:
+        frame = replayer.screen(args.frame)
+        cv2.imwrite(args.screenshot, cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+        logging.info(f"Saved frame {args.frame} to {args.screenshot}")
+
+    if args.render is not None:
+        replayer.render(args.render)
+        logging.info(f"Rendered {len(log.steps)} frames to {args.render}")
+
+    if args.frame is None and args.render is None:
+        replayer.seek(log.frames)
+        logging.info(f"Replayed {log.frames} frames, {len(log.checksums)} checksums verified")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Append-only SQLite store of every results.json ever produced, with an indexed leaderboard.
+
+results.json is overwritten by every run, so the store keeps one row per run instead: ingest() walks a
+results directory (results/<upi>/results.json) and only reads files whose modification time or size
+changed since they were last ingested, so re-ingesting after a tournament costs one stat() per agent.
+Rows are never updated or deleted.
+
+Leaderboard queries are served by indexes on (world, stage, score), the ordering of
+compare_results.compare_performance. Every agent's latest and best run are kept in the latest_runs and
+best_runs tables, updated by each insert, so a top-K over agents reads K index entries instead of
+ranking the whole history.
+
+python3 results_store.py ingest -r ../results --db ../results/results.db
+python3 results_store.py top --db ../results/results.db -k 10
+python3 results_store.py history --db ../results/results.db --upi abcd123
+"""
+
+import argparse
+import json
+import logging
+import sqlite3
+import time
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    upi TEXT NOT NULL,
+    commit_hash TEXT,
+    timestamp REAL NOT NULL,
+    world INTEGER NOT NULL,
+    stage INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    lives INTEGER,
+    coins INTEGER,
+    x_position INTEGER,
+    frames INTEGER,
+    wall_time REAL,
+    fps REAL,
+    decision_ms_mean REAL,
+    decision_ms_p95 REAL,
+    stopped_by TEXT,
+    results TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_rank ON runs (world DESC, stage DESC, score DESC);
+CREATE INDEX IF NOT EXISTS runs_history ON runs (upi, timestamp);
+CREATE TABLE IF NOT EXISTS latest_runs (
+    upi TEXT PRIMARY KEY,
+    run_id INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    world INTEGER NOT NULL,
+    stage INTEGER NOT NULL,
+    score INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS latest_runs_rank ON latest_runs (world DESC, stage DESC, score DESC, upi);
+CREATE TABLE IF NOT EXISTS best_runs (
+    upi TEXT PRIMARY KEY,
+    run_id INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    world INTEGER NOT NULL,
+    stage INTEGER NOT NULL,
+    score INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS best_runs_rank ON best_runs (world DESC, stage DESC, score DESC, upi);
+CREATE TABLE IF NOT EXISTS ingested (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+"""
+
+# results.json keys copied into their own columns - everything is also kept verbatim in `results`
+COLUMNS = (
+    "world",
+    "stage",
+    "score",
+    "lives",
+    "coins",
+    "x_position",
+    "frames",
+    "wall_time",
+    "fps",
+    "decision_ms_mean",
+    "decision_ms_p95",
+    "stopped_by",
+)
+
+RANK_ORDER = "world DESC, stage DESC, score DESC"
+
+# Upserts of a new run into the per-agent leader tables - a run replaces the current leader only if it
+# is more recent (latest_runs) or ranks higher, ties going to the earlier run (best_runs)
+LEADER_COLUMNS = "upi, run_id, timestamp, world, stage, score"
+LEADER_UPDATE = (
+    "run_id = excluded.run_id, timestamp = excluded.timestamp, "
+    "world = excluded.world, stage = excluded.stage, score = excluded.score"
+)
+UPSERT_LATEST = (
+    f"INSERT INTO latest_runs ({LEADER_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?) "
+    f"ON CONFLICT (upi) DO UPDATE SET {LEADER_UPDATE} "
+    "WHERE (excluded.timestamp, excluded.run_id) > (latest_runs.timestamp, latest_runs.run_id)"
+)
+UPSERT_BEST = (
+    f"INSERT INTO best_runs ({LEADER_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?) "
+    f"ON CONFLICT (upi) DO UPDATE SET {LEADER_UPDATE} "
+    "WHERE (excluded.world, excluded.stage, excluded.score, -excluded.timestamp) "
+    "> (best_runs.world, best_runs.stage, best_runs.score, -best_runs.timestamp)"
+)
+
+
+class ResultsStore:
+    """
+    Args:
+        path (str): SQLite database file, created if missing.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+        self._fill_leaders()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "ResultsStore":
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self.close()
+        return False
+
+    def add(self, upi: str, results: dict, timestamp: float = None, commit: str = None) -> int:
+        """
+        Appends one run and returns its row id.
+        """
+        row = {name: results.get(name) for name in COLUMNS}
+        row.update(
+            {
+                "upi": upi,
+                "commit_hash": commit or results.get("commit"),
+                "timestamp": time.time() if timestamp is None else timestamp,
+                "results": json.dumps(results),
+            }
+        )
+        names = ", ".join(row)
+        values = ", ".join(f":{name}" for name in row)
+        with self.connection:
+            cursor = self.connection.execute(f"INSERT INTO runs ({names}) VALUES ({values})", row)
+            leader = (upi, cursor.lastrowid, row["timestamp"], row["world"], row["stage"], row["score"])
+            self.connection.execute(UPSERT_LATEST, leader)
+            self.connection.execute(UPSERT_BEST, leader)
+        return cursor.lastrowid
+
+    def _fill_leaders(self) -> None:
+        """
+        Builds the leader tables of a database written before they existed - a one-off pass over runs.
+        """
+        if self.connection.execute("SELECT 1 FROM latest_runs LIMIT 1").fetchone() is not None:
+            return
+        if self.connection.execute("SELECT 1 FROM runs LIMIT 1").fetchone() is None:
+            return
+        with self.connection:
+            leaders = (("latest_runs", "timestamp DESC, id DESC"), ("best_runs", f"{RANK_ORDER}, timestamp"))
+            for table, order in leaders:
+                self.connection.execute(
+                    f"INSERT INTO {table} ({LEADER_COLUMNS}) "
+                    f"SELECT upi, id, timestamp, world, stage, score FROM (SELECT *, ROW_NUMBER() OVER "
+                    f"(PARTITION BY upi ORDER BY {order}) AS n FROM runs) WHERE n = 1"
+                )
+
+    def ingest(self, results_path: str, commit: str = None) -> int:
+        """
+        Adds every results/<upi>/results.json that is new or changed since the last ingest. Returns how
+        many runs were added.
+        """
+        added = 0
+        for path in sorted(Path(results_path).glob("*/results.json")):
+            stat = path.stat()
+            seen = self.connection.execute(
+                "SELECT mtime, size FROM ingested WHERE path = ?", (str(path),)
+            ).fetchone()
+            if seen is not None and seen["mtime"] == stat.st_mtime and seen["size"] == stat.st_size:
+                continue
+
+            with open(path, "r", encoding="utf-8") as file:
+                results = json.load(file)
+            self.add(path.parent.name, results, stat.st_mtime, commit)
+            with self.connection:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO ingested (path, mtime, size) VALUES (?, ?, ?)",
+                    (str(path), stat.st_mtime, stat.st_size),
+                )
+            added += 1
+
+        logging.info(f"Ingested {added} new runs from {results_path}")
+        return added
+
+    def top(self, k: int = None, runs: str = "latest") -> list[dict]:
+        """
+        The best k entries in compare_performance order. runs selects which runs compete: "latest" ranks
+        every agent's most recent run (what results.json held), "best" every agent's best run, "all" every
+        run ever stored.
+        """
+        limit = "" if k is None else f" LIMIT {int(k)}"
+        if runs == "all":
+            query = f"SELECT * FROM runs ORDER BY {RANK_ORDER}, timestamp{limit}"
+        else:
+            table = "latest_runs" if runs == "latest" else "best_runs"
+            query = (
+                f"SELECT runs.* FROM {table} JOIN runs ON runs.id = {table}.run_id "
+                f"ORDER BY {table}.world DESC, {table}.stage DESC, {table}.score DESC, {table}.upi{limit}"
+            )
+        return [_entry(row) for row in self.connection.execute(query)]
+
+    def history(self, upi: str) -> list[dict]:
+        """
+        Every run of one agent, oldest first.
+        """
+        rows = self.connection.execute(
+            "SELECT * FROM runs WHERE upi = ? ORDER BY timestamp, id", (upi,)
+        )
+        return [_entry(row) for row in rows]
+
+
+def _entry(row: sqlite3.Row) -> dict:
+    entry = json.loads(row["results"])
+    entry.update(
+        {
+            "upi": row["upi"],
+            "commit": row["commit_hash"],
+            "timestamp": row["timestamp"],
+        }
+    )
+    return entry
+
+
+def get_args():
+    parse_args = argparse.ArgumentParser()
+
+    parse_args.add_argument("command", choices=["ingest", "top", "history"])
+    parse_args.add_argument("--db", type=str, required=True)
+    parse_args.add_argument("-r", "--results_path", type=str, default=None)
+    parse_args.add_argument("--commit", type=str, default=None)
+    parse_args.add_argument("-k", type=int, default=10)
+    parse_args.add_argument("--runs", choices=["latest", "best", "all"], default="latest")
+    parse_args.add_argument("--upi", type=str, default=None)
+
+    return parse_args.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = get_args()
+
+    with ResultsStore(args.db) as store:
+        if args.command == "ingest":
+            store.ingest(args.results_path, args.commit)
+        elif args.command == "top":
+            for i, result in enumerate(store.top(args.k, args.runs)):
+                logging.info(
+                    f"Rank {i + 1}: {result['upi']} - World: {result['world']} Stage: {result['stage']} Score: {result['score']}"
+                )
+        else:
+            for result in store.history(args.upi):
+                logging.info(
+                    f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(result['timestamp']))} "
+                    f"{result['commit'] or '-'} - World: {result['world']} Stage: {result['stage']} "
+                    f"Score: {result['score']} Frames: {result.get('frames', '-')}"
+                )
+
+
+if __name__ == "__main__":
+    main()
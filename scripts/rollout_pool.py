@@ -0,0 +1,198 @@
+"""
+Long-lived worker processes, each owning one headless emulator, for running rollouts in parallel.
+
+Every worker builds its MarioController once - loading the ROM a single time - and then serves jobs
+until the pool is closed. A job is a save state with the controller attributes and held buttons that
+go with it, a sequence of macro-actions and a frame count: the worker loads the state, plays the macros
+for exactly that many frames (see lookahead.rollout) and returns the RAMSnapshot it ended on with a few
+summary stats. Save states travel through one shared
+memory slot per worker instead of being pickled through the job queue, and jobs are handed to
+whichever worker is idle, so throughput scales with the number of cores.
+
+with RolloutPool(workers=4) as pool:
+    results = pool.map([(state_bytes, ((2, 5, None, None, True),), 60, attributes, held)])
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import time
+import traceback
+from multiprocessing import shared_memory
+
+import lookahead
+from expert_parameters import ExpertParameters
+
+# Save states of the Mario ROM are a few tens of KB
+STATE_SLOT_BYTES = 1 << 20
+
+
+def mario_controller():
+    from mario_expert import MarioController
+
+    return MarioController(emulation_speed=0, headless=True)
+
+
+def _serve(factory, index: int, slot_name: str, jobs, results, parameters: dict, hazard_tables: str) -> None:
+    environment = factory()
+    # Rollouts schedule macros with the expert's parameters and hazard tables, as they do in its own emulator
+    if parameters is not None:
+        environment.parameters = ExpertParameters.from_dict(parameters)
+    if hazard_tables is not None:
+        environment.hazards.load(hazard_tables)
+    slot = shared_memory.SharedMemory(name=slot_name)
+    try:
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+
+            job_id, size, macros, frames, attributes, held = job
+            start = time.perf_counter()
+            try:
+                lookahead.restore(environment, bytes(slot.buf[:size]), attributes, held=held)
+                before, after = lookahead.rollout(environment, macros, frames)
+            except Exception:
+                results.put((index, job_id, None, traceback.format_exc()))
+                continue
+
+            result = {
+                "snapshot": after,
+                "progress": after.x_position - before.x_position,
+                "died": lookahead.died(before, after),
+                "score": lookahead.score(before, after),
+                "frames": frames,
+                "seconds": time.perf_counter() - start,
+            }
+            results.put((index, job_id, result, None))
+    finally:
+        slot.close()
+
+
+class RolloutPool:
+    """
+    Args:
+        workers (int, optional): Number of worker processes. Defaults to os.cpu_count().
+        factory (Callable, optional): Picklable function building a worker's controller. Defaults to a headless
+            MarioController.
+        start_method (str, optional): multiprocessing start method. Defaults to "spawn".
+        slot_bytes (int, optional): Size of each worker's shared memory slot. Defaults to STATE_SLOT_BYTES.
+        parameters (dict, optional): ExpertParameters.as_dict() of the expert the rollouts are for. Defaults to
+            None for the defaults.
+        hazard_tables (str, optional): Directory of hazard tables the workers' controllers load. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        workers: int = None,
+        factory=mario_controller,
+        start_method: str = "spawn",
+        slot_bytes: int = STATE_SLOT_BYTES,
+        parameters: dict = None,
+        hazard_tables: str = None,
+    ) -> None:
+        context = multiprocessing.get_context(start_method)
+        self.results = context.Queue()
+        self.slot_bytes = slot_bytes
+
+        self.processes = []
+        self.slots = []
+        self.queues = []
+        for index in range(workers or os.cpu_count()):
+            slot = shared_memory.SharedMemory(create=True, size=slot_bytes)
+            jobs = context.Queue()
+            process = context.Process(
+                target=_serve,
+                args=(factory, index, slot.name, jobs, self.results, parameters, hazard_tables),
+                daemon=True,
+            )
+            process.start()
+            self.processes.append(process)
+            self.slots.append(slot)
+            self.queues.append(jobs)
+
+        self.rollouts = 0
+        self.rollout_frames = 0
+        self.worker_seconds = 0.0
+        self.seconds = 0.0
+
+        logging.info(f"Started {len(self.processes)} rollout workers")
+
+    def __enter__(self) -> "RolloutPool":
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self.close()
+        return False
+
+    def _submit(self, index: int, job_id: int, job: tuple) -> None:
+        state, macros, frames, attributes, held = job
+        size = len(state)
+        if size > self.slot_bytes:
+            raise ValueError(f"Save state of {size} bytes does not fit a {self.slot_bytes} byte slot")
+        self.slots[index].buf[:size] = state
+        self.queues[index].put((job_id, size, macros, frames, attributes, held))
+
+    def _collect(self) -> tuple:
+        while True:
+            try:
+                return self.results.get(timeout=1.0)
+            except queue.Empty:
+                dead = [p.pid for p in self.processes if not p.is_alive()]
+                if dead:
+                    raise RuntimeError(f"Rollout workers {dead} exited")
+
+    def map(self, jobs: list) -> list:
+        """
+        Runs (save state bytes, macro-actions, frames, controller attributes, held buttons) jobs and returns
+        their results in order.
+        """
+        start = time.perf_counter()
+        results = [None] * len(jobs)
+        idle = list(range(len(self.processes)))
+        submitted = 0
+        for _ in range(len(jobs)):
+            while idle and submitted < len(jobs):
+                self._submit(idle.pop(), submitted, jobs[submitted])
+                submitted += 1
+
+            index, job_id, result, error = self._collect()
+            idle.append(index)
+            if error is not None:
+                raise RuntimeError(f"Rollout {job_id} failed in worker {index}:\n{error}")
+            results[job_id] = result
+            self.rollouts += 1
+            self.rollout_frames += result["frames"]
+            self.worker_seconds += result["seconds"]
+
+        self.seconds += time.perf_counter() - start
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self.processes),
+            "rollouts": self.rollouts,
+            "rollout_frames": self.rollout_frames,
+            "seconds": round(self.seconds, 3),
+            "rollouts_per_second": round(self.rollouts / self.seconds, 1) if self.seconds else 0.0,
+            "worker_utilisation": (
+                round(self.worker_seconds / (self.seconds * len(self.processes)), 3)
+                if self.seconds
+                else 0.0
+            ),
+        }
+
+    def close(self) -> None:
+        for jobs in self.queues:
+            jobs.put(None)
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for slot in self.slots:
+            slot.close()
+            slot.unlink()
+        self.processes.clear()
+        self.slots.clear()
+        self.queues.clear()
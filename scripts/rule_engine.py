@@ -0,0 +1,196 @@
+"""
+Declarative decision rules for MarioExpert, compiled once into a dispatch structure.
+
+A Rule is a condition over a RuleContext, a priority, the macro-action it returns and the bookkeeping it
+does when it fires (commit prev_mario_x, bump or reset the stuck counter). Rules with object types
+react to the object table; the rest react to the scene around Mario.
+
+RuleEngine compiles a rule table into
+    - a jump table from object type to the short chain of rules for that type, walked per tracked slot
+      in slot order, and
+    - one chain of scene rules,
+each ordered by descending priority. Object rules are always tried before scene rules. The first rule
+whose condition holds fires.
+
+Values several rules share - Mario's tile, the detector results, the dx/dy of every slot to Mario, the
+predicted frames to contact - are computed once per step into the RuleContext instead of inside each
+rule. The engine counts per rule how often it was evaluated and how often it fired, and with timed=True
+the time spent in its condition.
+
+engine = RuleEngine(RULES, timed=True)
+context = RuleContext(environment, parameters)
+rule = engine.match_objects(context) or engine.match_scene(context)
+macro = engine.fire(rule, context)
+"""
+
+import logging
+import time
+from collections import namedtuple
+from typing import Callable, Iterable, Optional, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Stuck counter effects
+INCREMENT = "increment"
+RESET = "reset"
+
+Macro = Union[tuple, int, Callable[["RuleContext"], tuple]]
+
+# name: shown in the statistics, priority: higher is tried first within a chain, condition(context) -> bool,
+# macro: the macro-action or a function of the context returning it, types: the object types an object
+# rule reacts to (None for a scene rule), commit: set prev_mario_x when firing, stuck: INCREMENT or RESET
+Rule = namedtuple(
+    "Rule", ["name", "priority", "condition", "macro", "types", "commit", "stuck"], defaults=(None, True, None)
+)
+
+
+class RuleContext:
+    """
+    The values rules are evaluated against for one decision.
+
+    Args:
+        environment (MarioController): The environment the decision is made in.
+        parameters (ExpertParameters): The expert's thresholds.
+    """
+
+    __slots__ = (
+        "environment",
+        "parameters",
+        "ram",
+        "objects",
+        "offsets",
+        "contact",
+        "slot",
+        "dx",
+        "dy",
+        "obs",
+        "x",
+        "y",
+        "hole",
+        "qblock",
+        "on_pipe",
+        "stalled",
+        "planned",
+    )
+
+    def __init__(self, environment, parameters) -> None:
+        self.environment = environment
+        self.parameters = parameters
+        self.ram = environment.snapshot()
+        self.objects = environment.objects()
+        # object - mario for every slot, signed
+        self.offsets = self.objects.offsets(self.ram.mario_x, self.ram.mario_y)
+        # Frames to predicted contact per slot when an EnemyTracker is attached
+        self.contact = None
+        self.slot = 0
+        self.dx = 0
+        self.dy = 0
+
+
+class RuleEngine:
+    """
+    Args:
+        rules (Iterable[Rule]): The rule table.
+        timed (bool, optional): Whether to time every condition. Defaults to False.
+    """
+
+    def __init__(self, rules: Iterable[Rule], timed: bool = False) -> None:
+        self.rules = tuple(rules)
+        self.timed = timed
+
+        self.index = {rule.name: index for index, rule in enumerate(self.rules)}
+        if len(self.index) != len(self.rules):
+            raise ValueError(f"Rule names must be unique: {[rule.name for rule in self.rules]}")
+
+        # Stable sort - rules of equal priority keep their table order
+        order = sorted(range(len(self.rules)), key=lambda index: -self.rules[index].priority)
+        chains = {}
+        scene = []
+        for index in order:
+            rule = self.rules[index]
+            if rule.types is None:
+                scene.append((index, rule))
+            else:
+                for object_type in rule.types:
+                    chains.setdefault(object_type, []).append((index, rule))
+        self.chains = {object_type: tuple(chain) for object_type, chain in chains.items()}
+        self.scene = tuple(scene)
+        # Object type -> has a chain, so finding the slots to walk is one lookup of the type column
+        self.tracked = np.zeros(256, dtype=bool)
+        self.tracked[list(self.chains)] = True
+
+        # Plain lists - cheaper to bump per evaluation than numpy scalars
+        self.evaluations = [0] * len(self.rules)
+        self.hits = [0] * len(self.rules)
+        self.condition_ns = [0] * len(self.rules)
+
+    def _first(self, chain: tuple, context: RuleContext) -> Optional[int]:
+        evaluations = self.evaluations
+        if self.timed:
+            condition_ns = self.condition_ns
+            for index, rule in chain:
+                start = time.perf_counter_ns()
+                hit = rule.condition(context)
+                condition_ns[index] += time.perf_counter_ns() - start
+                evaluations[index] += 1
+                if hit:
+                    return index
+        else:
+            for index, rule in chain:
+                evaluations[index] += 1
+                if rule.condition(context):
+                    return index
+        return None
+
+    def match_objects(self, context: RuleContext) -> Optional[Rule]:
+        """
+        Returns the first object rule that holds for any tracked slot, in slot order, or None.
+        """
+        objects = context.objects
+        types = objects.types
+        offset_x, offset_y = context.offsets
+        for slot in np.flatnonzero(self.tracked[types]):
+            context.slot = slot
+            context.dx = int(offset_x[slot])
+            context.dy = int(offset_y[slot])
+            index = self._first(self.chains[int(types[slot])], context)
+            if index is not None:
+                return self.rules[index]
+        return None
+
+    def match_scene(self, context: RuleContext) -> Optional[Rule]:
+        """
+        Returns the first scene rule that holds, or None.
+        """
+        index = self._first(self.scene, context)
+        return None if index is None else self.rules[index]
+
+    def fire(self, rule: Rule, context: RuleContext) -> Macro:
+        """
+        Applies the rule's bookkeeping to the environment and returns its macro-action.
+        """
+        self.hits[self.index[rule.name]] += 1
+        logger.debug("rule %s", rule.name)
+
+        environment = context.environment
+        if rule.stuck == INCREMENT:
+            environment.stuck += 1
+        elif rule.stuck == RESET:
+            environment.stuck = 0
+        if rule.commit:
+            environment.prev_mario_x = environment.curr_mario_x
+        return rule.macro(context) if callable(rule.macro) else rule.macro
+
+    def stats(self) -> dict[str, dict]:
+        stats = {}
+        for index, rule in enumerate(self.rules):
+            evaluations = self.evaluations[index]
+            entry = {"evaluations": evaluations, "hits": self.hits[index]}
+            if self.timed:
+                total = self.condition_ns[index]
+                entry["total_us"] = round(total / 1e3, 3)
+                entry["mean_us"] = round(total / evaluations / 1e3, 3) if evaluations else 0.0
+            stats[rule.name] = entry
+        return stats
@@ -5,11 +5,22 @@ Do NOT edit this file as it runs the evaluation methodology for the Mario Expert
 """
 
 import argparse
+import json
 import logging
 import os
+import time
 from pathlib import Path
 
+import numpy as np
+
+from checkpoint_pool import CheckpointPool
+from enemy_tracker import EnemyTracker
+from episode_dataset import EpisodeWriter
+from expert_parameters import ExpertParameters
+from level_map import LevelMapIndex
+from lookahead import Lookahead
 from mario_expert import MarioExpert
+from rollout_pool import RolloutPool
 
 logging.basicConfig(level=logging.INFO)
 
@@ -21,10 +32,173 @@ def get_args():
 
     parse_args.add_argument("--upi", type=str, required=True)
 
+    # Directory of per-stage level maps, stitched and extended during the run
+    parse_args.add_argument("--level_maps", type=str, default=None)
+
+    # Directory of hazard tables precomputed from the level maps with hazard_table.py
+    parse_args.add_argument("--hazard_tables", type=str, default=None)
+
+    # Lookahead search - roll out candidate macro-actions for this many frames before each decision
+    parse_args.add_argument("--lookahead", type=int, default=0)
+    parse_args.add_argument("--lookahead_budget", type=int, default=600)
+    # Roll lookahead candidates out in this many worker processes instead of in the game's emulator
+    parse_args.add_argument("--rollout_workers", type=int, default=0)
+
+    # Track object velocities and jump enemies on course to hit Mario (see enemy_tracker.py)
+    parse_args.add_argument("--track_enemies", action="store_true")
+
+    # Append every decision of the run to this per-step dataset directory (see episode_dataset.py)
+    parse_args.add_argument("--dataset", type=str, default=None)
+
+    # JSON file of expert parameters, e.g. the best.json of a sweep (see sweep.py)
+    parse_args.add_argument("--parameters", type=str, default=None)
+
+    # timeline - non-blocking input scheduling where enemies can preempt a macro-action mid-flight
+    parse_args.add_argument("--scheduling", choices=["blocking", "timeline"], default="blocking")
+
+    # Per-phase timings, counters and rule statistics in profile.json next to results.json
+    parse_args.add_argument("--profile", action="store_true")
+
+    # DEBUG shows the expert's per-step decisions and game area
+    parse_args.add_argument("--log_level", type=str, default="INFO")
+
+    # Evaluation mode - unthrottled emulation, bounded runs and throughput metrics in results.json
+    parse_args.add_argument("--evaluate", action="store_true")
+    parse_args.add_argument("--frame_budget", type=int, default=0)
+    parse_args.add_argument("--time_budget", type=float, default=0.0)
+
+    # Checkpoints - start from a named save state and/or capture new ones during the run
+    parse_args.add_argument("--checkpoint_dir", type=str, default=None)
+    parse_args.add_argument("--checkpoint", type=str, default=None)
+    parse_args.add_argument("--save_checkpoints", action="store_true")
+    parse_args.add_argument("--checkpoint_every_x", type=int, default=0)
+    parse_args.add_argument("--checkpoint_every_frames", type=int, default=0)
+
     return parse_args.parse_args()
 
 
-def run(upi, headless):
+class BudgetExceeded(Exception):
+    """
+    Raised out of step() to stop an expert without a stop_check hook once its budget is spent.
+    """
+
+
+def evaluate(expert, results_path, frame_budget=0, time_budget=0.0):
+    """
+    Plays the expert with unthrottled emulation until game over or until the frame or wall clock
+    budget (0 for unlimited) is spent, then adds throughput metrics to results.json.
+
+    Budgets are checked after every step, so a frame budgeted run always stops on the same step. A run
+    stopped by its budget tears down like a finished one - video, level maps, profile.json, results.json.
+
+    Any expert following the baseline template can be evaluated, e.g. a tournament submission. Without
+    the stop_check and decision_times hooks, frames are counted from PyBoy's frame_count, each step() is
+    timed as a decision and a spent budget raises BudgetExceeded out of step(); play() is then torn
+    down here - the video is stopped and results.json written from game_state().
+    """
+    environment = expert.environment
+    environment.pyboy.set_emulation_speed(0)
+
+    latencies = []
+
+    if hasattr(environment, "game_frame"):
+
+        def game_frame():
+            return environment.game_frame
+
+    else:
+
+        def game_frame():
+            # Runs on across resets, as load_state never rewinds it
+            return environment.pyboy.frame_count
+
+    def over_budget(expert):
+        if frame_budget > 0 and game_frame() - start_frame >= frame_budget:
+            return f"frame budget of {frame_budget}"
+        if time_budget > 0 and time.perf_counter() - start_time >= time_budget:
+            return f"time budget of {time_budget}s"
+        return None
+
+    hooked = hasattr(expert, "stop_check")
+    if hooked:
+        expert.decision_times = latencies
+        expert.stop_check = over_budget
+    else:
+        step = expert.step
+
+        def budgeted_step():
+            start = time.perf_counter()
+            step()
+            latencies.append(time.perf_counter() - start)
+            stopped_by = over_budget(expert)
+            if stopped_by:
+                raise BudgetExceeded(stopped_by)
+
+        expert.step = budgeted_step
+
+    start_frame = game_frame()
+    start_time = time.perf_counter()
+    stopped_by = "game_over"
+    try:
+        expert.play()
+    except BudgetExceeded as stop:
+        stopped_by = str(stop)
+        expert.stop_video()
+        with open(f"{results_path}/results.json", "w", encoding="utf-8") as file:
+            json.dump(environment.game_state(), file)
+    finally:
+        if hooked:
+            expert.decision_times = None
+            expert.stop_check = None
+        else:
+            expert.step = step
+    if hooked:
+        stopped_by = expert.stopped_by
+    with open(f"{results_path}/results.json", "r", encoding="utf-8") as file:
+        results = json.load(file)
+    results["stopped_by"] = stopped_by
+    wall_time = time.perf_counter() - start_time
+
+    frames = game_frame() - start_frame
+    steps = len(latencies)
+    latencies = np.array(latencies) * 1000.0 if latencies else np.zeros(1)
+    results.update(
+        {
+            "frames": frames,
+            "steps": steps,
+            "wall_time": round(wall_time, 3),
+            "fps": round(frames / wall_time, 1) if wall_time > 0 else 0.0,
+            "decision_ms_mean": round(float(latencies.mean()), 3),
+            "decision_ms_p50": round(float(np.percentile(latencies, 50)), 3),
+            "decision_ms_p95": round(float(np.percentile(latencies, 95)), 3),
+            "decision_ms_max": round(float(latencies.max()), 3),
+        }
+    )
+    logging.info(f"Evaluation: {results}")
+
+    with open(f"{results_path}/results.json", "w", encoding="utf-8") as file:
+        json.dump(results, file)
+    return results
+
+
+def run(
+    upi,
+    headless,
+    evaluation=False,
+    frame_budget=0,
+    time_budget=0.0,
+    checkpoints=None,
+    scheduling="blocking",
+    level_maps=None,
+    hazard_tables=None,
+    lookahead=0,
+    lookahead_budget=600,
+    rollout_workers=0,
+    parameters=None,
+    track_enemies=False,
+    dataset=None,
+    profile=False,
+):
     if upi == "your_upi":
         raise ValueError("Please set your UPI in the run.py file")
 
@@ -35,13 +209,91 @@ def run(upi, headless):
         os.makedirs(results_path)
 
     expert = MarioExpert(results_path=results_path, headless=headless)
-    expert.play()
+    expert.profiling = profile
+    expert.scheduling = scheduling
+    if parameters is not None:
+        with open(parameters, "r", encoding="utf-8") as file:
+            expert.configure(ExpertParameters.from_dict(json.load(file)))
+    if level_maps is not None:
+        expert.environment.level_maps = LevelMapIndex(level_maps)
+    if hazard_tables is not None:
+        expert.environment.hazards.load(hazard_tables)
+    if track_enemies:
+        expert.environment.tracker = EnemyTracker()
+    pool = None
+    if lookahead:
+        if rollout_workers:
+            pool = RolloutPool(
+                rollout_workers, parameters=expert.parameters.as_dict(), hazard_tables=hazard_tables
+            )
+        expert.lookahead = Lookahead(expert.environment, lookahead, lookahead_budget, pool=pool)
+    if dataset is not None:
+        expert.dataset = EpisodeWriter(dataset)
+    if checkpoints is not None:
+        expert.environment.checkpoints = checkpoints["pool"]
+        expert.environment.start_checkpoint = checkpoints["start"]
+
+    try:
+        if evaluation:
+            evaluate(expert, results_path, frame_budget, time_budget)
+        else:
+            expert.play()
+    finally:
+        if expert.dataset is not None:
+            expert.dataset.close()
+        if pool is not None:
+            logging.info(f"Rollout pool: {pool.stats()}")
+            pool.close()
+
+    if checkpoints is not None and checkpoints["save"]:
+        checkpoints["pool"].save(checkpoints["directory"])
+
+
+def load_checkpoints(args):
+    if args.checkpoint_dir is None:
+        if args.checkpoint is not None or args.save_checkpoints:
+            raise ValueError("--checkpoint and --save_checkpoints need --checkpoint_dir")
+        return None
+
+    pool = CheckpointPool(
+        on_stage_change=args.save_checkpoints,
+        x_interval=args.checkpoint_every_x if args.save_checkpoints else 0,
+        frame_interval=args.checkpoint_every_frames if args.save_checkpoints else 0,
+    )
+    if os.path.exists(args.checkpoint_dir):
+        pool.load(args.checkpoint_dir)
+
+    return {
+        "pool": pool,
+        "start": args.checkpoint,
+        "save": args.save_checkpoints,
+        "directory": args.checkpoint_dir,
+    }
 
 
 def main():
     args = get_args()
 
-    run(args.upi, args.headless)
+    logging.getLogger().setLevel(args.log_level.upper())
+
+    run(
+        args.upi,
+        args.headless,
+        args.evaluate,
+        args.frame_budget,
+        args.time_budget,
+        load_checkpoints(args),
+        args.scheduling,
+        args.level_maps,
+        args.hazard_tables,
+        args.lookahead,
+        args.lookahead_budget,
+        args.rollout_workers,
+        args.parameters,
+        args.track_enemies,
+        args.dataset,
+        args.profile,
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,251 @@
+"""
+A deterministic, ROM-free stand-in for PyBoy running Super Mario Land.
+
+StubPyBoy implements the part of PyBoy the environment layer uses - memory, screen.ndarray,
+screen.tilemap_position_list, game_wrapper.game_area / game_area_mapping / score, tick, send_input,
+save_state, load_state and frame_count - over a tiny scripted model of the game instead of an emulated
+CPU:
+
+    - holding RIGHT walks Mario right (twice as fast with B held), LEFT walks him back, A jumps
+    - the level scrolls once Mario passes the middle of the screen, so x_position keeps growing
+    - the ground has a pipe every 24 tiles and a goomba walks left along it in object slot 0
+    - the timer counts down and the game is over at game_over_frame, if one is given
+
+Every tick writes the RAM addresses RAMSnapshot and the object table read, so MarioEnvironment,
+MarioController and MarioExpert run unchanged on top of it. Nothing is random - the same inputs on the
+same frames always give the same memory, grid and screen. The model keeps its own tick count in its save
+states, since frame_count runs on across load_state as it does in PyBoy. A script(stub) callable, run
+after the model on every tick, can overwrite any of it.
+
+environment = emulator_backend.stub_controller()
+environment.run_action(2, 8)
+"""
+
+import io
+from typing import Callable
+
+import numpy as np
+from pyboy.utils import WindowEvent
+
+import object_table
+import ram_snapshot
+import tile_query
+
+SCREEN_SHAPE = (144, 160, 4)
+ROWS = 16
+COLUMNS = 20
+
+GROUND_Y = 0x88
+MARIO_SCREEN_X_MAX = 0x50
+JUMP_FRAMES = 24
+PIPE_PERIOD = 24
+TIME_FRAMES = 40
+GOOMBA_SPAWN_X = 0xA8
+
+# Model state saved alongside memory by save_state
+_STATE_FIELDS = ("ticks", "position", "jump", "time")
+
+
+class StubMemory:
+    """
+    The 64 KiB address space as PyBoy exposes it - ints for single addresses, lists for slices.
+    """
+
+    def __init__(self) -> None:
+        self.data = bytearray(0x10000)
+
+    def __getitem__(self, addr):
+        if isinstance(addr, slice):
+            return list(self.data[addr])
+        return self.data[addr]
+
+    def __setitem__(self, addr, value) -> None:
+        self.data[addr] = value
+
+
+class StubScreen:
+    def __init__(self, pyboy: "StubPyBoy") -> None:
+        self._pyboy = pyboy
+        rows = np.arange(SCREEN_SHAPE[0], dtype=np.uint8)[:, None]
+        columns = np.arange(SCREEN_SHAPE[1], dtype=np.uint8)[None, :]
+        self.ndarray = np.zeros(SCREEN_SHAPE, dtype=np.uint8)
+        self.ndarray[..., 0] = rows
+        self.ndarray[..., 1] = columns
+        self.ndarray[..., 3] = 0xFF
+
+    @property
+    def tilemap_position_list(self) -> list:
+        # (SCX, SCY, WX, WY) per scanline - the stub never scrolls vertically or shows the window
+        scx = self._pyboy.scx
+        return [[scx, 0, 0, 0]] * SCREEN_SHAPE[0]
+
+    def render(self, frame: int, mario_x: int, mario_y: int) -> None:
+        # A frame counter strip and Mario's box, so consecutive frames differ like real ones do
+        self.ndarray[:8, :, 2] = frame & 0xFF
+        self.ndarray[8:, :, 2] = 0
+        top = max(0, mario_y - 16)
+        self.ndarray[top : top + 16, max(0, mario_x - 8) : mario_x + 8, 2] = 0xFF
+
+
+class StubMarioWrapper:
+    """
+    game_wrapper for the stub - game_area() is always under mapping_compressed.
+    """
+
+    def __init__(self, pyboy: "StubPyBoy") -> None:
+        self._pyboy = pyboy
+        self.mapping_compressed = np.zeros(384, dtype=np.uint8)
+        self.mapping = None
+
+    def game_area_mapping(self, mapping, sprite_offset: int = 0) -> None:
+        self.mapping = mapping
+
+    def game_area(self) -> np.ndarray:
+        return self._pyboy.tiles()
+
+    @property
+    def score(self) -> int:
+        # Three BCD bytes, most significant first, as the game keeps it
+        memory = self._pyboy.memory
+        return sum(_bcd(memory[0xC0A0 + i]) * 100 ** (2 - i) for i in range(3))
+
+
+def _bcd(value: int) -> int:
+    return 10 * ((value >> 4) & 0x0F) + (value & 0x0F)
+
+
+class StubPyBoy:
+    """
+    Args:
+        game_over_frame (int, optional): Tick of the model the game ends on, None to play until the timer
+            runs out. Defaults to None.
+        script (Callable[[StubPyBoy], None], optional): Run after the model on every tick. Defaults to None.
+    """
+
+    def __init__(self, game_over_frame: int = None, script: Callable[["StubPyBoy"], None] = None) -> None:
+        self.game_over_frame = game_over_frame
+        self.script = script
+
+        self.memory = StubMemory()
+        self.screen = StubScreen(self)
+        self.game_wrapper = StubMarioWrapper(self)
+        self.frame_count = 0
+        self.held = set()
+
+        self.ticks = 0
+        self.position = 0
+        self.jump = 0
+        self.time = 400
+
+        memory = self.memory
+        memory[ram_snapshot.ADDR_WORLD] = 1
+        memory[ram_snapshot.ADDR_STAGE] = 1
+        memory[ram_snapshot.ADDR_LIVES] = 2
+        for slot in range(object_table.OBJECT_SLOTS):
+            memory[object_table.OBJECT_TABLE_START + slot * object_table.OBJECT_SLOT_SIZE] = 0xFF
+        self._update()
+
+    def set_emulation_speed(self, speed: int) -> None:
+        pass
+
+    def stop(self, save: bool = True) -> None:
+        pass
+
+    def send_input(self, event: int) -> None:
+        if WindowEvent.PRESS_ARROW_UP <= event <= WindowEvent.PRESS_BUTTON_START:
+            self.held.add(event)
+        elif WindowEvent.RELEASE_ARROW_UP <= event <= WindowEvent.RELEASE_BUTTON_START:
+            self.held.discard(event - (WindowEvent.RELEASE_ARROW_UP - WindowEvent.PRESS_ARROW_UP))
+
+    def tick(self, count: int = 1, render: bool = True) -> bool:
+        for _ in range(count):
+            self.frame_count += 1
+            self._step()
+            self._update()
+            if self.script is not None:
+                self.script(self)
+        if render:
+            memory = self.memory
+            self.screen.render(self.ticks, memory[ram_snapshot.ADDR_MARIO_X], memory[ram_snapshot.ADDR_MARIO_Y])
+        return True
+
+    def _step(self) -> None:
+        self.ticks += 1
+        held = self.held
+        if WindowEvent.PRESS_ARROW_RIGHT in held:
+            self.position += 2 if WindowEvent.PRESS_BUTTON_B in held else 1
+        if WindowEvent.PRESS_ARROW_LEFT in held:
+            self.position = max(0, self.position - 1)
+        if WindowEvent.PRESS_BUTTON_A in held and self.jump == 0:
+            self.jump = JUMP_FRAMES
+        elif self.jump > 0:
+            self.jump -= 1
+        if self.ticks % TIME_FRAMES == 0 and self.time > 0:
+            self.time -= 1
+
+    @property
+    def scroll(self) -> int:
+        """
+        Pixels the level has scrolled - Mario walks on the screen until MARIO_SCREEN_X_MAX, the level after.
+        """
+        return self.position - min(self.position, MARIO_SCREEN_X_MAX)
+
+    @property
+    def scx(self) -> int:
+        return (self.scroll % 16 + 7) & 0xFF
+
+    def _update(self) -> None:
+        memory = self.memory
+        mario_x = min(self.position, MARIO_SCREEN_X_MAX)
+        scroll = self.scroll
+        height = self.jump * (JUMP_FRAMES - self.jump) // 8
+
+        memory[ram_snapshot.ADDR_MARIO_X] = mario_x
+        memory[ram_snapshot.ADDR_MARIO_Y] = GROUND_Y - height
+        memory[ram_snapshot.ADDR_ON_GROUND] = int(self.jump == 0)
+        memory[ram_snapshot.ADDR_LEVEL_BLOCK] = (scroll // 16) & 0xFF
+        memory[ram_snapshot.ADDR_TIME] = self.time // 100
+        memory[ram_snapshot.ADDR_TIME + 1] = self.time // 10 % 10
+        memory[ram_snapshot.ADDR_TIME + 2] = self.time % 10
+        game_over = self.game_over_frame is not None and self.ticks >= self.game_over_frame
+        memory[ram_snapshot.ADDR_GAME_OVER] = ram_snapshot.GAME_OVER if game_over or self.time == 0 else 0
+
+        # One goomba walking left along the ground, respawning at the right edge
+        goomba = object_table.OBJECT_TABLE_START
+        memory[goomba] = object_table.GOOMBA
+        memory[goomba + 2] = GROUND_Y
+        memory[goomba + 3] = (GOOMBA_SPAWN_X - self.ticks // 2) & 0xFF
+
+    def tiles(self) -> np.ndarray:
+        """
+        The game_area under mapping_compressed: ground, pipes every PIPE_PERIOD tiles and Mario.
+        """
+        memory = self.memory
+        grid = np.zeros((ROWS, COLUMNS), dtype=np.uint32)
+        grid[ROWS - 2 :] = tile_query.BLOCK
+
+        first_column = self.scroll // 8
+        columns = (first_column + np.arange(COLUMNS)) % PIPE_PERIOD
+        pipes = (columns == PIPE_PERIOD - 4) | (columns == PIPE_PERIOD - 3)
+        grid[ROWS - 4 : ROWS - 2, pipes] = tile_query.PIPE
+
+        # Mario's bottom tile row - standing on the ground puts him on the two rows above it
+        row = memory[ram_snapshot.ADDR_MARIO_Y] // 8 - 4
+        column = memory[ram_snapshot.ADDR_MARIO_X] // 8
+        grid[max(0, row - 1) : row + 1, max(0, column - 1) : column + 1] = tile_query.MARIO
+        return grid
+
+    def save_state(self, file: io.BufferedIOBase) -> None:
+        file.write(bytes(self.memory.data))
+        file.write(np.array([getattr(self, name) for name in _STATE_FIELDS], dtype=np.int64).tobytes())
+        file.write(np.array(sorted(self.held), dtype=np.int64).tobytes())
+
+    def load_state(self, file: io.BufferedIOBase) -> None:
+        """
+        Restores memory and the model. Like PyBoy, the frame counter keeps running.
+        """
+        self.memory.data[:] = file.read(0x10000)
+        values = np.frombuffer(file.read(8 * len(_STATE_FIELDS)), dtype=np.int64)
+        for name, value in zip(_STATE_FIELDS, values.tolist()):
+            setattr(self, name, value)
+        self.held = set(np.frombuffer(file.read(), dtype=np.int64).tolist())
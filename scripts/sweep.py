@@ -0,0 +1,241 @@
+"""
+Parameter sweeps over MarioExpert's thresholds (see expert_parameters.py).
+
+A sweep space is a JSON file mapping parameter names to the values to try:
+
+{"goomba_dx": [12, 15, 18], "gap_jump_frames": [17, 19, 21]}
+
+Strategies:
+    grid    - every combination of the listed values
+    random  - --samples combinations drawn with --seed
+    halving - successive halving over --samples random combinations: every round evaluates the
+              survivors with a frame budget --eta times larger and keeps the best 1/eta of them
+
+Every configuration is played headless with run.py's evaluation mode in up to --workers processes
+forked from a warm controller (see warm_start.py) and ranked with
+compare_results.compare_performance (world, then stage, then score). Each finished evaluation is
+appended to <output>/sweep.jsonl as soon as it completes, so an interrupted sweep started again with
+the same arguments only evaluates what is missing.
+
+python3 sweep.py --space space.json --strategy halving --samples 27 --frame_budget 2000 -o ../sweeps/enemies
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import math
+import os
+import random
+from functools import cmp_to_key
+from pathlib import Path
+
+import run
+import warm_start
+from compare_results import compare_performance
+from expert_parameters import ExpertParameters
+from mario_expert import MarioExpert
+
+
+def configuration_key(parameters: dict, frame_budget: int) -> str:
+    """
+    Stable identifier of one evaluation - the same parameters under the same budget.
+    """
+    text = json.dumps({"parameters": parameters, "frame_budget": frame_budget}, sort_keys=True)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+class SweepStore:
+    """
+    Append-only log of finished evaluations, one JSON object per line.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.entries = {}
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["key"]] = entry
+            logging.info(f"Resuming sweep with {len(self.entries)} finished evaluations")
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def append(self, entry: dict) -> None:
+        self.entries[entry["key"]] = entry
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(entry) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+
+def evaluate_configuration(parameters: dict, frame_budget: int, time_budget: float, results_path: str) -> dict:
+    """
+    Worker process entry point - plays one configuration headless and returns its results.json contents.
+    """
+    os.makedirs(results_path, exist_ok=True)
+    expert = MarioExpert(results_path=results_path, headless=True)
+    # Sweeps only need the outcome - a replay log is enough to look at a run afterwards
+    expert.recording = "replay"
+    expert.configure(ExpertParameters.from_dict(parameters))
+    return run.evaluate(expert, results_path, frame_budget, time_budget)
+
+
+def grid(space: dict) -> list[dict]:
+    names = sorted(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+
+
+def sample(space: dict, samples: int, seed: int) -> list[dict]:
+    """
+    Distinct random combinations, in a deterministic order for a given seed.
+    """
+    total = math.prod(len(values) for values in space.values())
+    generator = random.Random(seed)
+    names = sorted(space)
+    configurations = []
+    seen = set()
+    while len(configurations) < min(samples, total):
+        configuration = {name: generator.choice(space[name]) for name in names}
+        key = json.dumps(configuration, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            configurations.append(configuration)
+    return configurations
+
+
+def rank(entries: list[dict]) -> list[dict]:
+    return sorted(entries, key=lambda entry: cmp_to_key(compare_performance)(entry["results"]))
+
+
+class Sweep:
+    """
+    Args:
+        output (Path): Directory holding sweep.jsonl and one results directory per evaluation.
+        workers (int): Concurrent headless games.
+        time_budget (float): Wall clock limit per game, 0 for none.
+    """
+
+    def __init__(self, output: Path, workers: int, time_budget: float = 0.0) -> None:
+        self.output = output
+        self.workers = workers
+        self.time_budget = time_budget
+
+        output.mkdir(parents=True, exist_ok=True)
+        self.store = SweepStore(output / "sweep.jsonl")
+        self.prepared = False
+
+    def evaluate(self, configurations: list[dict], frame_budget: int) -> list[dict]:
+        """
+        Evaluates every configuration not already in the store and returns all their entries, ranked.
+        """
+        keys = [configuration_key(c, frame_budget) for c in configurations]
+        pending = [(k, c) for k, c in zip(keys, configurations) if k not in self.store]
+        logging.info(
+            f"Frame budget {frame_budget or 'unlimited'}: {len(configurations) - len(pending)} "
+            f"of {len(configurations)} configurations already evaluated"
+        )
+
+        if pending:
+            if not self.prepared:
+                # ROM and init.state are loaded once here - every evaluation is forked from this process
+                warm_start.prepare()
+                self.prepared = True
+            jobs = [
+                (configuration, frame_budget, self.time_budget, str(self.output / "runs" / key))
+                for key, configuration in pending
+            ]
+            finished = warm_start.fork_map(evaluate_configuration, jobs, self.workers)
+            for done, (index, results) in enumerate(finished, start=1):
+                key, configuration = pending[index]
+                self.store.append(
+                    {
+                        "key": key,
+                        "parameters": configuration,
+                        "frame_budget": frame_budget,
+                        "results": results,
+                    }
+                )
+                logging.info(
+                    f"[{done}/{len(pending)}] {configuration} - World: {results['world']} "
+                    f"Stage: {results['stage']} Score: {results['score']}"
+                )
+
+        return rank([self.store.entries[key] for key in keys])
+
+    def halving(self, configurations: list[dict], frame_budget: int, eta: int, max_frame_budget: int) -> list[dict]:
+        """
+        Successive halving - returns the ranking of the final round.
+        """
+        if frame_budget <= 0:
+            raise ValueError("Successive halving needs a starting --frame_budget")
+
+        while True:
+            ranked = self.evaluate(configurations, frame_budget)
+            survivors = max(1, len(ranked) // eta)
+            next_budget = frame_budget * eta
+            if survivors == len(ranked) or (max_frame_budget and next_budget > max_frame_budget):
+                return ranked
+            configurations = [entry["parameters"] for entry in ranked[:survivors]]
+            frame_budget = next_budget
+
+
+def get_args():
+    parse_args = argparse.ArgumentParser()
+
+    parse_args.add_argument("--space", type=str, required=True)
+    parse_args.add_argument("-o", "--output", type=str, required=True)
+    parse_args.add_argument("--strategy", choices=["grid", "random", "halving"], default="grid")
+    parse_args.add_argument("--samples", type=int, default=16)
+    parse_args.add_argument("--seed", type=int, default=0)
+    parse_args.add_argument("--workers", type=int, default=os.cpu_count())
+
+    # Frame budget per game (0 plays to game over) - the first round's budget for halving
+    parse_args.add_argument("--frame_budget", type=int, default=0)
+    parse_args.add_argument("--max_frame_budget", type=int, default=0)
+    parse_args.add_argument("--eta", type=int, default=3)
+    parse_args.add_argument("--time_budget", type=float, default=0.0)
+
+    return parse_args.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = get_args()
+
+    with open(args.space, "r", encoding="utf-8") as file:
+        space = json.load(file)
+    # Fail on unknown names or uncastable values before starting any game
+    for name, values in space.items():
+        for value in values:
+            ExpertParameters.from_dict({name: value})
+
+    if args.strategy == "grid":
+        configurations = grid(space)
+    else:
+        configurations = sample(space, args.samples, args.seed)
+    logging.info(f"Sweeping {len(configurations)} configurations with {args.strategy}")
+
+    sweep = Sweep(Path(args.output), args.workers, args.time_budget)
+    if args.strategy == "halving":
+        ranked = sweep.halving(configurations, args.frame_budget, args.eta, args.max_frame_budget)
+    else:
+        ranked = sweep.evaluate(configurations, args.frame_budget)
+
+    for i, entry in enumerate(ranked[:10]):
+        results = entry["results"]
+        logging.info(
+            f"Rank {i + 1}: {entry['parameters']} - World: {results['world']} "
+            f"Stage: {results['stage']} Score: {results['score']}"
+        )
+
+    with open(Path(args.output) / "best.json", "w", encoding="utf-8") as file:
+        json.dump(ExpertParameters.from_dict(ranked[0]["parameters"]).as_dict(), file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
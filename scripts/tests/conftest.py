@@ -0,0 +1,57 @@
+"""
+Shared pytest setup. The scripts import each other as top-level modules, so the scripts directory goes on
+sys.path. Everything runs on the ROM-free stub backend (see emulator_backend.py) or on synthetic data.
+
+python3 -m pytest -q tests
+python3 -m pytest -q tests -m benchmark --environment-history environment.jsonl
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("environment benchmarks", "see tests/test_environment_benchmarks.py")
+    # JSON lines of earlier runs - results are appended and compared against them
+    group.addoption("--environment-history", type=str, default=None)
+    group.addoption("--environment-max-slowdown", type=float, default=1.5)
+    group.addoption("--environment-rounds", type=int, default=200)
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: timing checks on the stub backend")
+
+
+def pytest_collection_modifyitems(config, items):
+    # Benchmarks only run when a -m expression asks about them, e.g. -m benchmark
+    if "benchmark" in config.getoption("markexpr"):
+        return
+    selected = [item for item in items if item.get_closest_marker("benchmark") is None]
+    if len(selected) < len(items):
+        config.hook.pytest_deselected(items=[item for item in items if item not in selected])
+        items[:] = selected
+
+
+@pytest.fixture
+def stub():
+    from emulator_backend import stub_controller
+
+    return stub_controller()
+
+
+@pytest.fixture
+def expert(tmp_path, monkeypatch):
+    """
+    A MarioExpert on a stub controller, writing into tmp_path. Video is encoded on the emulation thread.
+    """
+    from emulator_backend import stub_controller
+    from mario_expert import MarioController, MarioExpert
+
+    monkeypatch.setattr(MarioController, "prototype", stub_controller())
+    expert = MarioExpert(results_path=str(tmp_path), headless=True)
+    expert.recording = "sync"
+    return expert
@@ -0,0 +1,122 @@
+import random
+
+from action_scheduler import ActionScheduler
+from emulator_backend import stub_controller
+
+PRESS_A, PRESS_B = 1, 2
+RELEASE_A, RELEASE_B = 9, 10
+
+
+def scheduler():
+    sent = []
+    return ActionScheduler(sent.append, {PRESS_A: RELEASE_A, PRESS_B: RELEASE_B}), sent
+
+
+def test_events_are_sent_in_frame_then_schedule_order():
+    timeline, sent = scheduler()
+    timeline.schedule(5, PRESS_B)
+    timeline.segment(PRESS_A, 3, 5)
+    timeline.schedule(5, RELEASE_B)
+
+    timeline.apply(2)
+    assert sent == []
+    timeline.apply(4)
+    assert sent == [PRESS_A] and timeline.held == {PRESS_A}
+    timeline.apply(5)
+    assert sent == [PRESS_A, PRESS_B, RELEASE_A, RELEASE_B] and not timeline.held
+
+
+def test_pending_until_the_timeline_has_played_out():
+    timeline, _ = scheduler()
+    timeline.segment(PRESS_A, 0, 4)
+    timeline.wait_until(10)
+    timeline.apply(4)
+    assert timeline.pending(9)
+    assert not timeline.pending(10)
+
+
+def test_preempt_drops_the_queue_and_releases_held_buttons():
+    timeline, sent = scheduler()
+    timeline.segment(PRESS_B, 0, 20)
+    timeline.segment(PRESS_A, 0)
+    timeline.apply(0)
+    timeline.preempt(3)
+
+    assert sent == [PRESS_B, PRESS_A, RELEASE_A, RELEASE_B]
+    assert not timeline.pending(3)
+    timeline.apply(20)
+    assert len(sent) == 4
+
+
+def test_drop_forgets_the_queue_without_sending_anything():
+    timeline, sent = scheduler()
+    timeline.segment(PRESS_B, 0, 20)
+    timeline.apply(0)
+    timeline.drop(3, {PRESS_A})
+
+    assert sent == [PRESS_B] and timeline.held == {PRESS_A}
+    assert not timeline.pending(3)
+    timeline.apply(20)
+    assert sent == [PRESS_B]
+
+
+def blocking_run_action(self, action, duration=None, action2=None, duration2=None, sprint=True):
+    """
+    run_action as it was before the scheduler - sends and ticks inline.
+    """
+    if duration is None:
+        duration = self.act_freq
+    if self.stuck == self.parameters.stuck_escape:
+        self.send_input(self.valid_actions[1])
+        self.pyboy.tick(5)
+        self.send_input(self.release_button[1])
+        self.stuck = 0
+    self.send_input(self.valid_actions[5] if sprint else self.release_button[5])
+    self.send_input(self.valid_actions[action])
+    for _ in range(duration):
+        if action2 is not None or duration2 is not None:
+            self.send_input(self.valid_actions[action2])
+            if 1305 <= self.curr_mario_x <= 1400:
+                self.send_input(self.valid_actions[0])
+                self.pyboy.tick(8)
+                break
+            self.pyboy.tick(duration2)
+            self.send_input(self.release_button[action2])
+        self.pyboy.tick()
+    self.send_input(self.release_button[action])
+    if action2 is not None:
+        self.send_input(self.release_button[action2])
+    self.pyboy.tick(duration)
+
+
+def recorded(environment) -> list:
+    events = []
+    pyboy = environment.pyboy
+    send_input = pyboy.send_input
+
+    def logged(event):
+        events.append((pyboy.frame_count, event))
+        send_input(event)
+
+    pyboy.send_input = logged
+    return events
+
+
+def test_run_action_sends_what_the_blocking_loops_sent():
+    rng = random.Random(11)
+    scheduled, blocking = stub_controller(), stub_controller()
+    scheduled_events, blocking_events = recorded(scheduled), recorded(blocking)
+
+    for _ in range(300):
+        macro = (rng.randrange(5), rng.randint(1, 20), *rng.choice([(None, None), (4, rng.randint(1, 3))]))
+        macro += (rng.random() < 0.5,)
+        stuck = scheduled.parameters.stuck_escape if rng.random() < 0.1 else 0
+        curr_mario_x = rng.choice([0, 1350])
+        for environment in (scheduled, blocking):
+            environment.stuck, environment.curr_mario_x = stuck, curr_mario_x
+
+        scheduled.run_action(*macro)
+        blocking_run_action(blocking, *macro)
+        assert scheduled.pyboy.frame_count == blocking.pyboy.frame_count, macro
+
+    assert scheduled_events == blocking_events
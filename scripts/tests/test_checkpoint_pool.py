@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+import replay_log
+from checkpoint_pool import CheckpointPool
+from emulator_backend import stub_controller
+
+
+def test_least_recently_used_states_are_evicted_by_size():
+    pool = CheckpointPool(max_bytes=30)
+    for name in ("a", "b", "c"):
+        pool.add(name, bytes(10))
+    pool.get("a")
+    pool.add("d", bytes(10))
+
+    assert pool.names() == ["c", "a", "d"] and pool.size == 30
+    with pytest.raises(KeyError, match="Unknown checkpoint b"):
+        pool.get("b")
+
+
+def test_observe_captures_on_each_trigger(stub):
+    pool = CheckpointPool(x_interval=100, frame_interval=120)
+    for _ in range(60):
+        pool.observe(stub)
+        stub.run_action(2, 8, None, None, True)
+
+    names = pool.names()
+    assert names[0] == "w1-s1"
+    assert {"w1-s1-x100", "w1-s1-x200", "w1-s1-x300"} <= set(names)
+    frames = [int(name[len("frame") :]) for name in names if name.startswith("frame")]
+    assert len(frames) > 2 and all(later - earlier >= 120 for earlier, later in zip(frames, frames[1:]))
+
+
+def test_save_and_load_round_trip(stub, tmp_path):
+    pool = CheckpointPool(x_interval=100)
+    for _ in range(30):
+        pool.observe(stub)
+        stub.run_action(2, 8, None, None, True)
+    pool.save(str(tmp_path))
+
+    loaded = CheckpointPool()
+    loaded.load(str(tmp_path))
+    assert sorted(loaded.names()) == sorted(pool.names())
+    assert all(loaded.get(name) == pool.get(name) for name in pool.names())
+
+
+def test_reset_to_a_checkpoint(stub):
+    stub.checkpoints = CheckpointPool(x_interval=100)
+    while "w1-s1-x200" not in stub.checkpoints:
+        stub.checkpoints.observe(stub)
+        stub.run_action(2, 8, None, None, True)
+    stub.run_action(2, 8, None, None, True)
+    stub.checkpoints.capture("here", stub.pyboy)
+    here = stub.snapshot().as_array().copy()
+
+    stub.reset()
+    stub.reset("here")
+    assert np.array_equal(stub.snapshot().as_array(), here)
+    stub.start_checkpoint = "w1-s1-x200"
+    stub.reset()
+    assert 200 <= stub.get_x_position() < 300
+
+
+def test_replay_from_a_checkpoint_needs_no_pool(expert, tmp_path):
+    environment = expert.environment
+    environment.checkpoints = CheckpointPool(x_interval=100)
+    while "w1-s1-x300" not in environment.checkpoints:
+        environment.checkpoints.observe(environment)
+        environment.run_action(2, 8, None, None, True)
+    environment.start_checkpoint = "w1-s1-x300"
+    expert.recording = "replay"
+    expert.stop_check = lambda expert: "done" if expert.environment.game_frame > 1500 else None
+    expert.play()
+
+    log = replay_log.ReplayLog.load(str(tmp_path / "mario_expert.replay.json.gz"))
+    assert log.start_checkpoint == "w1-s1-x300"
+    assert log.init_sha256 == replay_log.state_sha256(environment.checkpoints.get("w1-s1-x300"))
+    replayer = replay_log.Replayer(log, stub_controller())
+    replayer.seek(log.frames)
+    assert replay_log.ram_checksum(replayer.environment) == replay_log.ram_checksum(environment)
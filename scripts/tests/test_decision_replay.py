@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+import decision_replay
+import object_table
+import ram_snapshot
+import run
+from emulator_backend import StubController
+from episode_dataset import EpisodeDataset, EpisodeWriter
+from expert_parameters import ExpertParameters
+from mario_expert import MarioController, MarioExpert
+from stub_pyboy import StubPyBoy
+
+ENEMIES = ((1, object_table.GOOMBA), (2, object_table.TURTLE), (3, object_table.BAT), (4, object_table.BEE))
+
+
+def enemies_around_mario(stub) -> None:
+    """
+    Keeps enemies circling Mario, so the object rules have something to react to.
+    """
+    memory = stub.memory
+    mario_x, mario_y = memory[ram_snapshot.ADDR_MARIO_X], memory[ram_snapshot.ADDR_MARIO_Y]
+    for slot, kind in ENEMIES:
+        base = object_table.OBJECT_TABLE_START + slot * object_table.OBJECT_SLOT_SIZE
+        phase = stub.ticks * (slot + 2)
+        memory[base] = kind
+        memory[base + 2] = (mario_y + phase % 17 - 8) & 0xFF
+        memory[base + 3] = (mario_x + phase % 41 - 12) & 0xFF
+
+
+class EnemyPyBoy(StubPyBoy):
+    def __init__(self) -> None:
+        super().__init__(script=enemies_around_mario)
+
+
+class EnemyController(StubController):
+    backend = EnemyPyBoy
+
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    """
+    Two recorded episodes among enemies, played with the default parameters.
+    """
+    monkeypatch.setattr(MarioController, "prototype", EnemyController(emulation_speed=0, headless=True))
+    expert = MarioExpert(results_path=str(tmp_path), headless=True)
+    expert.recording = "replay"
+    expert.dataset = EpisodeWriter(str(tmp_path / "dataset"), shard_steps=256)
+    for budget in (1500, 900):
+        run.evaluate(expert, str(tmp_path), frame_budget=budget)
+    expert.dataset.close()
+    return EpisodeDataset(str(tmp_path / "dataset"))
+
+
+def test_replayed_decisions_match_the_recorded_ones(dataset):
+    recorded = np.concatenate(dataset.column("action"))
+    actions, latencies = decision_replay.replay(decision_replay.replay_expert(), dataset.shards)
+
+    assert len(decision_replay.diff(actions, recorded)) == 0
+    # The enemies make the expert do more than walk right
+    assert len(np.unique(recorded[:, 0])) > 2
+    assert decision_replay.latency_summary(latencies)["decisions"] == dataset.steps
+
+
+def test_changed_parameters_show_up_as_diffs(dataset):
+    recorded = np.concatenate(dataset.column("action"))
+    parameters = ExpertParameters(goomba_dx=30, turtle_dx=30, bat_dx=30, contact_dy=10)
+    actions, _ = decision_replay.replay(decision_replay.replay_expert(parameters), dataset.shards)
+
+    assert len(decision_replay.diff(actions, recorded)) > 0
+    with pytest.raises(ValueError, match="Baseline holds"):
+        decision_replay.diff(actions, recorded[:-1])
+
+
+def test_a_single_episode_replays_on_its_own(dataset):
+    episode = dataset.episode(1)
+    actions, _ = decision_replay.replay(decision_replay.replay_expert(), [episode])
+    assert len(decision_replay.diff(actions, episode["action"])) == 0
@@ -0,0 +1,100 @@
+import math
+
+import numpy as np
+import pytest
+
+from enemy_tracker import EnemyTracker
+from lookahead import Lookahead
+from object_table import GOOMBA, OBJECT_SLOT_SIZE, OBJECT_SLOTS, TURTLE, ObjectTable
+
+MARIO_X, MARIO_Y = 80, 100
+
+
+def table(*objects) -> ObjectTable:
+    raw = np.zeros((OBJECT_SLOTS, OBJECT_SLOT_SIZE), dtype=np.uint8)
+    raw[:, 0] = 0xFF
+    for slot, kind, x, y in objects:
+        raw[slot, 0], raw[slot, 2], raw[slot, 3] = kind, y, x
+    return ObjectTable(raw.ravel())
+
+
+def track(tracker, frames, *motions):
+    """
+    Updates the tracker on each frame with objects at (slot, type, x0, y0, vx, vy) moving linearly.
+    """
+    for frame in frames:
+        tracker.update(
+            table(*((slot, kind, x + vx * frame, y + vy * frame) for slot, kind, x, y, vx, vy in motions)),
+            frame,
+            MARIO_X,
+            MARIO_Y,
+        )
+
+
+def test_velocity_and_contact_of_objects_moving_steadily():
+    tracker = EnemyTracker()
+    # A goomba 40 px ahead closing at 2 px/frame, a turtle overhead drifting away
+    track(tracker, range(0, 12, 3), (0, GOOMBA, 120, 100, -2, 0), (4, TURTLE, 80, 40, 1, 0))
+
+    velocity = tracker.velocity()
+    assert tuple(velocity[0]) == (-2, 0) and tuple(velocity[4]) == (1, 0)
+    contact = tracker.time_to_contact(reach_x=10, reach_y=12, horizon=30)
+    # dx = 40 - 2 * 9 = 22 at the last sample, within 10 px after (22 - 10) / 2 frames
+    assert contact[0] == pytest.approx(6)
+    assert math.isinf(contact[4]) and math.isinf(contact[1])
+    assert math.isinf(tracker.time_to_contact(reach_x=10, reach_y=12, horizon=5)[0])
+
+
+def test_contact_matches_stepping_the_motion_forward():
+    rng = np.random.default_rng(12)
+    for _ in range(300):
+        x, y = (int(v) for v in rng.integers(30, 220, 2))
+        vx, vy = (int(v) for v in rng.integers(-3, 4, 2))
+        tracker = EnemyTracker()
+        track(tracker, range(4), (0, GOOMBA, x - 3 * vx, y - 3 * vy, vx, vy))
+
+        dx, dy = x - MARIO_X, y - MARIO_Y
+        stepped = next(
+            (t / 100 for t in range(0, 3001) if abs(dx + vx * t / 100) <= 10 and abs(dy + vy * t / 100) <= 12),
+            math.inf,
+        )
+        assert tracker.time_to_contact(reach_x=10, reach_y=12, horizon=30)[0] == pytest.approx(stepped, abs=0.01)
+
+
+def test_a_reused_slot_starts_a_new_history():
+    tracker = EnemyTracker(max_jump=24)
+    track(tracker, range(4), (0, GOOMBA, 120, 100, -2, 0), (1, GOOMBA, 60, 100, 1, 0))
+    tracker.update(table((0, TURTLE, 112, 100), (1, GOOMBA, 100, 100)), 4, MARIO_X, MARIO_Y)
+
+    assert list(tracker.samples[:2]) == [1, 1]
+    assert tracker.velocity()[:2].tolist() == [[0, 0], [0, 0]]
+    assert tracker.stats()["slot_restarts"] == 2 + 2  # the two first sightings, then the two reuses
+
+
+def test_frames_going_back_forget_the_history():
+    tracker = EnemyTracker()
+    track(tracker, range(5), (0, GOOMBA, 120, 100, -1, 0))
+    tracker.update(table((0, GOOMBA, 0, 0)), 4, MARIO_X, MARIO_Y)
+    assert tracker.samples[0] == 5 and tracker.updates == 5
+
+    tracker.rewind(4)
+    assert tracker.samples[0] == 5
+    tracker.rewind(3)
+    assert tracker.head == -1 and math.isinf(tracker.time_to_contact(10, 12, 30)[0])
+
+    track(tracker, range(5), (0, GOOMBA, 120, 100, -1, 0))
+    track(tracker, [2], (0, GOOMBA, 120, 100, -1, 0))
+    assert tracker.samples[0] == 1
+
+
+def test_resets_and_lookahead_keep_the_history_in_game_frames(expert):
+    environment = expert.environment
+    environment.tracker = EnemyTracker()
+    expert.lookahead = Lookahead(environment, horizon=30, frame_budget=120)
+    for _ in range(20):
+        expert.step()
+        tracker = environment.tracker
+        assert tracker.head >= 0 and tracker.frames[tracker.head] <= environment.game_frame
+
+    environment.reset()
+    assert environment.tracker.head == -1
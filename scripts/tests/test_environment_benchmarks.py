@@ -0,0 +1,45 @@
+"""
+Per-call cost of game_state(), game_area(), grab_frame(), get_x_position() and run_action() on the stub
+backend, with the regression thresholds of benchmark.py environment: every call's median must stay under
+its ENVIRONMENT_BUDGETS_US ceiling and, with --environment-history, within --environment-max-slowdown of
+the runs recorded there. The session's results are appended to the history once every call is timed.
+"""
+
+import pytest
+
+import benchmark
+from emulator_backend import stub_controller
+
+pytestmark = pytest.mark.benchmark
+
+
+@pytest.fixture(scope="module")
+def environment():
+    return stub_controller()
+
+
+@pytest.fixture(scope="module")
+def results(request):
+    results = {}
+    yield results
+    path = request.config.getoption("--environment-history")
+    if path is not None and len(results) == len(benchmark.ENVIRONMENT_CALLS):
+        benchmark.append_history(path, results)
+
+
+@pytest.mark.parametrize("name", list(benchmark.ENVIRONMENT_CALLS))
+def test_environment_call(name, environment, results, request):
+    config = request.config
+    stats = benchmark.time_environment_call(
+        environment, benchmark.ENVIRONMENT_CALLS[name], config.getoption("--environment-rounds")
+    )
+    results[name] = stats
+
+    assert not benchmark.over_budget({name: stats}), (
+        f"{name} median {stats['median_us']} us is over its {benchmark.ENVIRONMENT_BUDGETS_US[name]} us budget"
+    )
+    history = benchmark.load_history(config.getoption("--environment-history"))
+    max_slowdown = config.getoption("--environment-max-slowdown")
+    assert not benchmark.regressions({name: stats}, history, max_slowdown), (
+        f"{name} median {stats['median_us']} us regressed more than {max_slowdown}x against the history"
+    )
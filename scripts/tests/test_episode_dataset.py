@@ -0,0 +1,86 @@
+import json
+
+import numpy as np
+import pytest
+
+import run
+from episode_dataset import (
+    DATASET_VERSION,
+    EpisodeDataset,
+    EpisodeWriter,
+    decode_action,
+    encode_action,
+)
+
+
+def test_actions_round_trip():
+    for macro in ((2, 1, None, None, True), (4, 8, 2, 1, False), (1, 5, 4, 1, True)):
+        assert decode_action(encode_action(macro)) == macro
+    assert decode_action(encode_action(3)) == (3, None, None, None, None)
+
+
+@pytest.fixture
+def recorded(expert, tmp_path):
+    """
+    Two stub episodes recorded into shards of 96 steps, with the evaluation results of each.
+    """
+    directory = tmp_path / "dataset"
+    expert.dataset = EpisodeWriter(str(directory), shard_steps=96)
+    episodes = [run.evaluate(expert, str(tmp_path), frame_budget=budget) for budget in (300, 500)]
+    expert.dataset.close()
+    return directory, episodes
+
+
+def test_episodes_read_back_across_shards(recorded):
+    directory, episodes = recorded
+    dataset = EpisodeDataset(str(directory))
+
+    assert dataset.version == DATASET_VERSION and len(dataset) == 2
+    assert dataset.steps == sum(results["steps"] for results in episodes) > 2 * 96
+    for index, results in enumerate(episodes):
+        steps = dataset.episode(index)
+        assert len(steps) == dataset.episodes[index]["steps"] == results["steps"]
+        assert (steps["episode"] == index).all()
+        assert np.array_equal(steps["step"], np.arange(len(steps)))
+        assert (np.diff(steps["frame"].astype(np.int64)) > 0).all()
+        assert dataset.episodes[index]["final_state"]["x_position"] == results["x_position"]
+        assert len(dataset.episodes[index]["segments"]) > 1
+    # Every decision of the stub runs ends up sprinting right
+    assert {decode_action(row)[0] for row in dataset.episode(0)["action"]} == {2}
+
+
+def test_a_new_writer_continues_the_dataset(recorded, stub):
+    directory, _ = recorded
+    before = EpisodeDataset(str(directory))
+    writer = EpisodeWriter(str(directory))
+    assert writer.begin_episode(note="resumed") == 2
+    for _ in range(3):
+        writer.observe(stub)
+        writer.append((2, 1, None, None, True))
+        stub.run_action(2, 1)
+    # An episode is only visible to readers once it has ended
+    assert len(EpisodeDataset(str(directory))) == 2
+    writer.close()
+
+    after = EpisodeDataset(str(directory))
+    assert len(after) == 3 and after.steps == before.steps + 3
+    assert after.episodes[2]["note"] == "resumed"
+    # The last shard is filled up before a new one is started
+    room = 96 - before.index["shards"][-1]["steps"]
+    assert len(after.shards) == len(before.shards) + (room < 3)
+    assert np.array_equal(after.episode(1), before.episode(1))
+
+
+def test_other_versions_are_refused(recorded):
+    directory, _ = recorded
+    index_path = directory / "index.json"
+    index = json.loads(index_path.read_text())
+
+    index_path.write_text(json.dumps({**index, "version": 1}))
+    assert EpisodeDataset(str(directory)).version == 1
+    with pytest.raises(ValueError, match="version 1 dataset"):
+        EpisodeWriter(str(directory))
+
+    index_path.write_text(json.dumps({**index, "version": DATASET_VERSION + 1}))
+    with pytest.raises(ValueError, match="Unsupported dataset version"):
+        EpisodeDataset(str(directory))
@@ -0,0 +1,106 @@
+import json
+import os
+
+import baseline_mario_expert
+import run
+from emulator_backend import BackendEnvironment, StubController
+from mario_expert import MarioController, MarioExpert
+from stub_pyboy import StubPyBoy
+
+
+class EndingPyBoy(StubPyBoy):
+    def __init__(self) -> None:
+        super().__init__(game_over_frame=900)
+
+
+class EndingController(StubController):
+    backend = EndingPyBoy
+
+
+class BaselineController(baseline_mario_expert.MarioController, BackendEnvironment):
+    backend = StubPyBoy
+
+
+class EndingBaselineController(BaselineController):
+    backend = EndingPyBoy
+
+
+def baseline_expert(results_path, monkeypatch, controller=BaselineController):
+    """
+    The baseline template's MarioExpert - no game_frame, stop_check or decision_times - on the stub.
+    """
+    monkeypatch.setattr(baseline_mario_expert, "MarioController", controller)
+    return baseline_mario_expert.MarioExpert(results_path=str(results_path), headless=True)
+
+
+def count_steps(expert) -> list:
+    steps = []
+    step = expert.step
+
+    def counted():
+        steps.append(expert.environment.game_frame)
+        step()
+
+    expert.step = counted
+    return steps
+
+
+def test_frame_budget_stops_the_run_and_tears_it_down(expert, tmp_path):
+    steps = count_steps(expert)
+    results = run.evaluate(expert, str(tmp_path), frame_budget=500)
+
+    assert results["stopped_by"] == "frame budget of 500"
+    assert results["steps"] == len(steps)
+    # The budget is checked after each step, so the run stops on the first step ending past it
+    assert results["frames"] >= 500 > steps[-1] - steps[0]
+    assert expert.decision_times is None and expert.stop_check is None
+    assert os.path.getsize(tmp_path / "mario_expert.mp4") > 0
+    with open(tmp_path / "results.json", encoding="utf-8") as file:
+        assert json.load(file) == results
+
+
+def test_frame_budgeted_runs_stop_on_the_same_step(expert, tmp_path):
+    first = run.evaluate(expert, str(tmp_path), frame_budget=800)
+    second = run.evaluate(expert, str(tmp_path), frame_budget=800)
+    assert (first["frames"], first["steps"], first["x_position"]) == (
+        second["frames"],
+        second["steps"],
+        second["x_position"],
+    )
+
+
+def test_game_over_ends_the_run_before_the_budget(tmp_path, monkeypatch):
+    monkeypatch.setattr(MarioController, "prototype", EndingController(emulation_speed=0, headless=True))
+    expert = MarioExpert(results_path=str(tmp_path), headless=True)
+    expert.recording = "sync"
+    steps = count_steps(expert)
+    results = run.evaluate(expert, str(tmp_path), frame_budget=100_000)
+
+    assert results["stopped_by"] == "game_over" and results["game_over"]
+    assert results["steps"] == len(steps)
+    assert results["frames"] < 100_000
+
+
+def test_a_baseline_expert_is_stopped_by_its_frame_budget(tmp_path, monkeypatch):
+    expert = baseline_expert(tmp_path, monkeypatch)
+    results = run.evaluate(expert, str(tmp_path), frame_budget=200)
+
+    assert results["stopped_by"] == "frame budget of 200"
+    assert results["frames"] >= 200 and results["steps"] > 0
+    assert results["decision_ms_max"] > 0
+    # The run was cut short out of step(), so the video was released and results.json written here
+    assert os.path.getsize(tmp_path / "mario_expert.mp4") > 0
+    with open(tmp_path / "results.json", encoding="utf-8") as file:
+        assert json.load(file) == results
+
+    # The expert is left as it was - a second run is budgeted afresh
+    again = run.evaluate(expert, str(tmp_path), frame_budget=200)
+    assert (again["frames"], again["steps"]) == (results["frames"], results["steps"])
+
+
+def test_a_baseline_expert_plays_to_game_over(tmp_path, monkeypatch):
+    expert = baseline_expert(tmp_path, monkeypatch, EndingBaselineController)
+    results = run.evaluate(expert, str(tmp_path), frame_budget=100_000)
+
+    assert results["stopped_by"] == "game_over" and results["game_over"]
+    assert 0 < results["frames"] < 100_000
@@ -0,0 +1,47 @@
+import numpy as np
+
+import hazard_table
+import level_map
+import tile_query
+from hazard_table import DOWN_PIPE, GAP, MACROS, NO_HAZARD, PIPE, HazardIndex, HazardTable
+
+
+def stage() -> level_map.LevelMap:
+    world = np.zeros((level_map.ROWS, 60), dtype=np.uint8)
+    world[level_map.ROWS - 2 :] = tile_query.BLOCK
+    world[level_map.ROWS - 2 :, 41:43] = tile_query.EMPTY
+    world[level_map.ROWS - 4 : level_map.ROWS - 2, 20:22] = tile_query.PIPE
+    level = level_map.LevelMap(1, 1)
+    level.observe(world, 0)
+    return level
+
+
+def test_any_stage_keeps_the_inline_down_pipe_range():
+    index = HazardIndex()
+    for x_position in range(2000):
+        down_pipe = bool(index.lookup(3, 2, x_position).flags & DOWN_PIPE)
+        assert down_pipe == (1305 <= x_position <= 1400), x_position
+
+
+def test_build_flags_the_two_columns_in_front_of_each_hazard():
+    table = hazard_table.build(stage())
+    for x_position in range(len(table.flags)):
+        column = level_map.mario_column(x_position)
+        expected = (GAP if 39 <= column <= 40 else 0) | (PIPE if 18 <= column <= 19 else 0)
+        hazard = table.lookup(x_position)
+        assert hazard.flags == expected, x_position
+        if expected:
+            assert hazard.macro == MACROS[hazard_table.GAP_JUMP if expected == GAP else hazard_table.PIPE_JUMP]
+    assert table.lookup(-1) == table.lookup(len(table.flags)) == NO_HAZARD
+
+
+def test_stage_tables_are_saved_loaded_and_combined_with_any_stage(tmp_path):
+    table = HazardTable.empty(1, 1, 1500)
+    table.mark(1390, 1410, GAP, hazard_table.GAP_JUMP)
+    table.save(str(tmp_path / "w1-s1.npz"))
+    index = HazardIndex()
+    index.load(str(tmp_path))
+
+    assert index.lookup(1, 1, 1395) == (GAP | DOWN_PIPE, MACROS[hazard_table.GAP_JUMP])
+    assert index.lookup(1, 1, 1405) == (GAP, MACROS[hazard_table.GAP_JUMP])
+    assert index.lookup(1, 2, 1395) == (DOWN_PIPE, None)
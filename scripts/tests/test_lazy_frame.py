@@ -0,0 +1,56 @@
+import math
+
+import cv2
+import numpy as np
+import pytest
+
+import run
+from lazy_frame import LazyFrame
+from pyboy_environment import PyboyEnvironment
+
+
+def test_grab_frame_matches_the_environment_and_is_built_once_per_tick(stub):
+    for _ in range(5):
+        stub.run_action(2, 6, 4, 2, True)
+        frame = stub.grab_frame()
+        assert stub.grab_frame() is frame
+        assert np.array_equal(frame, PyboyEnvironment.grab_frame(stub))
+        assert np.array_equal(stub.grab_frame(120, 150), PyboyEnvironment.grab_frame(stub, 120, 150))
+
+
+def test_a_lazy_frame_costs_nothing_until_its_pixels_are_used(stub):
+    before = LazyFrame.bytes_materialised
+    frame = stub.frame()
+    assert not frame.materialised and frame.shape == (240, 300, 3)
+    assert LazyFrame.bytes_materialised == before
+
+    assert np.asarray(frame).shape == (240, 300, 3)
+    assert frame.materialised and LazyFrame.bytes_materialised > before
+
+
+def test_a_lazy_frame_cannot_be_materialised_after_the_tick(stub):
+    frame = stub.frame()
+    stub.run_action(2, 1)
+    with pytest.raises(RuntimeError, match="never materialised"):
+        frame.array
+
+
+def test_screen_hash_follows_the_pixels(stub):
+    first = stub.screen_hash()
+    stub.run_action(2, 4)
+    assert stub.screen_hash() != first
+
+
+def frame_count(path) -> int:
+    capture = cv2.VideoCapture(str(path))
+    count = 0
+    while capture.read()[0]:
+        count += 1
+    capture.release()
+    return count
+
+
+def test_record_every_keeps_every_nth_step(expert, tmp_path):
+    expert.record_every = 3
+    results = run.evaluate(expert, str(tmp_path), frame_budget=600)
+    assert frame_count(tmp_path / "mario_expert.mp4") == math.ceil(results["steps"] / 3)
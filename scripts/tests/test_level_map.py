@@ -0,0 +1,69 @@
+import numpy as np
+
+import tile_query
+from level_map import COLUMNS, ROWS, UNSEEN, LevelMap, LevelMapIndex
+
+
+def terrain(width: int, seed: int = 7) -> np.ndarray:
+    """
+    A random stage - ground with gaps along the bottom, pipes and floating blocks above it.
+    """
+    rng = np.random.default_rng(seed)
+    world = np.zeros((ROWS, width), dtype=np.uint8)
+    world[ROWS - 2 :] = tile_query.BLOCK
+    world[ROWS - 2 :, rng.random(width) < 0.1] = tile_query.EMPTY
+    world[ROWS - 4 : ROWS - 2, rng.random(width) < 0.08] = tile_query.PIPE
+    world[rng.integers(2, ROWS - 4, width // 4), rng.integers(0, width, width // 4)] = tile_query.QUESTION_BLOCK
+    return world
+
+
+def test_windows_stitch_into_the_stage_under_sprites():
+    world = terrain(302)
+    rng = np.random.default_rng(8)
+    level = LevelMap(1, 1)
+    for left in range(0, world.shape[1] - COLUMNS + 1, 3):
+        window = world[:, left : left + COLUMNS].copy()
+        # Mario and enemies hide whatever terrain is behind them
+        window[rng.integers(0, ROWS, 6), rng.integers(0, COLUMNS, 6)] = rng.choice(
+            (tile_query.MARIO,) + tile_query.ENEMY, 6
+        )
+        level.observe(window, left)
+
+    assert level.width == world.shape[1] and level.dirty
+    assert np.array_equal(level.grid, world)
+
+
+def test_windows_left_of_the_stage_are_cropped():
+    world = terrain(COLUMNS)
+    level = LevelMap(1, 1)
+    level.observe(world, -5)
+    assert level.width == COLUMNS - 5
+    assert np.array_equal(level.grid, world[:, 5:])
+
+
+def test_queries_beyond_the_screen():
+    level = LevelMap(1, 1)
+    world = np.zeros((ROWS, 60), dtype=np.uint8)
+    world[ROWS - 2 :] = tile_query.BLOCK
+    world[ROWS - 2 :, 41:43] = tile_query.EMPTY
+    world[ROWS - 5 : ROWS - 2, 30] = tile_query.PIPE
+    level.observe(world, 0)
+
+    assert (level.next_gap(0), level.next_gap(0, distance=41), level.next_gap(43)) == (41, None, None)
+    assert (level.next_pipe(0), level.next_pipe(31)) == (30, None)
+    assert (level.ground_height(30), level.ground_height(0), level.ground_height(41)) == (ROWS - 5, ROWS - 2, ROWS)
+
+
+def test_index_saves_dirty_maps_and_reloads_them(tmp_path):
+    index = LevelMapIndex(str(tmp_path))
+    world = terrain(80)
+    index.get(1, 2).observe(world[:, :COLUMNS], 0)
+    index.get(1, 2).observe(world[:, 60:], 60)
+    index.save()
+    assert not index.get(1, 2).dirty
+
+    reloaded = LevelMapIndex(str(tmp_path)).get(1, 2)
+    assert reloaded.width == 80
+    assert np.array_equal(reloaded.grid[:, :COLUMNS], world[:, :COLUMNS])
+    assert (reloaded.grid[:, COLUMNS:60] == UNSEEN).all()
+    assert not (tmp_path / "w1-s1.npz").exists()
@@ -0,0 +1,99 @@
+import numpy as np
+
+import replay_log
+import run
+from emulator_backend import stub_controller
+from lookahead import CANDIDATES, Lookahead, controller_state, died, score
+
+
+class Ram:
+    def __init__(self, x_position=0, lives=2, game_over=False, dead_timer=0, dead_jump_timer=0):
+        self.x_position = x_position
+        self.lives = lives
+        self.game_over = game_over
+        self.dead_timer = dead_timer
+        self.dead_jump_timer = dead_jump_timer
+
+
+class Recorder:
+    def __init__(self, log: list) -> None:
+        self.log = log
+
+    def record_input(self, frame: int, event: int) -> None:
+        self.log.append((frame, event))
+
+
+def test_score_is_progress_minus_a_death_penalty():
+    assert score(Ram(100), Ram(140)) == 40
+    assert not died(Ram(dead_timer=3), Ram(dead_timer=4))
+    for after in (Ram(lives=1), Ram(game_over=True), Ram(dead_timer=1), Ram(dead_jump_timer=1)):
+        assert died(Ram(), after)
+        assert score(Ram(100), after) < -9000
+
+
+def test_choose_leaves_the_game_where_it_was(stub):
+    stub.run_action(2, 20, None, None, True)
+    stub.stuck = 2
+    ram = stub.snapshot().as_array().copy()
+    attributes = controller_state(stub)
+    game_frame = stub.game_frame
+
+    lookahead = Lookahead(stub, horizon=30, frame_budget=150)
+    macro = lookahead.choose((2, 1, None, None, True))
+
+    assert macro in CANDIDATES
+    assert np.array_equal(stub.snapshot().as_array(), ram)
+    assert controller_state(stub) == attributes
+    assert stub.game_frame == game_frame
+    assert stub.rollout_frames == lookahead.rollout_frames == 150
+    assert stub.scheduler.held == stub.pyboy.held
+
+
+def test_restoring_sends_no_input_and_keeps_the_held_buttons(stub):
+    # run_action leaves B held for sprinting
+    stub.run_action(2, 20, None, None, True)
+    held = set(stub.scheduler.held)
+    assert held and held == stub.pyboy.held
+    log = []
+    stub.input_log = Recorder(log)
+
+    Lookahead(stub, horizon=30, frame_budget=150).choose((2, 1, None, None, True))
+
+    assert log == []
+    assert stub.scheduler.held == stub.pyboy.held == held
+    assert not stub.scheduler.pending(stub.pyboy.frame_count)
+
+
+def test_outcomes_are_cached_by_decision_point(stub):
+    lookahead = Lookahead(stub, horizon=30, frame_budget=300)
+    lookahead.choose((2, 1, None, None, True))
+    rollouts = lookahead.rollouts
+    lookahead.choose((2, 1, None, None, True))
+
+    assert lookahead.rollouts == rollouts
+    assert lookahead.cache_hits == rollouts
+
+
+def test_the_rule_choice_wins_ties(stub):
+    # Every candidate standing still scores the same
+    still = ((0, 5, None, None, False), (4, 8, None, None, False))
+    lookahead = Lookahead(stub, horizon=10, candidates=still)
+    assert lookahead.choose((1, 1, None, None, False)) == (1, 1, None, None, False)
+    assert lookahead.overrides == 0
+
+
+def test_a_run_with_lookahead_counts_and_replays_game_frames_only(expert, tmp_path):
+    expert.lookahead = Lookahead(expert.environment, horizon=30, frame_budget=120)
+    expert.recording = "replay"
+    results = run.evaluate(expert, str(tmp_path), frame_budget=600)
+    environment = expert.environment
+
+    assert expert.lookahead.rollouts > 0
+    assert environment.rollout_frames == expert.lookahead.rollout_frames
+    assert 600 <= results["frames"] < 700
+    assert environment.pyboy.frame_count - environment.rollout_frames == environment.game_frame
+
+    log = replay_log.ReplayLog.load(str(tmp_path / "mario_expert.replay.json.gz"))
+    replayer = replay_log.Replayer(log, stub_controller())
+    replayer.seek(log.frames)
+    assert replay_log.ram_checksum(replayer.environment) == replay_log.ram_checksum(environment)
@@ -0,0 +1,60 @@
+import numpy as np
+
+import object_table
+from object_table import GOOMBA, TURTLE, ObjectTable
+
+
+def table(*objects):
+    """
+    Builds the raw 160-byte table from (slot, type, x, y); every other slot is empty (type 0xFF).
+    """
+    raw = np.zeros((object_table.OBJECT_SLOTS, object_table.OBJECT_SLOT_SIZE), dtype=np.uint8)
+    raw[:, 0] = 0xFF
+    for slot, kind, x, y in objects:
+        raw[slot, 0], raw[slot, 2], raw[slot, 3] = kind, y, x
+    return raw.ravel()
+
+
+def test_read_decodes_the_slots_in_memory(stub):
+    memory = stub.pyboy.memory
+    memory[object_table.OBJECT_TABLE_START : object_table.OBJECT_TABLE_END] = table((3, TURTLE, 40, 100)).tobytes()
+    objects = ObjectTable.read(memory)
+
+    assert list(objects.types) == [0xFF] * 3 + [TURTLE] + [0xFF] * 6
+    assert (objects.objects["x"][3], objects.objects["y"][3]) == (40, 100)
+
+
+def test_decoded_wraps_a_recorded_array():
+    objects = ObjectTable(table((0, GOOMBA, 10, 20))).objects.copy()
+    assert ObjectTable.decoded(objects).objects is objects
+
+
+def test_of_type_and_offsets():
+    objects = ObjectTable(table((1, GOOMBA, 10, 20), (4, TURTLE, 200, 5), (7, GOOMBA, 90, 20)))
+
+    assert list(objects.of_type(GOOMBA)) == [1, 7]
+    assert list(objects.of_type((GOOMBA, TURTLE))) == [1, 4, 7]
+    dx, dy = objects.offsets(100, 20)
+    # Signed, so objects left of and above Mario come out negative rather than wrapping
+    assert (dx[1], dx[4], dy[4]) == (-90, 100, -15)
+
+
+def test_within_matches_a_loop_over_the_slots():
+    rng = np.random.default_rng(3)
+    bounds = ((0, 15), (None, 20), (-30, None), None)
+    for _ in range(200):
+        raw = table(*((slot, rng.choice([GOOMBA, TURTLE, 0xFF]), *rng.integers(0, 256, 2)) for slot in range(10)))
+        objects = ObjectTable(raw)
+        mario_x, mario_y = (int(v) for v in rng.integers(0, 256, 2))
+        dx, dy = bounds[rng.integers(4)], bounds[rng.integers(4)]
+
+        expected = []
+        for slot, (kind, x, y) in enumerate(objects.objects.tolist()):
+            inside = kind == GOOMBA
+            for offset, bound in ((x - mario_x, dx), (y - mario_y, dy)):
+                if bound is not None:
+                    low, high = bound
+                    inside &= (low is None or offset > low) and (high is None or offset < high)
+            if inside:
+                expected.append(slot)
+        assert list(objects.within(GOOMBA, mario_x, mario_y, dx=dx, dy=dy)) == expected
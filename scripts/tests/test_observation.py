@@ -0,0 +1,42 @@
+import numpy as np
+
+import tile_query
+from benchmark import synthetic_grids
+from observation import PLANES, ROWS, Observation
+
+
+def random_grids(count: int) -> np.ndarray:
+    rng = np.random.default_rng(9)
+    return np.concatenate([synthetic_grids(count), rng.integers(0, 30, (count, 16, 20), dtype=np.uint32)])
+
+
+def test_planes_match_the_tile_classes():
+    for grid in random_grids(100):
+        observation = Observation(grid)
+        for name, codes in PLANES.items():
+            assert np.array_equal(getattr(observation, name), tile_query.match(grid, codes)), name
+
+
+def test_planes_are_computed_once():
+    observation = Observation(synthetic_grids(1)[0])
+    assert observation.pipe is observation.pipe
+
+
+def test_heights_are_the_highest_solid_tile_per_column():
+    for grid in random_grids(100):
+        heights = Observation(grid).heights
+        for column in range(grid.shape[1]):
+            rows = [row for row in range(ROWS) if grid[row, column] in tile_query.SOLID]
+            assert heights[column] == (rows[0] if rows else ROWS)
+
+
+def test_bytes_round_trip():
+    for grid in random_grids(20):
+        observation = Observation(grid)
+        data = observation.to_bytes()
+        restored = Observation.from_bytes(data)
+
+        assert len(data) == 340
+        assert np.array_equal(restored.grid, grid)
+        assert np.array_equal(restored.heights, observation.heights)
+        assert np.array_equal(restored.enemy, observation.enemy)
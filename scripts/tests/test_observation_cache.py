@@ -0,0 +1,27 @@
+import numpy as np
+
+
+def test_game_area_is_built_once_per_frame(stub):
+    builds, hits = stub.game_area_builds, stub.game_area_hits
+    first = stub.game_area()
+    assert stub.game_area() is first
+    assert stub.observation().grid is first
+    assert (stub.game_area_builds - builds, stub.game_area_hits - hits) == (1, 2)
+
+
+def test_a_tick_invalidates_the_snapshot(stub):
+    first = stub.game_area()
+    snapshot = stub.snapshot()
+    stub.run_action(2, 8)
+    assert stub.game_area() is not first
+    assert stub.snapshot() is not snapshot
+    assert not np.array_equal(stub.game_area(), first)
+
+
+def test_load_state_drops_the_snapshot_of_the_frame_it_replaces(stub):
+    stub.run_action(2, 20)
+    moved = stub.snapshot()
+    # reset loads a state without moving frame_count - the cache must not serve the old frame
+    stub.reset()
+    assert stub.snapshot() is not moved
+    assert stub.get_x_position() < moved.x_position
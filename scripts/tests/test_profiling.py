@@ -0,0 +1,63 @@
+import json
+import time
+
+import pytest
+
+import run
+from emulator_backend import stub_controller
+from mario_expert import MarioController, MarioExpert
+from profiling import Profiler
+
+
+def test_phases_are_timed_and_counted():
+    profiler = Profiler()
+    for _ in range(3):
+        with profiler.phase("sleep"):
+            time.sleep(0.001)
+    profiler.count("ticks", 12)
+    profiler.count("ticks")
+
+    summary = profiler.summary()
+    sleep = summary["phases"]["sleep"]
+    assert sleep["calls"] == 3 and sleep["total_ms"] >= 3 and sleep["max_us"] >= sleep["mean_us"] >= 1000
+    assert summary["counters"] == {"ticks": 13}
+
+
+def test_a_phase_times_and_propagates_an_exception():
+    profiler = Profiler()
+    with pytest.raises(KeyError):
+        with profiler.phase("failing"):
+            raise KeyError("x")
+    assert profiler.calls["failing"] == 1
+
+
+def test_a_disabled_profiler_records_nothing():
+    profiler = Profiler(enabled=False)
+    with profiler.phase("decide"):
+        profiler.count("ticks")
+    assert profiler.summary() == {"phases": {}, "counters": {}}
+
+
+def evaluate(results_path, monkeypatch, profiling=False) -> dict:
+    monkeypatch.setattr(MarioController, "prototype", stub_controller())
+    expert = MarioExpert(results_path=str(results_path), headless=True)
+    expert.profiling = profiling
+    expert.recording = "sync"
+    return run.evaluate(expert, str(results_path), frame_budget=300)
+
+
+def test_profile_json_is_written_only_when_profiling(tmp_path, monkeypatch):
+    evaluate(tmp_path, monkeypatch)
+    assert not (tmp_path / "profile.json").exists()
+
+    results = evaluate(tmp_path, monkeypatch, profiling=True)
+    with open(tmp_path / "profile.json", encoding="utf-8") as file:
+        profile = json.load(file)
+
+    assert profile["phases"]["record"]["calls"] == results["steps"]
+    assert profile["counters"]["game_area_builds"] > 0
+    assert "just sprinting" in profile["rules"]
+    assert "mean_us" in profile["rules"]["just sprinting"]
+    # Profiling is per expert - a new one starts with it off
+    monkeypatch.setattr(MarioController, "prototype", stub_controller())
+    assert not MarioExpert(results_path=str(tmp_path), headless=True).profiling
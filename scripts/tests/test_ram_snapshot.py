@@ -0,0 +1,31 @@
+import numpy as np
+
+import ram_snapshot
+from mario_environment import MarioEnvironment
+from ram_snapshot import RAMSnapshot
+
+
+def test_snapshot_matches_the_environment_getters(stub):
+    for _ in range(40):
+        stub.run_action(2, 7, 4, 3, True)
+        assert RAMSnapshot.capture(stub.pyboy).game_state() == MarioEnvironment.game_state(stub)
+
+
+def test_x_position_and_time_decoding(stub):
+    memory = stub.pyboy.memory
+    rng = np.random.default_rng(4)
+    for _ in range(200):
+        for addr in (ram_snapshot.ADDR_LEVEL_BLOCK, ram_snapshot.ADDR_MARIO_X):
+            memory[addr] = int(rng.integers(256))
+        for addr in range(ram_snapshot.ADDR_TIME, ram_snapshot.ADDR_TIME + 3):
+            # Mostly digits, sometimes the blank tile the timer shows between levels
+            memory[addr] = int(rng.choice([rng.integers(10), 0x2C]))
+        snapshot = RAMSnapshot.capture(stub.pyboy)
+        assert snapshot.x_position == MarioEnvironment.get_x_position(stub)
+        assert snapshot.time == MarioEnvironment.get_time(stub)
+
+
+def test_as_array_follows_ram_addresses(stub):
+    snapshot = RAMSnapshot.capture(stub.pyboy)
+    assert snapshot.as_array().tolist() == [stub.pyboy.memory[addr] for addr in ram_snapshot.RAM_ADDRESSES]
+    assert snapshot.bit(ram_snapshot.ADDR_ON_GROUND, 0) == bool(snapshot.on_ground & 1)
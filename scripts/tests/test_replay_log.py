@@ -0,0 +1,67 @@
+import gzip
+import json
+
+import pytest
+
+import replay_log
+from emulator_backend import stub_controller
+from replay_log import ReplayLog, Replayer, ReplayMismatch, ram_checksum
+
+FRAMES = 3000
+
+
+@pytest.fixture
+def recorded(expert, tmp_path):
+    """
+    A replay of about FRAMES frames of a stub run, and the controller it was recorded on.
+    """
+    expert.recording = "replay"
+    expert.stop_check = lambda expert: "done" if expert.environment.game_frame >= FRAMES else None
+    expert.play()
+    return str(tmp_path / "mario_expert.replay.json.gz"), expert.environment
+
+
+def test_save_and_load_round_trip(recorded, tmp_path):
+    path, _ = recorded
+    log = ReplayLog.load(path)
+    copy = str(tmp_path / "copy.json.gz")
+    log.save(copy)
+
+    assert vars(ReplayLog.load(copy)) == vars(log)
+    assert log.events and len(log.checksums) >= log.frames // log.checksum_interval > 1
+
+
+def test_replay_reproduces_every_checksum_forwards_and_backwards(recorded):
+    path, environment = recorded
+    log = ReplayLog.load(path)
+    replayer = Replayer(log, stub_controller())
+
+    replayer.seek(log.frames)
+    assert ram_checksum(replayer.environment) == ram_checksum(environment)
+    # Seeking back rewinds to the start state and plays forward again, verifying on the way
+    for frame, checksum in reversed(log.checksums):
+        replayer.seek(frame)
+        assert ram_checksum(replayer.environment) == checksum
+
+
+def test_a_diverging_replay_raises(recorded):
+    path, _ = recorded
+    log = ReplayLog.load(path)
+    frame, checksum = log.checksums[3]
+    log.checksums[3] = (frame, checksum ^ 1)
+
+    with pytest.raises(ReplayMismatch, match=f"frame {frame}"):
+        Replayer(log, stub_controller()).seek(log.frames)
+
+
+def test_load_refuses_unknown_versions(recorded, tmp_path):
+    path, _ = recorded
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        log = json.load(file)
+    log["version"] = replay_log.REPLAY_VERSION + 1
+    future = str(tmp_path / "future.json.gz")
+    with gzip.open(future, "wt", encoding="utf-8") as file:
+        json.dump(log, file)
+
+    with pytest.raises(ValueError, match="Unsupported replay version"):
+        ReplayLog.load(future)
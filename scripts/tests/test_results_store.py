@@ -0,0 +1,92 @@
+import json
+import os
+import random
+
+import pytest
+
+from results_store import ResultsStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    """
+    A store of 400 random runs by 30 agents, with plenty of equal timestamps and results.
+    """
+    rng = random.Random(17)
+    with ResultsStore(str(tmp_path / "results.db")) as store:
+        for _ in range(400):
+            results = {"world": rng.randint(1, 2), "stage": rng.randint(1, 3), "score": rng.choice([0, 100, 200])}
+            store.add(f"upi{rng.randrange(30)}", results, timestamp=float(rng.randrange(50)))
+        yield store
+
+
+def leaders(store, key) -> list:
+    """
+    Ranks every agent's run that maximises key, as a plain loop over the history.
+    """
+    agents = {row[0] for row in store.connection.execute("SELECT DISTINCT upi FROM runs")}
+    chosen = [max(enumerate(store.history(upi)), key=key)[1] for upi in agents]
+    chosen.sort(key=lambda entry: (-entry["world"], -entry["stage"], -entry["score"], entry["upi"]))
+    return chosen
+
+
+def latest(indexed):
+    # history is in (timestamp, id) order, so the last run is the latest
+    return indexed[0]
+
+
+def best(indexed):
+    index, entry = indexed
+    return entry["world"], entry["stage"], entry["score"], -entry["timestamp"], -index
+
+
+def test_top_latest_and_best_match_a_loop_over_the_history(store):
+    assert store.top(runs="latest") == leaders(store, latest)
+    assert store.top(runs="best") == leaders(store, best)
+    assert store.top(5, runs="best") == leaders(store, best)[:5]
+
+
+def test_top_all_ranks_every_run(store):
+    ranked = store.top(runs="all")
+    assert len(ranked) == 400
+    keys = [(-entry["world"], -entry["stage"], -entry["score"], entry["timestamp"]) for entry in ranked]
+    assert keys == sorted(keys)
+
+
+def test_leader_tables_are_filled_for_an_older_database(store, tmp_path):
+    expected = store.top(runs="latest"), store.top(runs="best")
+    with store.connection:
+        store.connection.execute("DROP TABLE latest_runs")
+        store.connection.execute("DROP TABLE best_runs")
+
+    with ResultsStore(store.path) as reopened:
+        assert (reopened.top(runs="latest"), reopened.top(runs="best")) == expected
+
+
+def test_ingest_only_reads_new_or_changed_results(tmp_path):
+    results = tmp_path / "results"
+    for upi, score in (("abc123", 100), ("def456", 300)):
+        (results / upi).mkdir(parents=True)
+        (results / upi / "results.json").write_text(json.dumps({"world": 1, "stage": 1, "score": score}))
+
+    with ResultsStore(str(tmp_path / "results.db")) as store:
+        assert store.ingest(str(results)) == 2
+        assert store.ingest(str(results)) == 0
+
+        path = results / "abc123" / "results.json"
+        path.write_text(json.dumps({"world": 1, "stage": 2, "score": 50}))
+        os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 10))
+        assert store.ingest(str(results)) == 1
+
+        assert [entry["upi"] for entry in store.top()] == ["abc123", "def456"]
+        assert [entry["score"] for entry in store.history("abc123")] == [100, 50]
+        assert store.top(runs="best")[0]["stage"] == 2
+
+
+def test_top_reads_the_leader_index(store):
+    plan = store.connection.execute(
+        "EXPLAIN QUERY PLAN SELECT runs.* FROM latest_runs JOIN runs ON runs.id = latest_runs.run_id "
+        "ORDER BY latest_runs.world DESC, latest_runs.stage DESC, latest_runs.score DESC, latest_runs.upi LIMIT 5"
+    ).fetchall()
+    details = " ".join(row["detail"] for row in plan)
+    assert "latest_runs_rank" in details and "TEMP B-TREE" not in details
@@ -0,0 +1,87 @@
+import io
+
+import pytest
+
+import hazard_table
+import lookahead
+from emulator_backend import stub_controller
+from expert_parameters import ExpertParameters
+from lookahead import CANDIDATES, Lookahead
+from rollout_pool import RolloutPool
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with RolloutPool(workers=2, factory=stub_controller) as pool:
+        yield pool
+
+
+def test_parallel_rollouts_score_as_sequential_ones(stub, pool):
+    stub.run_action(2, 20, None, None, True)
+    state = io.BytesIO()
+    stub.pyboy.save_state(state)
+    attributes = lookahead.controller_state(stub)
+    held = frozenset(stub.scheduler.held)
+
+    results = pool.map([(state.getvalue(), (macro,), 40, attributes, held) for macro in CANDIDATES])
+
+    for macro, result in zip(CANDIDATES, results):
+        lookahead.restore(stub, state.getvalue(), attributes, held=held)
+        before, after = lookahead.rollout(stub, (macro,), 40)
+        assert result["score"] == lookahead.score(before, after), macro
+        assert result["snapshot"].values == after.values
+    assert pool.stats()["rollouts"] >= len(CANDIDATES)
+
+
+def test_lookahead_chooses_the_same_macro_with_a_pool(pool):
+    sequential, parallel = stub_controller(), stub_controller()
+    searches = Lookahead(sequential, horizon=40), Lookahead(parallel, horizon=40, pool=pool)
+    for _ in range(10):
+        chosen = [search.choose((2, 1, None, None, True)) for search in searches]
+        assert chosen[0] == chosen[1]
+        for environment in (sequential, parallel):
+            environment.run_action(*chosen[0])
+    # Parallel rollouts never advance the controller's own emulator
+    assert parallel.rollout_frames == 0 and sequential.game_frame == parallel.game_frame
+
+
+def test_failures_are_raised_in_the_caller(stub, pool):
+    with pytest.raises(ValueError, match="does not fit"):
+        pool.map([(bytes(pool.slot_bytes + 1), (CANDIDATES[0],), 10, {}, ())])
+
+    state = io.BytesIO()
+    stub.pyboy.save_state(state)
+    with pytest.raises(RuntimeError, match="failed in worker"):
+        pool.map([(state.getvalue(), ((99, 1, None, None, True),), 10, {}, ())])
+    # The pool keeps serving after a failed job
+    assert pool.map([(state.getvalue(), (CANDIDATES[0],), 10, {}, ())])[0]["frames"] == 10
+
+
+def test_workers_roll_out_with_the_expert_parameters_and_hazard_tables(pool, tmp_path):
+    # Every rollout starts by backing off left, and every two-button macro goes down a pipe
+    parameters = ExpertParameters(stuck_escape=0)
+    table = hazard_table.HazardTable.empty(1, 1, 2000)
+    table.mark(0, 1999, hazard_table.DOWN_PIPE)
+    table.save(str(tmp_path / "w1-s1.npz"))
+
+    sequential, parallel = stub_controller(), stub_controller()
+    for environment in (sequential, parallel):
+        environment.parameters = parameters
+        environment.hazards.load(str(tmp_path))
+    configured = RolloutPool(
+        workers=2, factory=stub_controller, parameters=parameters.as_dict(), hazard_tables=str(tmp_path)
+    )
+    with configured:
+        searches = Lookahead(sequential, horizon=40), Lookahead(parallel, horizon=40, pool=configured)
+        for _ in range(5):
+            chosen = [search.choose((2, 1, None, None, True)) for search in searches]
+            assert chosen[0] == chosen[1]
+            assert searches[0]._cache == searches[1]._cache
+            for environment in (sequential, parallel):
+                environment.run_action(*chosen[0])
+
+    # Workers on the default parameters score the first decision point differently
+    first = next(iter(searches[0]._cache.values()))
+    default = Lookahead(stub_controller(), horizon=40, pool=pool)
+    default.choose((2, 1, None, None, True))
+    assert next(iter(default._cache.values())) != first
@@ -0,0 +1,176 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+import baseline_mario_expert
+import object_table
+import ram_snapshot
+import tile_query
+from benchmark import _cascade_object_rules, _engine_object_rules, synthetic_scenes
+from emulator_backend import BackendEnvironment, StubController
+from expert_parameters import ExpertParameters
+from lookahead import CONTROLLER_STATE
+from mario_expert import RULES, MarioController, MarioExpert
+from rule_engine import INCREMENT, RESET, Rule, RuleContext, RuleEngine
+from stub_pyboy import COLUMNS, ROWS, StubPyBoy
+
+
+class ScenePyBoy(StubPyBoy):
+    """
+    The stub with a synthetic scene over the model - scene_memory is written after every tick and
+    scene_grid is the game area.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(script=lambda stub: stub.write_scene())
+        self.scene_memory = {}
+        self.scene_grid = None
+
+    def write_scene(self) -> None:
+        for addr, value in self.scene_memory.items():
+            self.memory[addr] = value
+
+    def tiles(self) -> np.ndarray:
+        return super().tiles() if self.scene_grid is None else self.scene_grid.copy()
+
+
+class SceneController(StubController):
+    backend = ScenePyBoy
+
+
+class BaselineSceneController(baseline_mario_expert.MarioController, BackendEnvironment):
+    backend = ScenePyBoy
+
+
+def synthetic_scene(generator) -> tuple[dict, np.ndarray]:
+    """
+    RAM and a game area around Mario - ground with holes, pipes, prize blocks, sometimes the walled
+    special room, and enemies or powerups in the object table.
+    """
+    grid = np.zeros((ROWS, COLUMNS), dtype=np.uint32)
+    grid[ROWS - 2 :] = tile_query.BLOCK
+    for _ in range(generator.integers(0, 3)):
+        start = generator.integers(0, COLUMNS)
+        grid[ROWS - 2 :, start : start + generator.integers(1, 5)] = tile_query.EMPTY
+    for _ in range(generator.integers(0, 3)):
+        column = generator.integers(0, COLUMNS - 1)
+        top = generator.integers(9, ROWS - 2)
+        grid[top : ROWS - 2, column : column + 2] = tile_query.PIPE
+    for _ in range(generator.integers(0, 4)):
+        prize = generator.choice(tile_query.PRIZE)
+        grid[generator.integers(2, ROWS - 2), generator.integers(0, COLUMNS)] = prize
+    if generator.random() < 0.2:
+        grid[:, 0] = tile_query.BLOCK
+    if generator.random() < 0.2:
+        grid[9, :] = tile_query.BLOCK
+    if generator.random() < 0.9:
+        row, column = generator.integers(1, ROWS), generator.integers(1, COLUMNS)
+        grid[row - 1 : row + 1, column - 1 : column + 1] = tile_query.MARIO
+
+    memory = {
+        ram_snapshot.ADDR_MARIO_X: int(generator.integers(50, 90)),
+        ram_snapshot.ADDR_MARIO_Y: int(generator.choice([90, generator.integers(60, 120)])),
+        ram_snapshot.ADDR_ON_GROUND: int(generator.random() < 0.7),
+    }
+    for slot in range(object_table.OBJECT_SLOTS):
+        base = object_table.OBJECT_TABLE_START + slot * object_table.OBJECT_SLOT_SIZE
+        tracked = generator.random() < 0.15
+        memory[base] = int(generator.choice(object_table.TRACKED_TYPES)) if tracked else 0xFF
+        memory[base + 2] = int(generator.integers(60, 120))
+        memory[base + 3] = int(generator.integers(40, 100))
+    return memory, grid
+
+
+def test_the_expert_decides_as_the_baseline_expert(tmp_path, monkeypatch):
+    monkeypatch.setattr(baseline_mario_expert, "print", lambda *args: None, raising=False)
+    monkeypatch.setattr(baseline_mario_expert, "MarioController", BaselineSceneController)
+    monkeypatch.setattr(MarioController, "prototype", SceneController(emulation_speed=0, headless=True))
+    expert = MarioExpert(results_path=str(tmp_path), headless=True)
+    baseline = baseline_mario_expert.MarioExpert(results_path=str(tmp_path), headless=True)
+    environments = expert.environment, baseline.environment
+
+    generator = np.random.default_rng(0)
+    fired = Counter()
+    for _ in range(500):
+        memory, grid = synthetic_scene(generator)
+        for environment in environments:
+            environment.pyboy.scene_memory, environment.pyboy.scene_grid = memory, grid
+            environment.pyboy.tick(1, False)
+        x_position = baseline.environment.get_x_position()
+        # Bookkeeping carried over from earlier decisions - stalled or not, on the way to a wall jump
+        bookkeeping = {
+            "prev_mario_x": x_position - int(generator.choice([0, 0, 1, 8])),
+            "curr_mario_x": x_position,
+            "stuck": int(generator.integers(0, 5)),
+            "stuck_on_pipe": int(generator.integers(0, 3)),
+            "hole_count": 0,
+            "prev_x": int(generator.integers(0, ROWS)),
+            "prev_y": int(generator.integers(0, COLUMNS)),
+        }
+        for environment in environments:
+            for name, value in bookkeeping.items():
+                setattr(environment, name, value)
+
+        macro = expert.choose_action()
+        assert macro == baseline.choose_action(), (memory, grid, bookkeeping)
+        after = {name: getattr(baseline.environment, name) for name in CONTROLLER_STATE}
+        assert {name: getattr(expert.environment, name) for name in CONTROLLER_STATE} == after
+        fired[macro] += 1
+
+    # Every scene rule and most object rules decided some of the scenes
+    stats = expert.rules.stats()
+    scene = [rule.name for rule in RULES if rule.types is None and rule.name != "hazard table"]
+    assert all(stats[name]["hits"] for name in scene), {name: stats[name]["hits"] for name in scene}
+    assert len(fired) > 12
+
+
+@pytest.mark.parametrize("timed", [False, True])
+def test_the_rule_table_decides_as_the_cascade_did(timed):
+    engine = RuleEngine(RULES, timed=timed)
+    decisions = Counter()
+    for scene in synthetic_scenes(4000):
+        macro = _cascade_object_rules(scene)
+        assert _engine_object_rules(engine, scene) == macro
+        decisions[macro] += 1
+    # The scenes exercise most of the object rules, not just the empty case
+    assert len(decisions) > 5 and decisions[None] < 4000 * 0.9
+
+
+def test_the_cascade_is_matched_under_other_parameters():
+    parameters = ExpertParameters(goomba_dx=25, contact_dy=8, above_dy=2, turtle_dx=20)
+    engine = RuleEngine(RULES)
+    for scene in synthetic_scenes(1000, seed=1):
+        assert _engine_object_rules(engine, scene, parameters) == _cascade_object_rules(scene, parameters)
+
+
+def rule(name, priority, holds=True, **fields):
+    return Rule(name, priority, lambda context: holds, (name,), **fields)
+
+
+def test_chains_are_ordered_by_priority_then_table_order():
+    engine = RuleEngine([rule("a", 1), rule("b", 5), rule("c", 1), rule("d", 5, types=(3,))])
+    assert [r.name for _, r in engine.scene] == ["b", "a", "c"]
+    assert [r.name for _, r in engine.chains[3]] == ["d"]
+
+    with pytest.raises(ValueError, match="unique"):
+        RuleEngine([rule("a", 1), rule("a", 2)])
+
+
+def test_fire_does_the_bookkeeping_and_counts(stub):
+    engine = RuleEngine(
+        [rule("skip", 9, holds=False), rule("bump", 5, stuck=INCREMENT, commit=False), rule("clear", 1, stuck=RESET)],
+        timed=True,
+    )
+    context = RuleContext(stub, ExpertParameters())
+    stub.stuck, stub.prev_mario_x, stub.curr_mario_x = 2, 10, 40
+
+    assert engine.fire(engine.match_scene(context), context) == ("bump",)
+    assert (stub.stuck, stub.prev_mario_x) == (3, 10)
+    assert engine.fire(engine.rules[2], context) == ("clear",)
+    assert (stub.stuck, stub.prev_mario_x) == (0, 40)
+
+    stats = engine.stats()
+    assert (stats["skip"]["evaluations"], stats["skip"]["hits"]) == (1, 0)
+    assert (stats["bump"]["evaluations"], stats["bump"]["hits"]) == (1, 1)
+    assert stats["clear"]["evaluations"] == 0 and stats["clear"]["mean_us"] == 0.0
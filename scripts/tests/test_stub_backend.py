@@ -0,0 +1,71 @@
+import io
+
+import numpy as np
+
+import replay_log
+import tile_query
+from emulator_backend import stub_controller
+
+WALK = (2, 8, None, None, True)
+JUMP = (4, 8, 2, 1, True)
+
+
+def play(environment, macros):
+    for macro in macros:
+        environment.run_action(*macro)
+
+
+def test_same_inputs_give_the_same_game(stub):
+    other = stub_controller()
+    macros = [WALK, JUMP, WALK, (1, 5, None, None, False)] * 5
+    play(stub, macros)
+    play(other, macros)
+
+    assert stub.pyboy.memory.data == other.pyboy.memory.data
+    assert np.array_equal(stub.game_area(), other.game_area())
+    assert np.array_equal(stub.screen.ndarray, other.screen.ndarray)
+
+
+def test_controller_reads_the_scripted_game(stub):
+    state = stub.game_state()
+    assert (state["world"], state["stage"], state["lives"], state["game_over"]) == (1, 1, 2, False)
+
+    start = stub.get_x_position()
+    play(stub, [WALK] * 10)
+    assert stub.get_x_position() > start
+    assert np.count_nonzero(stub.game_area() == tile_query.MARIO) == 4
+    assert stub.grab_frame().shape == (240, 300, 3)
+
+
+def test_load_state_restores_the_game_while_frame_count_runs_on(stub):
+    play(stub, [WALK] * 5)
+    state = io.BytesIO()
+    stub.pyboy.save_state(state)
+    saved = stub.snapshot().as_array().copy()
+    frame = stub.pyboy.frame_count
+
+    play(stub, [JUMP, WALK])
+    stub.load_state(state.getvalue())
+
+    assert stub.pyboy.frame_count > frame
+    assert np.array_equal(stub.snapshot().as_array(), saved)
+
+
+def test_reset_returns_to_the_boot_state(stub):
+    boot = stub.snapshot().as_array().copy()
+    play(stub, [WALK] * 5)
+    stub.reset()
+    assert np.array_equal(stub.snapshot().as_array(), boot)
+
+
+def test_replay_recorded_on_the_stub_verifies(expert, tmp_path):
+    expert.recording = "replay"
+    expert.stop_check = lambda expert: "done" if expert.environment.game_frame > 300 else None
+    expert.play()
+
+    log = replay_log.ReplayLog.load(str(tmp_path / "mario_expert.replay.json.gz"))
+    assert log.init_state == expert.environment.init_path
+    fresh = stub_controller()
+    replayer = replay_log.Replayer(log, fresh)
+    replayer.seek(log.frames)
+    assert fresh.get_x_position() == expert.environment.get_x_position()
@@ -0,0 +1,62 @@
+import pytest
+
+import sweep
+import warm_start
+from emulator_backend import stub_controller
+from expert_parameters import ExpertParameters
+from mario_expert import MarioController
+
+
+def test_from_dict_casts_and_rejects_what_it_cannot_use():
+    parameters = ExpertParameters.from_dict({"goomba_dx": 18.0, "jump_frames": "9"})
+    assert (parameters.goomba_dx, parameters.jump_frames) == (18, 9)
+    assert ExpertParameters.from_dict(ExpertParameters().as_dict()) == ExpertParameters()
+
+    with pytest.raises(ValueError, match="Unknown expert parameters"):
+        ExpertParameters.from_dict({"goomba_distance": 3})
+    with pytest.raises(ValueError, match="Expected an integer"):
+        ExpertParameters.from_dict({"goomba_dx": 12.5})
+
+
+def test_grid_and_sample():
+    space = {"goomba_dx": [12, 15, 18], "jump_frames": [7, 8]}
+    assert len(sweep.grid(space)) == 6
+    assert sweep.sample(space, 4, seed=1) == sweep.sample(space, 4, seed=1)
+    # Asking for more samples than there are combinations gives each once
+    assert sorted(map(str, sweep.sample(space, 100, seed=1))) == sorted(map(str, sweep.grid(space)))
+
+
+@pytest.fixture
+def stub_sweep(tmp_path, monkeypatch):
+    """
+    A Sweep whose evaluations fork from a warm stub controller.
+    """
+    monkeypatch.setattr(MarioController, "prototype", None)
+    warm_start.prepare(stub_controller)
+    search = sweep.Sweep(tmp_path, workers=2)
+    search.prepared = True
+    return search
+
+
+def test_evaluations_are_stored_and_not_repeated(stub_sweep, tmp_path):
+    configurations = [{"jump_frames": 6}, {"jump_frames": 8}, {"jump_frames": 10}]
+    ranked = stub_sweep.evaluate(configurations, frame_budget=300)
+
+    assert sorted(entry["parameters"]["jump_frames"] for entry in ranked) == [6, 8, 10]
+    assert all(entry["results"]["stopped_by"] == "frame budget of 300" for entry in ranked)
+
+    resumed = sweep.Sweep(tmp_path, workers=2)
+    assert len(resumed.store.entries) == 3
+    # Already evaluated - nothing is forked, so the unprepared sweep never needs a ROM
+    assert resumed.evaluate(configurations[:2], frame_budget=300) == [
+        entry for entry in ranked if entry["parameters"]["jump_frames"] != 10
+    ]
+
+
+def test_halving_raises_the_budget_for_the_survivors(stub_sweep):
+    configurations = sweep.grid({"jump_frames": [6, 7, 8, 9]})
+    ranked = stub_sweep.halving(configurations, frame_budget=100, eta=2, max_frame_budget=0)
+
+    assert len(ranked) == 1 and ranked[0]["frame_budget"] == 400
+    budgets = sorted(entry["frame_budget"] for entry in stub_sweep.store.entries.values())
+    assert budgets == [100] * 4 + [200] * 2 + [400]
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+import tile_query
+from benchmark import synthetic_grids
+
+
+def scan(grid, values):
+    """
+    The detectors' original loop - every match from the bottom-right cell to the top-left.
+    """
+    values = (values,) if isinstance(values, int) else tuple(values)
+    return [(i, j) for i in range(15, -1, -1) for j in range(19, -1, -1) if grid[i, j] in values]
+
+
+@pytest.fixture(scope="module")
+def grids():
+    return synthetic_grids(300, seed=1)
+
+
+@pytest.mark.parametrize("values", [tile_query.MARIO, tile_query.PRIZE, tile_query.SOLID, 99])
+def test_scan_order_matches_the_loops(grids, values):
+    for grid in grids:
+        hits = scan(grid, values)
+        assert tile_query.first_in_scan(grid, values) == (hits[0] if hits else None)
+        assert tile_query.last_in_scan(grid, values) == (hits[-1] if hits else None)
+
+
+def test_match_and_argwhere(grids):
+    for grid in grids[:50]:
+        mask = tile_query.match(grid, tile_query.PRIZE)
+        assert np.array_equal(mask, np.isin(grid, tile_query.PRIZE))
+        assert np.array_equal(tile_query.argwhere(grid, tile_query.PRIZE), np.argwhere(mask))
+
+
+def test_regions():
+    grid = np.zeros((16, 20), dtype=np.uint32)
+    grid[14:, :] = tile_query.BLOCK
+    assert tile_query.region_all(grid, slice(14, 16), slice(0, 20), tile_query.SOLID)
+    assert not tile_query.region_all(grid, slice(13, 16), slice(0, 20), tile_query.SOLID)
+    assert tile_query.region_all(grid, slice(0, 0), slice(0, 20), tile_query.SOLID)
+    assert tile_query.region_any(grid, slice(10, 15), slice(3, 4), tile_query.BLOCK)
+    assert not tile_query.region_any(grid, slice(0, 14), slice(0, 20), tile_query.BLOCK)
+
+
+def test_nearest_breaks_ties_in_row_major_order():
+    grid = np.zeros((16, 20), dtype=np.uint32)
+    grid[5, 4] = grid[5, 8] = grid[12, 6] = tile_query.COIN
+    assert tile_query.nearest(grid, tile_query.COIN, (5, 6)) == (5, 4)
+    assert tile_query.nearest(grid, tile_query.COIN, (11, 6)) == (12, 6)
+    assert tile_query.nearest(grid, tile_query.PIPE, (0, 0)) is None
@@ -0,0 +1,67 @@
+import argparse
+import json
+from pathlib import Path
+
+import tournament
+
+SCRIPTS = Path(__file__).resolve().parent.parent
+
+BASELINE = SCRIPTS / "tests" / "baseline_mario_expert.py"
+
+# Appended to a submission's mario_expert.py, so its MarioExpert plays on the ROM-free stub
+ON_THE_STUB = """
+from emulator_backend import BackendEnvironment
+from stub_pyboy import StubPyBoy
+
+
+class StubMarioController(MarioController, BackendEnvironment):
+    backend = StubPyBoy
+
+    def init_state(self) -> bytes:
+        return self.boot_state
+
+
+MarioController = StubMarioController
+"""
+
+
+def test_requirements_key_ignores_order_comments_and_blank_lines(tmp_path):
+    first, second = tmp_path / "first.txt", tmp_path / "second.txt"
+    first.write_text("numpy==1.26.4\npyboy==2.2.1\n")
+    second.write_text("# pinned\npyboy==2.2.1\n\nnumpy==1.26.4\n")
+
+    assert tournament.requirements_key(first) == tournament.requirements_key(second)
+    assert tournament.requirements_key(tmp_path / "missing.txt") == tournament.requirements_key(
+        tournament.REPO_PATH / "requirements.txt"
+    )
+
+
+def test_submissions_run_in_workers_and_are_ranked(tmp_path):
+    submissions = tmp_path / "submissions"
+    (submissions / "stub").mkdir(parents=True)
+    (submissions / "baseline").mkdir()
+    (submissions / "broken").mkdir()
+    (submissions / "empty").mkdir()
+    expert = (SCRIPTS / "mario_expert.py").read_text()
+    (submissions / "stub" / "mario_expert.py").write_text(expert + ON_THE_STUB)
+    # The template students start from - none of this repository's evaluation hooks
+    (submissions / "baseline" / "mario_expert.py").write_text(BASELINE.read_text() + ON_THE_STUB)
+    (submissions / "broken" / "mario_expert.py").write_text("raise ImportError('missing dependency')\n")
+
+    args = argparse.Namespace(workers=2, time_budget=60.0, frame_budget=300, venv_root=tmp_path / "venv")
+    results = tmp_path / "results"
+    leaderboard = tournament.run_tournament(submissions, results, args)
+
+    assert {result["upi"]: result["status"] for result in leaderboard} == {
+        "stub": "finished",
+        "baseline": "finished",
+        "broken": "failed (1)",
+    }
+    assert leaderboard[-1]["upi"] == "broken"
+    for result in leaderboard[:2]:
+        assert result["frames"] >= 300 and result["stopped_by"] == "frame budget of 300"
+    assert "missing dependency" in (results / "broken" / "run.log").read_text()
+    with open(results / "leaderboard.json", encoding="utf-8") as file:
+        assert json.load(file) == leaderboard
+    # Every submission shares this interpreter, so no virtualenv was made
+    assert not args.venv_root.exists()
@@ -0,0 +1,63 @@
+import cv2
+import numpy as np
+import pytest
+
+import run
+import video_writer
+from video_writer import AsyncVideoWriter
+
+
+def frame_count(path) -> int:
+    capture = cv2.VideoCapture(str(path))
+    count = 0
+    while capture.read()[0]:
+        count += 1
+    capture.release()
+    return count
+
+
+def screens(count: int) -> list:
+    rng = np.random.default_rng(5)
+    return [rng.integers(0, 256, (144, 160, 4), dtype=np.uint8) for _ in range(count)]
+
+
+def test_every_submitted_and_repeated_frame_is_encoded(tmp_path):
+    path = tmp_path / "video.mp4"
+    writer = AsyncVideoWriter(str(path), 300, 240, max_queue=4)
+    for screen in screens(20):
+        assert writer.submit(screen)
+        assert writer.repeat()
+    writer.release()
+    writer.release()
+
+    assert (writer.frames_written, writer.frames_repeated, writer.frames_dropped) == (40, 20, 0)
+    assert frame_count(path) == 40
+
+
+def test_drop_policy_never_blocks_and_counts_what_it_dropped(tmp_path):
+    writer = AsyncVideoWriter(str(tmp_path / "video.mp4"), 300, 240, max_queue=1, policy=video_writer.DROP)
+    for screen in screens(200):
+        writer.submit(screen)
+    writer.release()
+
+    assert writer.frames_submitted == 200
+    assert writer.frames_written + writer.frames_dropped == 200
+
+
+def test_misuse_is_reported(tmp_path):
+    with pytest.raises(ValueError, match="Unknown backpressure policy"):
+        AsyncVideoWriter(str(tmp_path / "video.mp4"), 300, 240, policy="skip")
+
+    writer = AsyncVideoWriter(str(tmp_path / "video.mp4"), 300, 240)
+    writer.release()
+    with pytest.raises(RuntimeError, match="released"):
+        writer.submit(screens(1)[0])
+
+
+def test_async_recording_writes_as_many_frames_as_sync(expert, tmp_path):
+    run.evaluate(expert, str(tmp_path), frame_budget=900)
+    synchronous = frame_count(tmp_path / "mario_expert.mp4")
+
+    expert.recording = "async"
+    run.evaluate(expert, str(tmp_path), frame_budget=900)
+    assert frame_count(tmp_path / "mario_expert.mp4") == synchronous > 0
@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+import run
+import warm_start
+from emulator_backend import stub_controller
+from mario_expert import MarioController, MarioExpert
+
+
+def square(value):
+    return value * value
+
+
+def slow_or_failing(value):
+    if value == 0:
+        raise ValueError("bad job")
+    time.sleep(30)
+
+
+def play_on_the_prototype(results_path):
+    expert = MarioExpert(results_path=results_path, headless=True)
+    expert.recording = "sync"
+    results = run.evaluate(expert, results_path, frame_budget=200)
+    return os.getpid(), MarioController.prototype is None, results["x_position"]
+
+
+@pytest.fixture
+def prototype(monkeypatch):
+    monkeypatch.setattr(MarioController, "prototype", None)
+    return warm_start.prepare(stub_controller)
+
+
+def test_fork_map_yields_every_result_once():
+    results = dict(warm_start.fork_map(square, [(value,) for value in range(10)], workers=3))
+    assert results == {index: index * index for index in range(10)}
+    assert not multiprocessing.active_children()
+
+
+def test_a_failed_job_stops_the_children_still_running():
+    start = time.perf_counter()
+    with pytest.raises(RuntimeError, match="(?s)Job 0 failed in a forked worker.*ValueError: bad job"):
+        list(warm_start.fork_map(slow_or_failing, [(0,), (1,), (2,)], workers=3))
+    assert time.perf_counter() - start < 10
+    assert not multiprocessing.active_children()
+
+
+def test_abandoning_the_map_stops_its_children():
+    results = warm_start.fork_map(square, [(1,)] + [(0,)] * 3, workers=4)
+    next(results)
+    results.close()
+    assert not multiprocessing.active_children()
+
+
+def test_children_play_on_a_copy_of_the_warm_controller(prototype, tmp_path):
+    jobs = [(str(tmp_path / str(index)),) for index in range(3)]
+    for path, in jobs:
+        os.makedirs(path)
+    results = dict(warm_start.fork_map(play_on_the_prototype, jobs, workers=3))
+
+    assert len({pid for pid, _, _ in results.values()}) == 3
+    # Each child took the prototype and got the same game - the parent's copy is untouched
+    assert {(taken, x_position) for _, taken, x_position in results.values()} == {(True, results[0][2])}
+    assert MarioController.prototype is prototype and prototype.game_frame == prototype.boot_frames
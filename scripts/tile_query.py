@@ -0,0 +1,124 @@
+"""
+Vectorised queries over the 16 x 20 game_area tile grid.
+
+The detectors in mario_expert.py historically scanned the grid with nested loops running from the
+bottom-right cell to the top-left cell. "Scan order" in this module refers to that order, so
+first_in_scan returns exactly what such a loop would return on its first match and last_in_scan what
+it would have left behind after visiting every cell.
+"""
+
+from typing import Iterable, Optional, Union
+
+import numpy as np
+
+TileValues = Union[int, Iterable[int]]
+
+# game_area codes under the game wrapper's mapping_compressed
+EMPTY = 0
+MARIO = 1
+COIN = 5
+LEVER = 9
+BLOCK = 10
+MOVING_BLOCK = 11
+PUSHABLE_BLOCK = 12
+QUESTION_BLOCK = 13
+PIPE = 14
+SPIKE = 27
+
+# Everything that is part of the level itself rather than Mario, items, enemies or projectiles
+TERRAIN = (EMPTY, COIN, LEVER, BLOCK, PUSHABLE_BLOCK, QUESTION_BLOCK, PIPE, SPIKE)
+
+# Semantic classes over the remaining mapping_compressed codes
+SOLID = (BLOCK, MOVING_BLOCK, PUSHABLE_BLOCK, QUESTION_BLOCK, PIPE)
+COLLECTIBLE = (COIN, 6, 7, 8)  # coin, mushroom, heart, star
+PRIZE = (QUESTION_BLOCK, COIN)
+ENEMY = (15, 16, 17, 18, 19, 20, 21, 22, 23, 25)  # goomba .. bill, shell
+HAZARD = ENEMY + (4, 24, SPIKE)  # plus shots, projectiles and spikes
+
+
+def match(grid: np.ndarray, values: TileValues) -> np.ndarray:
+    """
+    Returns a boolean mask of the cells holding any of the given tile values.
+    """
+    if isinstance(values, (int, np.integer)):
+        return grid == values
+
+    values = tuple(values)
+    mask = grid == values[0]
+    for value in values[1:]:
+        mask |= grid == value
+    return mask
+
+
+def argwhere(grid: np.ndarray, values: TileValues) -> np.ndarray:
+    """
+    Returns the (row, column) of every matching cell in row-major order - shape (N, 2).
+    """
+    return np.argwhere(match(grid, values))
+
+
+def first_in_scan(grid: np.ndarray, values: TileValues) -> Optional[tuple[int, int]]:
+    """
+    Returns the first match visiting cells from the bottom-right to the top-left, or None.
+    """
+    return first_in_mask(match(grid, values))
+
+
+def last_in_scan(grid: np.ndarray, values: TileValues) -> Optional[tuple[int, int]]:
+    """
+    Returns the last match visiting cells from the bottom-right to the top-left, or None.
+    """
+    return last_in_mask(match(grid, values))
+
+
+def first_in_mask(mask: np.ndarray) -> Optional[tuple[int, int]]:
+    """
+    first_in_scan over a precomputed boolean mask.
+    """
+    flat = np.flatnonzero(mask)
+    if flat.size == 0:
+        return None
+    row, col = divmod(int(flat[-1]), mask.shape[1])
+    return (row, col)
+
+
+def last_in_mask(mask: np.ndarray) -> Optional[tuple[int, int]]:
+    """
+    last_in_scan over a precomputed boolean mask.
+    """
+    flat = np.flatnonzero(mask)
+    if flat.size == 0:
+        return None
+    row, col = divmod(int(flat[0]), mask.shape[1])
+    return (row, col)
+
+
+def region_all(grid: np.ndarray, rows: slice, cols: slice, values: TileValues) -> bool:
+    """
+    True if every cell in grid[rows, cols] matches - vacuously True for an empty region, like np.all.
+    """
+    return bool(match(grid[rows, cols], values).all())
+
+
+def region_any(grid: np.ndarray, rows: slice, cols: slice, values: TileValues) -> bool:
+    """
+    True if any cell in grid[rows, cols] matches.
+    """
+    return bool(match(grid[rows, cols], values).any())
+
+
+def nearest(
+    grid: np.ndarray, values: TileValues, origin: tuple[int, int]
+) -> Optional[tuple[int, int]]:
+    """
+    Returns the matching cell closest to origin (squared euclidean distance in tiles), or None.
+
+    Ties are broken by row-major order so the result is deterministic.
+    """
+    cells = argwhere(grid, values)
+    if cells.shape[0] == 0:
+        return None
+    deltas = cells - np.asarray(origin)
+    distance = (deltas * deltas).sum(axis=1)
+    row, col = cells[int(np.argmin(distance))]
+    return (int(row), int(col))
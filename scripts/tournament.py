@@ -0,0 +1,222 @@
+"""
+Local tournament runner for a directory of Mario Expert submissions.
+
+Each submission is a folder named after the student's upi holding a mario_expert.py and optionally a
+requirements.txt:
+
+submissions/
+    upi1/mario_expert.py
+    upi1/requirements.txt
+    upi2/mario_expert.py
+
+Submissions run headless in at most --workers concurrent processes (the core count by default).
+Submissions whose requirements match share one virtual environment - the current interpreter when
+they match this repository's requirements.txt - so pip runs once per distinct set of requirements
+instead of once per submission. Every run has a wall clock and a frame budget, and the leaderboard is
+updated as each run finishes.
+
+python3 tournament.py -s ../submissions -r ../results
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import cmp_to_key
+from pathlib import Path
+
+from compare_results import compare_performance
+
+REPO_PATH = Path(__file__).parent.parent
+
+
+def requirements_key(requirements_path: Path) -> str:
+    """
+    Returns a hash of the normalised requirements - identical sets of packages share a key.
+    """
+    if not requirements_path.exists():
+        requirements_path = REPO_PATH / "requirements.txt"
+
+    with open(requirements_path, "r", encoding="utf-8") as file:
+        lines = {line.strip() for line in file if line.strip() and not line.startswith("#")}
+    return hashlib.sha256("\n".join(sorted(lines)).encode()).hexdigest()[:16]
+
+
+def prepare_environment(requirements_path: Path, venv_root: Path) -> str:
+    """
+    Returns the python interpreter for a set of requirements, creating its virtualenv once.
+    """
+    key = requirements_key(requirements_path)
+    if key == requirements_key(REPO_PATH / "requirements.txt"):
+        return sys.executable
+
+    venv_dir = venv_root / key
+    python_bin = venv_dir / "bin" / "python3"
+    marker = venv_dir / ".installed"
+    if marker.exists():
+        return str(python_bin)
+
+    import virtualenv
+
+    logging.info(f"Creating shared environment {venv_dir}")
+    virtualenv.cli_run([str(venv_dir)])
+    subprocess.run(
+        [str(python_bin), "-m", "pip", "install", "-q", "-r", str(requirements_path)], check=True
+    )
+    marker.touch()
+    return str(python_bin)
+
+
+def run_submission(python_bin: str, submission: Path, results_path: Path, args) -> dict:
+    """
+    Runs one submission in its own process and returns its results with run metadata.
+    """
+    upi = submission.name
+    results_path.mkdir(parents=True, exist_ok=True)
+    (results_path / "results.json").unlink(missing_ok=True)
+
+    command = [
+        python_bin,
+        str(Path(__file__).resolve()),
+        "worker",
+        "--submission",
+        str(submission),
+        "--results_path",
+        str(results_path),
+        "--frame_budget",
+        str(args.frame_budget),
+        # soft budget so the child still writes results.json before the hard timeout kills it
+        "--time_budget",
+        str(0.9 * args.time_budget),
+    ]
+
+    start = time.perf_counter()
+    status = "finished"
+    try:
+        with open(results_path / "run.log", "w", encoding="utf-8") as log:
+            process = subprocess.run(
+                command, stdout=log, stderr=subprocess.STDOUT, timeout=args.time_budget
+            )
+        if process.returncode != 0:
+            status = f"failed ({process.returncode})"
+    except subprocess.TimeoutExpired:
+        status = "timeout"
+    wall_time = time.perf_counter() - start
+
+    result = {"world": 0, "stage": 0, "score": 0}
+    try:
+        with open(results_path / "results.json", "r", encoding="utf-8") as file:
+            result.update(json.load(file))
+    except (OSError, ValueError):
+        if status == "finished":
+            status = "no results"
+
+    result["upi"] = upi
+    result["status"] = status
+    result["wall_time"] = round(wall_time, 2)
+    return result
+
+
+def run_tournament(submissions_path: Path, results_path: Path, args) -> list[dict]:
+    submissions = sorted(
+        path for path in submissions_path.iterdir() if (path / "mario_expert.py").exists()
+    )
+    logging.info(f"Found {len(submissions)} submissions in {submissions_path}")
+
+    # Install each distinct set of requirements once, before any run competes for the cores
+    interpreters = {}
+    for submission in submissions:
+        key = requirements_key(submission / "requirements.txt")
+        if key not in interpreters:
+            interpreters[key] = prepare_environment(submission / "requirements.txt", args.venv_root)
+    logging.info(f"{len(interpreters)} shared environments for {len(submissions)} submissions")
+
+    leaderboard = []
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {
+            pool.submit(
+                run_submission,
+                interpreters[requirements_key(submission / "requirements.txt")],
+                submission,
+                results_path / submission.name,
+                args,
+            ): submission.name
+            for submission in submissions
+        }
+
+        for future in as_completed(futures):
+            result = future.result()
+            leaderboard.append(result)
+            leaderboard.sort(key=cmp_to_key(compare_performance))
+
+            rank = leaderboard.index(result) + 1
+            logging.info(
+                f"[{len(leaderboard)}/{len(submissions)}] {result['upi']} {result['status']} "
+                f"in {result['wall_time']}s - Rank {rank}: World: {result['world']} "
+                f"Stage: {result['stage']} Score: {result['score']}"
+            )
+
+            with open(results_path / "leaderboard.json", "w", encoding="utf-8") as file:
+                json.dump(leaderboard, file, indent=2)
+
+    for i, result in enumerate(leaderboard):
+        logging.info(
+            f"Rank {i + 1}: {result['upi']} - World: {result['world']} Stage: {result['stage']} Score: {result['score']}"
+        )
+    return leaderboard
+
+
+def worker(submission: Path, results_path: Path, frame_budget: int, time_budget: float) -> None:
+    """
+    Child process entry point - evaluates one submission headless with run.py's evaluation mode, which
+    enforces the budgets for any submission following the baseline template.
+    """
+    sys.path.insert(0, str(submission))
+    spec = importlib.util.spec_from_file_location("mario_expert", submission / "mario_expert.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["mario_expert"] = module
+    spec.loader.exec_module(module)
+
+    import run
+
+    expert = module.MarioExpert(results_path=str(results_path), headless=True)
+    run.evaluate(expert, str(results_path), frame_budget, time_budget)
+
+
+def get_args():
+    parse_args = argparse.ArgumentParser()
+
+    parse_args.add_argument("mode", nargs="?", choices=["tournament", "worker"], default="tournament")
+
+    parse_args.add_argument("-s", "--submissions_path", type=str, default=f"{REPO_PATH}/submissions")
+    parse_args.add_argument("-r", "--results_path", type=str, default=f"{REPO_PATH}/results")
+    parse_args.add_argument("--workers", type=int, default=os.cpu_count())
+    parse_args.add_argument("--time_budget", type=float, default=600.0)
+    parse_args.add_argument("--frame_budget", type=int, default=60 * 60 * 10)
+    parse_args.add_argument("--venv_root", type=str, default=f"{os.path.expanduser('~')}/venv")
+
+    parse_args.add_argument("--submission", type=str, default=None)
+
+    return parse_args.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = get_args()
+
+    if args.mode == "worker":
+        worker(Path(args.submission), Path(args.results_path), args.frame_budget, args.time_budget)
+        return
+
+    args.venv_root = Path(args.venv_root)
+    run_tournament(Path(args.submissions_path), Path(args.results_path), args)
+
+
+if __name__ == "__main__":
+    main()
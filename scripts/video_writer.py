@@ -0,0 +1,148 @@
+"""
+Background video encoding for MarioExpert.play.
+
+The emulation thread only copies the raw 160 x 144 screen into a bounded queue. A writer thread does
+the resize, the RGB to BGR conversion and the mp4 encoding - OpenCV releases the GIL for all three,
+so they overlap with emulation instead of sitting on its critical path.
+"""
+
+import logging
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+BLOCK = "block"
+DROP = "drop"
+
+_END_OF_STREAM = None
+_REPEAT = "repeat"
+
+
+class AsyncVideoWriter:
+    """
+    A drop-in replacement for cv2.VideoWriter that encodes on a background thread.
+
+    Args:
+        video_name (str): Path of the video file to write.
+        width (int): Width of the encoded video - raw frames are resized to this.
+        height (int): Height of the encoded video.
+        fps (int): Frames per second of the encoded video. Defaults to 30.
+        max_queue (int): Raw frames that may wait for the writer. Defaults to 256.
+        policy (str): "block" to stall emulation while the queue is full so every frame is encoded,
+            "drop" to discard new frames instead. Defaults to "block".
+    """
+
+    def __init__(
+        self,
+        video_name: str,
+        width: int,
+        height: int,
+        fps: int = 30,
+        max_queue: int = 256,
+        policy: str = BLOCK,
+    ) -> None:
+        if policy not in (BLOCK, DROP):
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+
+        self.video_name = video_name
+        self.size = (width, height)
+        self.policy = policy
+
+        self.frames_submitted = 0
+        self.frames_written = 0
+        self.frames_repeated = 0
+        self.frames_dropped = 0
+
+        self._video = cv2.VideoWriter(video_name, cv2.VideoWriter_fourcc(*"mp4v"), fps, self.size)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._error = None
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name="video-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, screen: np.ndarray) -> bool:
+        """
+        Queues a copy of a raw RGB(A) screen buffer for encoding. Returns False if it was dropped.
+        """
+        if self._closed:
+            raise RuntimeError("Video writer has been released")
+        if self._error is not None:
+            raise RuntimeError("Video writer failed") from self._error
+
+        frame = np.array(screen)
+        self.frames_submitted += 1
+        if self.policy == BLOCK:
+            self._queue.put(frame)
+            return True
+
+        try:
+            self._queue.put_nowait(frame)
+        except queue.Full:
+            self.frames_dropped += 1
+            return False
+        return True
+
+    def repeat(self) -> bool:
+        """
+        Queues the previous frame again, for a screen that has not changed - nothing is copied, resized or
+        converted. Returns False if it was dropped.
+        """
+        if self._closed:
+            raise RuntimeError("Video writer has been released")
+        self.frames_submitted += 1
+        if self.policy == BLOCK:
+            self._queue.put(_REPEAT)
+            return True
+
+        try:
+            self._queue.put_nowait(_REPEAT)
+        except queue.Full:
+            self.frames_dropped += 1
+            return False
+        return True
+
+    def release(self) -> None:
+        """
+        Flushes every queued frame, finalises the video file and stops the writer thread.
+        """
+        if self._closed:
+            return
+        self._closed = True
+
+        self._queue.put(_END_OF_STREAM)
+        self._thread.join()
+        self._video.release()
+
+        logging.info(
+            f"Video {self.video_name}: {self.frames_written} frames written "
+            f"({self.frames_repeated} repeated), {self.frames_dropped} dropped"
+        )
+        if self._error is not None:
+            raise RuntimeError("Video writer failed") from self._error
+
+    def _run(self) -> None:
+        last = None
+        while True:
+            frame = self._queue.get()
+            if frame is _END_OF_STREAM:
+                return
+            if self._error is not None:
+                continue  # drain so submit() never blocks on a dead writer
+
+            try:
+                if frame is _REPEAT:
+                    if last is None:
+                        continue
+                    frame = last
+                    self.frames_repeated += 1
+                else:
+                    frame = cv2.resize(frame, self.size)
+                    frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+                    last = frame
+                self._video.write(frame)
+                self.frames_written += 1
+            except Exception as error:  # surfaced to the emulation thread on submit/release
+                self._error = error
@@ -0,0 +1,87 @@
+"""
+Millisecond startup for short headless evaluations.
+
+Building a MarioController costs an interpreter start, the pyboy/cv2/numpy imports and a PyBoy
+construction with the ROM before the first frame is emulated. prepare() pays that once in a parent
+process, leaving a headless controller in MarioController.prototype; fork_map() then forks one child
+per job, and a MarioExpert built in the child picks the inherited prototype up through
+MarioController.create(), so the child's first frame only costs the fork and a reset from the
+in-memory init.state.
+
+Children are forked rather than spawned or pooled - every job gets its own copy-on-write copy of an
+untouched controller, with no state left over from a previous job.
+
+warm_start.prepare()
+for index, results in warm_start.fork_map(evaluate_configuration, jobs, workers=4):
+    ...
+"""
+
+import logging
+import multiprocessing
+import time
+import traceback
+from multiprocessing.connection import wait
+from typing import Callable, Iterator
+
+from mario_expert import MarioController
+
+
+def prepare(factory: Callable[[], MarioController] = None) -> MarioController:
+    """
+    Builds the headless controller forked children start from.
+    """
+    start = time.perf_counter()
+    if factory is None:
+        prototype = MarioController(emulation_speed=0, headless=True)
+    else:
+        prototype = factory()
+    MarioController.prototype = prototype
+    logging.info(f"Prepared a warm controller in {time.perf_counter() - start:.3f}s")
+    return prototype
+
+
+def _child(function: Callable, job: tuple, connection) -> None:
+    try:
+        result = (True, function(*job))
+    except Exception:
+        result = (False, traceback.format_exc())
+    connection.send(result)
+    connection.close()
+
+
+def fork_map(function: Callable, jobs: list[tuple], workers: int) -> Iterator[tuple[int, any]]:
+    """
+    Runs function(*job) for every job in its own forked child, at most `workers` at a time, and yields
+    (job index, result) as children finish. If a job fails, the children still running are terminated
+    and joined before the error is raised.
+    """
+    context = multiprocessing.get_context("fork")
+    running = {}
+    submitted = 0
+    try:
+        while submitted < len(jobs) or running:
+            while submitted < len(jobs) and len(running) < workers:
+                receiver, sender = context.Pipe(duplex=False)
+                process = context.Process(target=_child, args=(function, jobs[submitted], sender))
+                process.start()
+                sender.close()
+                running[receiver] = (submitted, process)
+                submitted += 1
+
+            for receiver in wait(list(running)):
+                index, process = running.pop(receiver)
+                try:
+                    ok, result = receiver.recv()
+                except EOFError:
+                    ok, result = False, f"exited with code {process.exitcode} before returning"
+                receiver.close()
+                process.join()
+                if not ok:
+                    raise RuntimeError(f"Job {index} failed in a forked worker:\n{result}")
+                yield index, result
+    finally:
+        # A failed job or a caller that stopped iterating leaves children behind - none outlive the map
+        for receiver, (_, process) in running.items():
+            process.terminate()
+            process.join()
+            receiver.close()